@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
+
+from . import metrics
+
+# Admission control for slow outbound calls (the chat LLM). At most
+# `max_inflight` calls run at once; the rest wait in per-user FIFO queues that
+# are served round-robin, so one chatty user cannot starve everyone else.
+# Requests are refused immediately when the queue (or the user's share of it)
+# is full, give up after `queue_timeout_s` in the queue, and carry a total
+# deadline that the caller applies to the call itself. Runs on the event loop;
+# nothing here blocks a threadpool worker.
+
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_MAX_QUEUE_PER_USER = int(os.getenv("LLM_MAX_QUEUE_PER_USER", "2"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "10"))
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "60"))
+# Background calls (conversation summaries, cache warming) get their own, smaller
+# pool so they never hold a slot a patient's chat turn is waiting for
+LLM_BACKGROUND_MAX_INFLIGHT = int(os.getenv("LLM_BACKGROUND_MAX_INFLIGHT", "2"))
+
+
+class AdmissionError(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionRejected(AdmissionError):
+    """Queue full: refused without waiting."""
+
+
+class AdmissionTimeout(AdmissionError):
+    """Waited longer than the queue timeout."""
+
+
+class Ticket:
+    """A granted slot. Release exactly once (extra calls are no-ops)."""
+
+    def __init__(self, controller: "AdmissionController", user: str, started: float):
+        self.controller = controller
+        self.user = user
+        self.started = started
+        self.deadline = started + controller.deadline_s
+        self.granted = time.monotonic()
+        self.released = False
+
+    def remaining(self) -> float:
+        """Seconds left before the total deadline (queue time included)."""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_inflight: int = LLM_MAX_INFLIGHT, max_queue: int = LLM_MAX_QUEUE,
+                 max_queue_per_user: int = LLM_MAX_QUEUE_PER_USER,
+                 queue_timeout_s: float = LLM_QUEUE_TIMEOUT_S, deadline_s: float = LLM_DEADLINE_S):
+        self.name = name
+        self.max_inflight = max(1, max_inflight)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout_s = queue_timeout_s
+        self.deadline_s = deadline_s
+        self._active: set = set()
+        # user → FIFO of (future, enqueued at); dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]" = OrderedDict()
+        self._queued = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._active)
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.inflight", len(self._active))
+        metrics.set_gauge(f"{self.name}.queue_depth", self._queued)
+
+    def _reap(self) -> None:
+        # A ticket past its deadline was leaked (e.g. a response that never
+        # started streaming); the call it guarded has been cut off by now.
+        now = time.monotonic()
+        for ticket in [t for t in self._active if t.deadline + 1.0 < now]:
+            metrics.incr(f"{self.name}.reaped")
+            ticket.release()
+
+    async def acquire(self, user: str) -> Ticket:
+        started = time.monotonic()
+        self._reap()
+        if len(self._active) < self.max_inflight and not self._queued:
+            return self._grant(user, started)
+
+        user_queue = self._queues.get(user)
+        if self._queued >= self.max_queue or (user_queue and len(user_queue) >= self.max_queue_per_user):
+            metrics.incr(f"{self.name}.rejected")
+            raise AdmissionRejected("Assistant is busy, please retry shortly", retry_after=self.queue_timeout_s)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append((fut, started))
+        self._queued += 1
+        self._publish()
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                fut.result().release()  # granted just as we gave up
+            else:
+                fut.cancel()
+                self._dequeue(user, fut)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr(f"{self.name}.queue_timeouts")
+                raise AdmissionTimeout("Assistant is busy, please retry shortly", retry_after=self.queue_timeout_s)
+            raise
+
+    def _dequeue(self, user: str, fut: asyncio.Future) -> None:
+        q = self._queues.get(user)
+        entry = next((e for e in q if e[0] is fut), None) if q else None
+        if entry is not None:
+            q.remove(entry)
+            self._queued -= 1
+            if not q:
+                del self._queues[user]
+        self._publish()
+
+    def _grant(self, user: str, started: float) -> Ticket:
+        ticket = Ticket(self, user, started)
+        self._active.add(ticket)
+        metrics.observe(f"{self.name}.queue_wait_seconds", ticket.granted - started)
+        self._publish()
+        return ticket
+
+    def _release(self, ticket: Ticket) -> None:
+        self._active.discard(ticket)
+        metrics.observe(f"{self.name}.active_seconds", time.monotonic() - ticket.granted)
+        while len(self._active) < self.max_inflight and self._queues:
+            user, q = next(iter(self._queues.items()))
+            fut, started = q.popleft()
+            self._queued -= 1
+            if q:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            if not fut.done():
+                fut.set_result(self._grant(user, started))
+        self._publish()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"inflight": len(self._active), "queued": self._queued, "users_waiting": len(self._queues)}
@@ -1,4 +1,5 @@
 import re
+from datetime import date
 from typing import List, Optional, Tuple, Dict
 
 # Common patterns like:
@@ -53,6 +54,58 @@ def _interpret(value: Optional[float], low: Optional[float], high: Optional[floa
         return "normal"
     return "unknown"
 
+# Pattern A: "Test Name  11.2  g/dL  13.0 - 17.0"
+_PAT_A = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s+"
+                    rf"(?P<value>{NUM})\s*"
+                    rf"(?P<unit>{UNIT})?\s+"
+                    rf"(?P<ref>{RANGE}.*)$")
+
+# Pattern B: "Test Name  110  70 - 99"  (no unit)
+_PAT_B = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s+"
+                    rf"(?P<value>{NUM})\s+"
+                    rf"(?P<ref>{RANGE}.*)$")
+
+# Pattern C: "Test Name : 11.2 g/dL (13-17)"
+_PAT_C = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s*[:\-]\s*"
+                    rf"(?P<value>{NUM})\s*"
+                    rf"(?P<unit>{UNIT})?\s*"
+                    rf"[\(\[]?(?P<ref>{RANGE}.*)?[\)\]]?$")
+
+
+def parse_lab_line(ln: str) -> Optional[Dict]:
+    """Parse one stripped line as TEST NAME + VALUE + UNIT (optional) + REF RANGE (optional)."""
+    m = _PAT_A.match(ln) or _PAT_B.match(ln) or _PAT_C.match(ln)
+    if not m:
+        return None
+
+    test = m.group("test").strip()
+    value_raw = m.group("value").strip()
+    value = _to_float(value_raw)
+
+    unit = None
+    if "unit" in m.groupdict() and m.group("unit"):
+        unit = m.group("unit").strip()
+
+    ref_raw = None
+    if "ref" in m.groupdict() and m.group("ref"):
+        ref_raw = m.group("ref").strip()
+
+    low, high = (None, None)
+    if ref_raw:
+        low, high = _parse_ref_range(ref_raw)
+
+    return {
+        "test": test,
+        "value": value,
+        "value_raw": value_raw,
+        "unit": unit,
+        "ref_low": low,
+        "ref_high": high,
+        "ref_raw": ref_raw,
+        "interpretation": _interpret(value, low, high)
+    }
+
+
 def extract_lab_results(text: str) -> List[Dict]:
     """
     Extract as many lab rows as possible from the PDF text.
@@ -64,61 +117,16 @@ def extract_lab_results(text: str) -> List[Dict]:
     lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     seen = set()
 
-    # Pattern A: "Test Name  11.2  g/dL  13.0 - 17.0"
-    pat_a = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s+"
-                       rf"(?P<value>{NUM})\s*"
-                       rf"(?P<unit>{UNIT})?\s+"
-                       rf"(?P<ref>{RANGE}.*)$")
-
-    # Pattern B: "Test Name  110  70 - 99"  (no unit)
-    pat_b = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s+"
-                       rf"(?P<value>{NUM})\s+"
-                       rf"(?P<ref>{RANGE}.*)$")
-
-    # Pattern C: "Test Name : 11.2 g/dL (13-17)"
-    pat_c = re.compile(rf"^(?P<test>[A-Za-z][A-Za-z0-9 ()/.,\-]+?)\s*[:\-]\s*"
-                       rf"(?P<value>{NUM})\s*"
-                       rf"(?P<unit>{UNIT})?\s*"
-                       rf"[\(\[]?(?P<ref>{RANGE}.*)?[\)\]]?$")
-
     for ln in lines:
-        m = pat_a.match(ln) or pat_b.match(ln) or pat_c.match(ln)
-        if not m:
+        row = parse_lab_line(ln)
+        if not row:
             continue
 
-        test = m.group("test").strip()
-        value_raw = m.group("value").strip()
-        value = _to_float(value_raw)
-
-        unit = None
-        if "unit" in m.groupdict() and m.group("unit"):
-            unit = m.group("unit").strip()
-
-        ref_raw = None
-        if "ref" in m.groupdict() and m.group("ref"):
-            ref_raw = m.group("ref").strip()
-
-        low, high = (None, None)
-        if ref_raw:
-            low, high = _parse_ref_range(ref_raw)
-
-        interp = _interpret(value, low, high)
-
-        key = (test.lower(), value_raw, ref_raw or "")
+        key = (row["test"].lower(), row["value_raw"], row["ref_raw"] or "")
         if key in seen:
             continue
         seen.add(key)
-
-        results.append({
-            "test": test,
-            "value": value,
-            "value_raw": value_raw,
-            "unit": unit,
-            "ref_low": low,
-            "ref_high": high,
-            "ref_raw": ref_raw,
-            "interpretation": interp
-        })
+        results.append(row)
 
     return results
 
@@ -152,3 +160,74 @@ def summarize_results(results: List[Dict]) -> Tuple[List[str], str]:
 
     summary = "Abnormal results detected (" + ", ".join(summary_parts) + ")."
     return (flags, summary)
+
+
+# Report dates: "Collected On: 12/03/2023", "Report Date 2023-03-12", "12-Mar-2023"
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+_DATE_ISO = re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b")
+_DATE_NUMERIC = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})\b")
+_DATE_DAY_MONTH = re.compile(r"\b(\d{1,2})[-\s/]*([A-Za-z]{3})[A-Za-z]*[-\s/,]*(\d{4})\b")
+_DATE_MONTH_DAY = re.compile(r"\b([A-Za-z]{3})[A-Za-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b")
+# Header labels, best first: when the specimen was taken, when it was reported,
+# when the lab logged it, then any other "date"
+_DATE_KEYWORDS = [re.compile(p, re.IGNORECASE) for p in (
+    r"collect|sample|specimen|drawn", r"report", r"receiv|regist", r"date")]
+# The patient's birth date is not the report's date
+_DATE_SKIP = re.compile(r"birth|\bdob\b|\bd\.o\.b", re.IGNORECASE)
+# Header fields sharing a line are separated by wide gaps, tabs or bars
+_FIELD_SEP = re.compile(r"\s{3,}|\t|\|")
+
+
+def _make_date(year: int, month: int, day: int) -> Optional[date]:
+    if year < 100:
+        year += 2000
+    try:
+        d = date(year, month, day)
+    except ValueError:
+        return None
+    if d.year < 1990 or d > date.today():
+        return None
+    return d
+
+
+def _dates_in(line: str) -> List[date]:
+    found = []
+    for m in _DATE_ISO.finditer(line):
+        found.append(_make_date(int(m.group(1)), int(m.group(2)), int(m.group(3))))
+    for m in _DATE_NUMERIC.finditer(line):
+        a, b, y = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        # Day-first unless that is impossible (e.g. 03/25/2023)
+        found.append(_make_date(y, b, a) if b <= 12 else _make_date(y, a, b))
+    for m in _DATE_DAY_MONTH.finditer(line):
+        month = _MONTHS.get(m.group(2).lower())
+        if month:
+            found.append(_make_date(int(m.group(3)), month, int(m.group(1))))
+    for m in _DATE_MONTH_DAY.finditer(line):
+        month = _MONTHS.get(m.group(1).lower())
+        if month:
+            found.append(_make_date(int(m.group(3)), month, int(m.group(2))))
+    return [d for d in found if d]
+
+
+def extract_report_date(text: str) -> Optional[str]:
+    """
+    Best-effort report date (YYYY-MM-DD) from lab report text.
+    Each header field is ranked by its label (collection > report > received >
+    any "date" > unlabelled) and the first date of the best field wins; birth
+    dates are ignored. Returns None if nothing plausible is found.
+    """
+    best, best_rank = None, len(_DATE_KEYWORDS)
+    for ln in text.splitlines():
+        for field in _FIELD_SEP.split(ln):
+            if _DATE_SKIP.search(field):
+                continue
+            dates = _dates_in(field)
+            if not dates:
+                continue
+            rank = next((i for i, kw in enumerate(_DATE_KEYWORDS) if kw.search(field)), len(_DATE_KEYWORDS))
+            if rank == 0:
+                return dates[0].isoformat()
+            if best is None or rank < best_rank:
+                best, best_rank = dates[0], rank
+    return best.isoformat() if best else None
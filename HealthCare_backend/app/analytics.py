@@ -0,0 +1,217 @@
+import sqlite3
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Population counters, updated inside the same transaction as the write they
+# describe, so reading them costs the same for 100 patients or 100k:
+#
+#   metric       bucket                  counts
+#   patients     total                   registered patients
+#   lab_status   <test>|<status>         patients whose latest <test> result has <status>
+#   triage       <level>                 symptom checks per triage level
+#   phq9, gad7   <severity>              patients by severity of their latest assessment
+#   bp_week      <ISO week>|<label>      BP readings per week and category
+#
+# Per-patient "latest" values live in analytics_latest so a newer result can
+# move the patient from one bucket to another. recompute() rebuilds both
+# tables from the source rows; verify() reports any drift without writing.
+#
+# Functions take an open connection and never commit: callers own the transaction.
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analytics_counters (
+        metric TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (metric, bucket)
+    );
+
+    CREATE TABLE IF NOT EXISTS analytics_latest (
+        patient_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        as_of TEXT NOT NULL,
+        PRIMARY KEY (patient_id, metric, key)
+    );
+"""
+
+Counts = Dict[Tuple[str, str], int]
+Latest = Dict[Tuple[str, str, str], Tuple[str, str]]  # (patient, metric, key) → (value, as_of)
+
+
+def iso_week(timestamp: str) -> str:
+    year, week, _ = datetime.fromisoformat(timestamp).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _bucket(key: str, value: str) -> str:
+    return f"{key}|{value}" if key else value
+
+
+# ─── Incremental Updates ──────────────────────────────────────────────────────
+
+def _bump(conn: sqlite3.Connection, metric: str, bucket: str, delta: int = 1) -> None:
+    conn.execute(
+        """INSERT INTO analytics_counters (metric, bucket, count) VALUES (?,?,?)
+           ON CONFLICT(metric, bucket) DO UPDATE SET count = count + excluded.count""",
+        (metric, bucket, delta)
+    )
+
+
+def _set_latest(conn: sqlite3.Connection, patient_id: str, metric: str, key: str, value: str, as_of: str) -> None:
+    row = conn.execute(
+        "SELECT value, as_of FROM analytics_latest WHERE patient_id=? AND metric=? AND key=?",
+        (patient_id, metric, key)
+    ).fetchone()
+    if row is not None:
+        if row["as_of"] > as_of:  # backdated write: not the patient's latest
+            return
+        if row["value"] == value:
+            conn.execute("UPDATE analytics_latest SET as_of=? WHERE patient_id=? AND metric=? AND key=?",
+                         (as_of, patient_id, metric, key))
+            return
+        _bump(conn, metric, _bucket(key, row["value"]), -1)
+    conn.execute(
+        "INSERT OR REPLACE INTO analytics_latest (patient_id, metric, key, value, as_of) VALUES (?,?,?,?,?)",
+        (patient_id, metric, key, value, as_of)
+    )
+    _bump(conn, metric, _bucket(key, value))
+
+
+def record_user(conn: sqlite3.Connection, role: str) -> None:
+    if role == "patient":
+        _bump(conn, "patients", "total")
+
+
+def record_lab_results(conn: sqlite3.Connection, results: Iterable[Dict]) -> None:
+    """After inserting lab_results rows (their reports must already be written on `conn`)."""
+    reports: Dict[str, sqlite3.Row] = {}
+    for r in results:
+        report = reports.get(r["report_id"])
+        if report is None:
+            report = reports[r["report_id"]] = conn.execute(
+                "SELECT patient_id, report_date FROM lab_reports WHERE id=?", (r["report_id"],)
+            ).fetchone()
+        _set_latest(conn, report["patient_id"], "lab_status", r["test_name"], r["status"], report["report_date"])
+
+
+def record_triage(conn: sqlite3.Connection, level: str) -> None:
+    _bump(conn, "triage", level)
+
+
+def record_mental(conn: sqlite3.Connection, patient_id: str, assessment_type: str, severity: str, created_at: str) -> None:
+    _set_latest(conn, patient_id, assessment_type, "", severity, created_at)
+
+
+def record_bp(conn: sqlite3.Connection, label: Optional[str], created_at: str) -> None:
+    _bump(conn, "bp_week", _bucket(iso_week(created_at), label or "Normal"))
+
+
+# ─── Full Recompute ───────────────────────────────────────────────────────────
+
+def _replay(conn: sqlite3.Connection) -> Tuple[Counts, Latest]:
+    """Counters as the incremental path would have built them, from the source tables."""
+    counts: Counts = Counter()
+    latest: Latest = {}
+
+    def set_latest(patient_id, metric, key, value, as_of):
+        old = latest.get((patient_id, metric, key))
+        if old is not None:
+            if old[1] > as_of:
+                return
+            counts[(metric, _bucket(key, old[0]))] -= 1
+        latest[(patient_id, metric, key)] = (value, as_of)
+        counts[(metric, _bucket(key, value))] += 1
+
+    counts[("patients", "total")] = conn.execute(
+        "SELECT COUNT(*) FROM users WHERE role='patient'").fetchone()[0]
+    for row in conn.execute(
+        """SELECT r.patient_id, r.report_date, x.test_name, x.status
+           FROM lab_results x JOIN lab_reports r ON x.report_id = r.id
+           ORDER BY x.rowid"""
+    ):
+        set_latest(row["patient_id"], "lab_status", row["test_name"], row["status"], row["report_date"])
+    for row in conn.execute("SELECT triage_level, COUNT(*) AS n FROM symptom_checks GROUP BY triage_level"):
+        counts[("triage", row["triage_level"])] += row["n"]
+    for row in conn.execute("SELECT patient_id, type, severity, created_at FROM mental_assessments ORDER BY rowid"):
+        set_latest(row["patient_id"], row["type"], "", row["severity"], row["created_at"])
+    for row in conn.execute("SELECT flag_label, created_at FROM chronic_logs WHERE type='blood_pressure'"):
+        counts[("bp_week", _bucket(iso_week(row["created_at"]), row["flag_label"] or "Normal"))] += 1
+    return {k: v for k, v in counts.items() if v}, latest
+
+
+def _stored(conn: sqlite3.Connection) -> Counts:
+    return {(r["metric"], r["bucket"]): r["count"]
+            for r in conn.execute("SELECT metric, bucket, count FROM analytics_counters WHERE count != 0")}
+
+
+def verify(conn: sqlite3.Connection) -> List[Dict]:
+    """Buckets whose stored count differs from a full recompute."""
+    expected, _latest = _replay(conn)
+    stored = _stored(conn)
+    return [{"metric": m, "bucket": b, "stored": stored.get((m, b), 0), "expected": expected.get((m, b), 0)}
+            for m, b in sorted(set(expected) | set(stored))
+            if stored.get((m, b), 0) != expected.get((m, b), 0)]
+
+
+def recompute(conn: sqlite3.Connection) -> int:
+    """Replace the counters with a full recompute; returns the number of buckets written."""
+    counts, latest = _replay(conn)
+    conn.execute("DELETE FROM analytics_counters")
+    conn.execute("DELETE FROM analytics_latest")
+    conn.executemany("INSERT INTO analytics_counters (metric, bucket, count) VALUES (?,?,?)",
+                     [(m, b, n) for (m, b), n in counts.items()])
+    conn.executemany("INSERT INTO analytics_latest (patient_id, metric, key, value, as_of) VALUES (?,?,?,?,?)",
+                     [(p, m, k, v, t) for (p, m, k), (v, t) in latest.items()])
+    return len(counts)
+
+
+# ─── Reads ────────────────────────────────────────────────────────────────────
+
+def cohort(conn: sqlite3.Connection, weeks: int = 12, today: Optional[date] = None) -> Dict:
+    """Population view from the counters alone (no per-patient rows are read)."""
+    since = iso_week(((today or date.today()) - timedelta(weeks=weeks - 1)).isoformat())
+    rows = conn.execute(
+        """SELECT metric, bucket, count FROM analytics_counters
+           WHERE count != 0 AND (metric != 'bp_week' OR bucket >= ?)""",
+        (since,)
+    ).fetchall()
+
+    patients = 0
+    labs: Dict[str, Dict[str, int]] = {}
+    triage: Dict[str, int] = {}
+    mental: Dict[str, Dict[str, int]] = {"phq9": {}, "gad7": {}}
+    bp: Dict[str, Dict[str, int]] = {}
+    for metric, bucket, count in rows:
+        if metric == "patients":
+            patients = count
+        elif metric == "lab_status":
+            test, status = bucket.rsplit("|", 1)
+            labs.setdefault(test, {})[status] = count
+        elif metric == "triage":
+            triage[bucket] = count
+        elif metric in mental:
+            mental[metric][bucket] = count
+        elif metric == "bp_week":
+            week, label = bucket.split("|", 1)
+            bp.setdefault(week, {})[label] = count
+
+    deficiency = []
+    for test, statuses in labs.items():
+        tested = sum(statuses.values())
+        deficiency.append({
+            "test": test, "patients_tested": tested,
+            "low": statuses.get("low", 0), "high": statuses.get("high", 0), "normal": statuses.get("normal", 0),
+            "prevalence": round(statuses.get("low", 0) / tested, 4) if tested else 0.0,
+        })
+    deficiency.sort(key=lambda d: (-d["prevalence"], d["test"]))
+    return {
+        "patients": patients,
+        "deficiency_prevalence": deficiency,
+        "triage_levels": triage,
+        "phq9_severity": mental["phq9"],
+        "gad7_severity": mental["gad7"],
+        "bp_by_week": [{"week": w, "categories": bp[w]} for w in sorted(bp)],
+    }
@@ -1,16 +1,18 @@
+import hmac
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from jose import JWTError, jwt
 import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "caresphere-dev-secret-change-in-production-2024")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -91,3 +93,13 @@ def require_role(role: str):
             )
         return current_user
     return _dep
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """FastAPI dependency: requires an X-Admin-Key header matching ADMIN_API_KEY."""
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return True
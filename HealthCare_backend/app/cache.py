@@ -0,0 +1,114 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from . import metrics
+
+# In-process LRU cache with a per-entry TTL. Entries are evicted
+# least-recently-used once `max_entries` or `max_bytes` is exceeded; expired
+# entries are dropped when they are next looked up. `on_evict(key)` is called
+# (under the cache lock, so it must not call back into the cache) whenever an
+# entry leaves by eviction, expiry or delete(). Each cache exports, under its
+# name:
+#   counters  <name>.hits / .misses / .evictions / .expired
+#   gauges    <name>.entries / .bytes (estimated) / .hit_ratio
+
+_MISSING = object()
+
+
+def approx_size(obj: Any) -> int:
+    """Rough deep size of plain data (tuples, lists, dicts, numbers, strings, numpy arrays)."""
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes + 112
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class TTLCache:
+    def __init__(self, name: str, max_entries: int = 10000, ttl_s: float = 3600,
+                 max_bytes: Optional[int] = None, size_fn: Callable[[Any, Any], int] = None,
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn or (lambda k, v: approx_size(k) + approx_size(v))
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key → (expires_at, value, size)
+        self._bytes = 0
+        self._hits = 0
+        self._lookups = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        """Live entry present? Doesn't count as a lookup or refresh recency."""
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[0] >= time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, key, notify: bool = True) -> None:
+        _expires, _value, size = self._data.pop(key)
+        self._bytes -= size
+        if notify and self.on_evict is not None:
+            self.on_evict(key)
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.entries", len(self._data))
+        metrics.set_gauge(f"{self.name}.bytes", self._bytes)
+        metrics.set_gauge(f"{self.name}.hit_ratio", self._hits / self._lookups if self._lookups else 0.0)
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._lookups += 1
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] < time.monotonic():
+                self._drop(key)
+                metrics.incr(f"{self.name}.expired")
+                entry = _MISSING
+            if entry is _MISSING:
+                metrics.incr(f"{self.name}.misses")
+                self._publish()
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            metrics.incr(f"{self.name}.hits")
+            self._publish()
+            return entry[1]
+
+    def put(self, key, value, ttl_s: Optional[float] = None) -> None:
+        size = self.size_fn(key, value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key, notify=False)
+            self._data[key] = (time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s), value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1):
+                self._drop(next(iter(self._data)))
+                metrics.incr(f"{self.name}.evictions")
+            self._publish()
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+                self._publish()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._publish()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import cache, metrics
+
+# Reply cache for general questions. Only requests without patient context
+# and without earlier user turns are cacheable: their prompt is the shared
+# system prompt plus one question, so the answer does not depend on who asked.
+# Questions are normalized (case, punctuation, whitespace) before lookup.
+# Besides the TTLCache metrics (chat_cache.hits / misses / hit_ratio / ...),
+# chat_cache.seconds_saved adds up the generation time each hit avoided.
+
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "2000"))
+CHAT_CACHE_TTL_S = float(os.getenv("CHAT_CACHE_TTL_S", str(24 * 3600)))
+CHAT_CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CHAT_CACHE_WARM = os.getenv("CHAT_CACHE_WARM", "0") == "1"
+
+Message = Dict[str, str]
+
+_PUNCT_RE = re.compile(r"[^\w\s%/.+-]|(?<!\d)[.](?!\d)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """'What does LOW ferritin mean??' → 'what does low ferritin mean' (decimals like 6.5 are kept)."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text)).strip()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CHAT_CACHE_SIZE, ttl_s: float = CHAT_CACHE_TTL_S,
+                 max_bytes: int = CHAT_CACHE_MAX_BYTES):
+        # key → (reply, seconds it took to generate)
+        self._cache = cache.TTLCache("chat_cache", max_entries, ttl_s, max_bytes=max_bytes)
+
+    @staticmethod
+    def key(messages: List[Message], model: str) -> Optional[Tuple[str, str, str]]:
+        """Cache key for a system prompt + single question, None if the prompt isn't cacheable."""
+        if not messages or messages[0]["role"] != "system" or messages[-1]["role"] != "user":
+            return None
+        # Assistant turns before the question (the chat page's greeting) don't change its meaning
+        if any(m["role"] != "assistant" for m in messages[1:-1]):
+            return None
+        question = normalize_question(messages[-1]["content"])
+        if not question:
+            return None
+        system = hashlib.sha256(messages[0]["content"].encode()).hexdigest()[:16]
+        return model, system, question
+
+    def get(self, key: Optional[Tuple]) -> Optional[str]:
+        if key is None:
+            metrics.incr("chat_cache.uncacheable")
+            return None
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        reply, seconds = entry
+        metrics.incr("chat_cache.seconds_saved", seconds)
+        return reply
+
+    def put(self, key: Optional[Tuple], reply: str, seconds: float) -> None:
+        if key is not None and reply:
+            self._cache.put(key, (reply, seconds))
+
+    def __contains__(self, key) -> bool:
+        return key is not None and key in self._cache
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+def warm_questions(lab_ranges: Dict[str, Dict]) -> List[str]:
+    """The general questions behind each lab explanation topic."""
+    questions = []
+    for test, spec in lab_ranges.items():
+        if not spec.get("explanation"):
+            continue
+        questions += [f"What does low {test} mean?", f"What does high {test} mean?"]
+    return questions
+
+
+async def warm(response_cache: ResponseCache, prompts: Iterable[List[Message]], model: str,
+               generate: Callable[[List[Message]], Awaitable[str]]) -> int:
+    """Generate and cache replies for `prompts` one at a time; returns how many were added."""
+    added = 0
+    for messages in prompts:
+        key = ResponseCache.key(messages, model)
+        if key is None or key in response_cache:
+            continue
+        start = time.perf_counter()
+        try:
+            reply = await generate(messages)
+        except Exception:
+            metrics.incr("chat_cache.warm_errors")
+            continue
+        response_cache.put(key, reply, time.perf_counter() - start)
+        added += 1
+    metrics.incr("chat_cache.warmed", added)
+    return added
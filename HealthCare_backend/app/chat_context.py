@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import cache, metrics
+
+# Keeps chat prompts bounded. The newest turns that fit CHAT_HISTORY_TOKENS
+# are sent verbatim; everything older is replaced by one summary message.
+# Summaries are cached per conversation and extended in the background as
+# turns fall out of the window, so a turn never waits on summarization:
+# until the background update lands, the newly evicted turns are represented
+# by a cheap extractive digest instead.
+
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "1500"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+CHAT_SUMMARY_TTL_S = float(os.getenv("CHAT_SUMMARY_TTL_S", str(6 * 3600)))
+CHAT_SUMMARY_MAX_ENTRIES = int(os.getenv("CHAT_SUMMARY_MAX_ENTRIES", "5000"))
+
+Message = Dict[str, str]
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_MESSAGE_OVERHEAD = 4  # role + separators in chat formats
+
+
+def estimate_tokens(text: str) -> int:
+    """BPE-ish estimate without a tokenizer: ~4 characters per word piece, 1 per punctuation mark."""
+    return sum(max(1, math.ceil(len(t) / 4)) if t[0].isalnum() or t[0] == "_" else 1
+               for t in _TOKEN_RE.findall(text))
+
+
+def message_tokens(m: Message) -> int:
+    return _MESSAGE_OVERHEAD + estimate_tokens(m["content"])
+
+
+def _truncate_tokens(text: str, budget: int) -> str:
+    """Keep the tail of `text` within roughly `budget` tokens (recent context matters most)."""
+    if estimate_tokens(text) <= budget:
+        return text
+    lines = text.splitlines()
+    kept: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:  # one oversized line: keep its end
+        return lines[-1][-budget * 4:]
+    return "\n".join(reversed(kept))
+
+
+def _fingerprint(messages: List[Message]) -> str:
+    h = hashlib.sha256()
+    for m in messages:
+        h.update(m["role"].encode())
+        h.update(b"\0")
+        h.update(m["content"].encode())
+        h.update(b"\1")
+    return h.hexdigest()
+
+
+def transcript(messages: List[Message]) -> str:
+    return "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+
+
+def extractive_summary(messages: List[Message]) -> str:
+    """First sentence of each turn; used until an LLM summary covers these turns."""
+    lines = []
+    for m in messages:
+        first = _SENTENCE_RE.split(m["content"].strip(), maxsplit=1)[0]
+        lines.append(f"{'User' if m['role'] == 'user' else 'Assistant'}: {first[:200]}")
+    return "\n".join(lines)
+
+
+def split_point(history: List[Message], budget: int) -> int:
+    """Index of the first message that fits in the window (the last message always does)."""
+    used = 0
+    for i in range(len(history) - 1, -1, -1):
+        used += message_tokens(history[i])
+        if used > budget and i < len(history) - 1:
+            return i + 1
+    return 0
+
+
+class ConversationWindow:
+    def __init__(self, summarize: Optional[Callable[[str], Awaitable[str]]] = None,
+                 history_tokens: int = CHAT_HISTORY_TOKENS, summary_tokens: int = CHAT_SUMMARY_TOKENS):
+        self.summarize = summarize
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        # conversation key → {"covered", "fingerprint", "summary"}
+        self._summaries = cache.TTLCache("chat_summary", CHAT_SUMMARY_MAX_ENTRIES, CHAT_SUMMARY_TTL_S)
+        self._pending: Dict[Tuple, asyncio.Task] = {}
+
+    def _cached(self, key: Optional[Tuple], history: List[Message]) -> Tuple[str, int]:
+        """(summary text, number of leading messages it covers) if still valid for this history."""
+        if key is None:
+            return "", 0
+        entry = self._summaries.get(key)
+        if entry is None or entry["covered"] >= len(history) \
+                or _fingerprint(history[:entry["covered"]]) != entry["fingerprint"]:
+            return "", 0
+        return entry["summary"], entry["covered"]
+
+    def build(self, key: Optional[Tuple], system: List[Message], history: List[Message]) -> List[Message]:
+        """Prompt messages: system + (summary of older turns) + newest turns within budget."""
+        summary, covered = self._cached(key, history)
+        # Turns already folded into the summary stay there even if the window could fit them again
+        cut = max(split_point(history, self.history_tokens), covered)
+        older, recent = history[:cut], history[cut:]
+        metrics.observe("chat_context.history_tokens", sum(message_tokens(m) for m in history))
+        if not older:
+            metrics.observe("chat_context.prompt_tokens", sum(message_tokens(m) for m in recent))
+            return system + recent
+
+        metrics.incr("chat_context.summary_hits" if covered else "chat_context.summary_misses")
+        uncovered = older[covered:]
+        parts = [p for p in (summary, extractive_summary(uncovered) if uncovered else "") if p]
+        text = _truncate_tokens("\n".join(parts), self.summary_tokens)
+        if uncovered and key is not None and self.summarize is not None:
+            self._schedule(key, older, summary)
+
+        summary_msg = {"role": "system", "content": "Summary of the earlier conversation:\n" + text}
+        messages = system + [summary_msg] + recent
+        metrics.observe("chat_context.prompt_tokens",
+                        sum(message_tokens(m) for m in [summary_msg] + recent))
+        metrics.incr("chat_context.turns_summarized", len(older))
+        return messages
+
+    def _schedule(self, key: Tuple, older: List[Message], previous: str) -> None:
+        if key in self._pending:
+            return
+        task = asyncio.get_running_loop().create_task(self._update(key, list(older), previous))
+        self._pending[key] = task
+        task.add_done_callback(lambda _t: self._pending.pop(key, None))
+
+    async def _update(self, key: Tuple, older: List[Message], previous: str) -> None:
+        entry = self._summaries.get(key)
+        covered = entry["covered"] if entry and entry["fingerprint"] == _fingerprint(older[:entry["covered"]]) else 0
+        prompt = (f"Summary so far:\n{previous}\n\n" if previous and covered else "") + \
+            "New conversation turns:\n" + transcript(older[covered:])
+        try:
+            with metrics.timer("chat_context.summary_seconds"):
+                summary = await self.summarize(prompt)
+        except Exception:
+            # Saturated or failing provider: keep serving the extractive digest
+            metrics.incr("chat_context.summary_errors")
+            return
+        self._summaries.put(key, {
+            "covered": len(older),
+            "fingerprint": _fingerprint(older),
+            "summary": _truncate_tokens(summary.strip(), self.summary_tokens),
+        })
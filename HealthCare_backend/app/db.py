@@ -1,7 +1,10 @@
 import sqlite3
 import json
 import os
-from typing import Any, Dict, List, Optional
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import analytics
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "app", "healthcare.db")
 
@@ -46,7 +49,8 @@ def init_db() -> None:
             id TEXT PRIMARY KEY,
             patient_id TEXT NOT NULL REFERENCES users(id),
             report_date TEXT NOT NULL,
-            created_at TEXT NOT NULL
+            created_at TEXT NOT NULL,
+            file_sha256 TEXT
         );
 
         CREATE TABLE IF NOT EXISTS lab_results (
@@ -122,11 +126,146 @@ def init_db() -> None:
             user_id TEXT NOT NULL REFERENCES users(id),
             expires_at TEXT NOT NULL
         );
+
+        CREATE TABLE IF NOT EXISTS lab_extraction_cache (
+            sha256 TEXT NOT NULL,
+            parser_version TEXT NOT NULL,
+            results_json TEXT NOT NULL,
+            report_date TEXT,
+            page_count INTEGER,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (sha256, parser_version)
+        );
+
+        CREATE TABLE IF NOT EXISTS resource_versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
     """)
+    # Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them
+    _ensure_column(conn, "lab_reports", "file_sha256", "TEXT")
+    _ensure_column(conn, "lab_extraction_cache", "report_date", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lab_reports_patient_sha ON lab_reports(patient_id, file_sha256)")
+    # "Latest value per patient" lookups (doctor risk panel)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lab_reports_patient_date ON lab_reports(patient_id, report_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lab_results_report_test ON lab_results(report_id, test_name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chronic_logs_patient_created ON chronic_logs(patient_id, created_at)")
+    _init_patient_search(conn)
+    cur.executescript(analytics.SCHEMA)
+    if conn.execute("SELECT 1 FROM analytics_counters LIMIT 1").fetchone() is None:
+        analytics.recompute(conn)  # first start with analytics: build from existing rows
     conn.commit()
     conn.close()
 
 
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# ─── Resource Versions ────────────────────────────────────────────────────────
+
+# Change counters behind the ETags of the read endpoints: every write to a
+# patient's data bumps "patient:<id>" in the same transaction, and changes to
+# the doctor directory bump "doctors". Listeners registered with on_change()
+# hear about each bump (the response cache drops its copies).
+
+_change_listeners: List[Callable[[Tuple[str, ...]], None]] = []
+
+
+def on_change(listener: Callable[[Tuple[str, ...]], None]) -> None:
+    _change_listeners.append(listener)
+
+
+# Bumped by writes that change an input of the doctor's diabetes risk panel
+# (profiles, lab results, BP logs, new patients)
+DIABETES_PANEL_SCOPE = "diabetes_panel"
+
+
+def patient_scope(patient_id: str) -> str:
+    return f"patient:{patient_id}"
+
+
+def _touch(conn: sqlite3.Connection, *scopes: str) -> None:
+    # A new scope starts at a random version, so a recreated database can't re-issue old ETags
+    conn.executemany(
+        """INSERT INTO resource_versions (scope, version) VALUES (?, abs(random() % 1000000000))
+           ON CONFLICT(scope) DO UPDATE SET version = version + 1""",
+        [(s,) for s in scopes]
+    )
+    for listener in _change_listeners:
+        listener(scopes)
+
+
+def get_resource_version(scope: str) -> int:
+    conn = get_conn()
+    row = conn.execute("SELECT version FROM resource_versions WHERE scope=?", (scope,)).fetchone()
+    conn.close()
+    return row["version"] if row else 0
+
+
+def _init_patient_search(conn: sqlite3.Connection) -> None:
+    """FTS5 index over patients, linked to users.id and kept current by triggers.
+
+    The link is an UNINDEXED user_id column rather than users.rowid, which
+    VACUUM is free to renumber (users has a TEXT primary key).
+    """
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(patient_search)")}
+    if cols and "user_id" not in cols:
+        # Index from a build that keyed it on users.rowid: rebuild it below
+        conn.executescript("""
+            DROP TRIGGER IF EXISTS patient_search_user_ins;
+            DROP TRIGGER IF EXISTS patient_search_user_upd;
+            DROP TRIGGER IF EXISTS patient_search_user_del;
+            DROP TRIGGER IF EXISTS patient_search_profile_ins;
+            DROP TRIGGER IF EXISTS patient_search_profile_upd;
+            DROP TABLE patient_search;
+        """)
+    conn.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS patient_search USING fts5(
+            user_id UNINDEXED, name, email, profile,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS patient_search_user_ins AFTER INSERT ON users
+        WHEN NEW.role = 'patient' BEGIN
+            INSERT INTO patient_search (user_id, name, email, profile) VALUES (NEW.id, NEW.name, NEW.email, '');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS patient_search_user_upd AFTER UPDATE OF name, email ON users
+        WHEN NEW.role = 'patient' BEGIN
+            UPDATE patient_search SET name = NEW.name, email = NEW.email WHERE user_id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS patient_search_user_del AFTER DELETE ON users BEGIN
+            DELETE FROM patient_search WHERE user_id = OLD.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS patient_search_profile_ins AFTER INSERT ON patient_profiles BEGIN
+            UPDATE patient_search SET profile = trim(coalesce(NEW.gender, '') || ' ' || coalesce(NEW.age, ''))
+            WHERE user_id = NEW.user_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS patient_search_profile_upd AFTER UPDATE ON patient_profiles BEGIN
+            UPDATE patient_search SET profile = trim(coalesce(NEW.gender, '') || ' ' || coalesce(NEW.age, ''))
+            WHERE user_id = NEW.user_id;
+        END;
+    """)
+    # Backfill patients written before the index existed (or by a build without it)
+    indexed = conn.execute("SELECT COUNT(*) FROM patient_search").fetchone()[0]
+    patients = conn.execute("SELECT COUNT(*) FROM users WHERE role = 'patient'").fetchone()[0]
+    if indexed != patients:
+        conn.execute("DELETE FROM patient_search")
+        conn.execute(
+            """INSERT INTO patient_search (user_id, name, email, profile)
+               SELECT u.id, u.name, u.email, trim(coalesce(p.gender, '') || ' ' || coalesce(p.age, ''))
+               FROM users u LEFT JOIN patient_profiles p ON u.id = p.user_id
+               WHERE u.role = 'patient'"""
+        )
+
+
 # ─── Users ───────────────────────────────────────────────────────────────────
 
 def create_user(user: Dict[str, Any]) -> None:
@@ -135,6 +274,11 @@ def create_user(user: Dict[str, Any]) -> None:
         "INSERT INTO users (id, name, email, password_hash, role, created_at) VALUES (?,?,?,?,?,?)",
         (user["id"], user["name"], user["email"], user["password_hash"], user["role"], user["created_at"])
     )
+    analytics.record_user(conn, user["role"])
+    if user["role"] == "doctor":
+        _touch(conn, "doctors")
+    else:
+        _touch(conn, DIABETES_PANEL_SCOPE)
     conn.commit()
     conn.close()
 
@@ -167,6 +311,38 @@ def list_patients() -> List[Dict]:
     return [dict(r) for r in rows]
 
 
+def _fts_query(text: str) -> str:
+    """User input → FTS5 query: every word must match as a prefix ('jan do' → "jan"* AND "do"*)."""
+    words = re.findall(r"\w+", text.lower())
+    return " AND ".join(f'"{w}"*' for w in words)
+
+
+def search_patients(text: str, offset: int = 0, limit: int = 20) -> Dict:
+    """Ranked prefix search over patient name, email and profile (gender, age)."""
+    match = _fts_query(text)
+    if not match:
+        return {"total": 0, "items": []}
+    conn = get_conn()
+    total = conn.execute(
+        "SELECT COUNT(*) FROM patient_search WHERE patient_search MATCH ?", (match,)
+    ).fetchone()[0]
+    # bm25 weights: name > email > profile (lower score = better match)
+    rows = conn.execute(
+        """SELECT u.id, u.name, u.email, u.created_at,
+                  p.age, p.gender, p.height_cm, p.weight_kg,
+                  bm25(patient_search, 0.0, 10.0, 4.0, 1.0) AS score
+           FROM patient_search s
+           JOIN users u ON u.id = s.user_id
+           LEFT JOIN patient_profiles p ON u.id = p.user_id
+           WHERE patient_search MATCH ?
+           ORDER BY score, u.name
+           LIMIT ? OFFSET ?""",
+        (match, limit, offset)
+    ).fetchall()
+    conn.close()
+    return {"total": total, "items": [dict(r) for r in rows]}
+
+
 def list_doctors() -> List[Dict]:
     conn = get_conn()
     rows = conn.execute(
@@ -193,6 +369,7 @@ def upsert_patient_profile(data: Dict[str, Any]) -> None:
         (data["user_id"], data.get("age"), data.get("gender"),
          data.get("height_cm"), data.get("weight_kg"), data["updated_at"])
     )
+    _touch(conn, patient_scope(data["user_id"]), DIABETES_PANEL_SCOPE)
     conn.commit()
     conn.close()
 
@@ -210,6 +387,7 @@ def create_doctor_profile(data: Dict[str, Any]) -> None:
         "INSERT OR IGNORE INTO doctors (user_id, specialization, created_at) VALUES (?,?,?)",
         (data["user_id"], data.get("specialization", "General Practice"), data["created_at"])
     )
+    _touch(conn, "doctors")
     conn.commit()
     conn.close()
 
@@ -219,9 +397,10 @@ def create_doctor_profile(data: Dict[str, Any]) -> None:
 def create_lab_report(report: Dict) -> None:
     conn = get_conn()
     conn.execute(
-        "INSERT INTO lab_reports (id, patient_id, report_date, created_at) VALUES (?,?,?,?)",
-        (report["id"], report["patient_id"], report["report_date"], report["created_at"])
+        "INSERT INTO lab_reports (id, patient_id, report_date, created_at, file_sha256) VALUES (?,?,?,?,?)",
+        (report["id"], report["patient_id"], report["report_date"], report["created_at"], report.get("file_sha256"))
     )
+    _touch(conn, patient_scope(report["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -233,6 +412,14 @@ def add_lab_results(results: List[Dict]) -> None:
         [(r["id"], r["report_id"], r["test_name"], r["value"], r.get("unit"),
           r["status"], r.get("ref_range_low"), r.get("ref_range_high")) for r in results]
     )
+    analytics.record_lab_results(conn, results)
+    report_ids = list({r["report_id"] for r in results})
+    if report_ids:
+        rows = conn.execute(
+            f"SELECT DISTINCT patient_id FROM lab_reports WHERE id IN ({','.join('?' * len(report_ids))})",
+            report_ids
+        ).fetchall()
+        _touch(conn, DIABETES_PANEL_SCOPE, *(patient_scope(r["patient_id"]) for r in rows))
     conn.commit()
     conn.close()
 
@@ -255,6 +442,68 @@ def get_lab_reports(patient_id: str) -> List[Dict]:
     return out
 
 
+def create_lab_reports_batch(reports: List[Dict]) -> None:
+    """Insert several reports and their results atomically (all or nothing)."""
+    conn = get_conn()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO lab_reports (id, patient_id, report_date, created_at, file_sha256) VALUES (?,?,?,?,?)",
+                [(r["id"], r["patient_id"], r["report_date"], r["created_at"], r.get("file_sha256")) for r in reports]
+            )
+            conn.executemany(
+                "INSERT INTO lab_results (id, report_id, test_name, value, unit, status, ref_range_low, ref_range_high) VALUES (?,?,?,?,?,?,?,?)",
+                [(x["id"], x["report_id"], x["test_name"], x["value"], x.get("unit"),
+                  x["status"], x.get("ref_range_low"), x.get("ref_range_high"))
+                 for r in reports for x in r["results"]]
+            )
+            analytics.record_lab_results(conn, [x for r in reports for x in r["results"]])
+            _touch(conn, DIABETES_PANEL_SCOPE, *{patient_scope(r["patient_id"]) for r in reports})
+    finally:
+        conn.close()
+
+
+def find_lab_report_by_hash(patient_id: str, sha256: str) -> Optional[Dict]:
+    conn = get_conn()
+    rpt = conn.execute(
+        "SELECT * FROM lab_reports WHERE patient_id=? AND file_sha256=? ORDER BY created_at LIMIT 1",
+        (patient_id, sha256)
+    ).fetchone()
+    if not rpt:
+        conn.close()
+        return None
+    rpt_dict = dict(rpt)
+    rows = conn.execute("SELECT * FROM lab_results WHERE report_id=?", (rpt_dict["id"],)).fetchall()
+    conn.close()
+    rpt_dict["results"] = [dict(r) for r in rows]
+    return rpt_dict
+
+
+def get_cached_extraction(sha256: str, parser_version: str) -> Optional[Dict]:
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT * FROM lab_extraction_cache WHERE sha256=? AND parser_version=?",
+        (sha256, parser_version)
+    ).fetchone()
+    conn.close()
+    if not row:
+        return None
+    d = dict(row)
+    d["results"] = json.loads(d["results_json"])
+    return d
+
+
+def store_cached_extraction(data: Dict) -> None:
+    conn = get_conn()
+    conn.execute(
+        "INSERT OR REPLACE INTO lab_extraction_cache (sha256, parser_version, results_json, report_date, page_count, created_at) VALUES (?,?,?,?,?,?)",
+        (data["sha256"], data["parser_version"], json.dumps(data["results"]), data.get("report_date"),
+         data.get("page_count"), data["created_at"])
+    )
+    conn.commit()
+    conn.close()
+
+
 # ─── Lifestyle ────────────────────────────────────────────────────────────────
 
 def create_lifestyle_assessment(data: Dict) -> None:
@@ -263,6 +512,7 @@ def create_lifestyle_assessment(data: Dict) -> None:
         "INSERT INTO lifestyle_assessments (id, patient_id, answers_json, score, category, created_at) VALUES (?,?,?,?,?,?)",
         (data["id"], data["patient_id"], json.dumps(data["answers"]), data["score"], data["category"], data["created_at"])
     )
+    _touch(conn, patient_scope(data["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -286,6 +536,8 @@ def create_symptom_check(data: Dict) -> None:
         (data["id"], data["patient_id"], json.dumps(data["symptoms"]), data["score"],
          data["triage_level"], data.get("severity", 3), data.get("duration", "1_to_3"), data["created_at"])
     )
+    analytics.record_triage(conn, data["triage_level"])
+    _touch(conn, patient_scope(data["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -309,6 +561,8 @@ def create_mental_assessment(data: Dict) -> None:
         (data["id"], data["patient_id"], data["type"], data["score"],
          data["severity"], json.dumps(data["answers"]), data["created_at"])
     )
+    analytics.record_mental(conn, data["patient_id"], data["type"], data["severity"], data["created_at"])
+    _touch(conn, patient_scope(data["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -338,6 +592,9 @@ def create_chronic_log(data: Dict) -> None:
         (data["id"], data["patient_id"], data.get("type", "blood_pressure"),
          json.dumps(data["value"]), int(data["flagged"]), data.get("flag_label"), data["created_at"])
     )
+    if data.get("type", "blood_pressure") == "blood_pressure":
+        analytics.record_bp(conn, data.get("flag_label"), data["created_at"])
+    _touch(conn, patient_scope(data["patient_id"]), DIABETES_PANEL_SCOPE)
     conn.commit()
     conn.close()
 
@@ -360,6 +617,7 @@ def create_meal_plan(data: Dict) -> None:
         "INSERT INTO meal_plans (id, patient_id, plan_json, created_at) VALUES (?,?,?,?)",
         (data["id"], data["patient_id"], json.dumps(data["plan"]), data["created_at"])
     )
+    _touch(conn, patient_scope(data["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -387,6 +645,7 @@ def book_appointment(data: Dict) -> None:
         (data["id"], data["patient_id"], data["doctor_id"],
          data["slot_datetime"], "confirmed", data["created_at"])
     )
+    _touch(conn, patient_scope(data["patient_id"]))
     conn.commit()
     conn.close()
 
@@ -397,6 +656,8 @@ def cancel_appointment(appt_id: str, patient_id: str) -> bool:
         "UPDATE appointments SET status='cancelled' WHERE id=? AND patient_id=? AND status='confirmed'",
         (appt_id, patient_id)
     )
+    if cur.rowcount:
+        _touch(conn, patient_scope(patient_id))
     conn.commit()
     conn.close()
     return cur.rowcount > 0
@@ -544,3 +805,164 @@ def get_dashboard_summary(patient_id: str) -> Dict:
         "last_chronic_flag_label": chronic["flag_label"] if chronic and chronic["flagged"] else None,
         "next_appointment": dict(appt) if appt else None,
     }
+
+
+# ─── Patient Snapshot ─────────────────────────────────────────────────────────
+
+SNAPSHOT_SECTIONS = ("labs", "lifestyle", "symptoms", "mental", "chronic", "appointments")
+
+
+def get_patient_snapshot(patient_id: str, limits: Optional[Dict[str, int]] = None) -> Optional[Dict]:
+    """Everything on the doctor's patient page, read on one connection in one transaction.
+
+    `limits` caps a section to its newest N rows (appointments: the latest N
+    slots, still returned in slot order); `counts` always has the full totals.
+    Returns None if the id isn't a patient.
+    """
+    limits = limits or {}
+    unknown = set(limits) - set(SNAPSHOT_SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown snapshot sections: {', '.join(sorted(unknown))}")
+
+    def cap(section: str) -> int:
+        return limits.get(section) or -1  # SQLite: LIMIT -1 = no limit
+
+    conn = get_conn()
+    try:
+        # Deferred BEGIN: the snapshot is fixed by the first read, so later
+        # commits by other connections don't show up halfway through.
+        conn.execute("BEGIN")
+        user = conn.execute(
+            "SELECT id, name, email, role FROM users WHERE id=?", (patient_id,)
+        ).fetchone()
+        if not user or user["role"] != "patient":
+            return None
+        profile = conn.execute("SELECT * FROM patient_profiles WHERE user_id=?", (patient_id,)).fetchone()
+
+        reports = [dict(r) for r in conn.execute(
+            "SELECT * FROM lab_reports WHERE patient_id=? ORDER BY report_date DESC, id LIMIT ?",
+            (patient_id, cap("labs"))
+        ).fetchall()]
+        by_report: Dict[str, List[Dict]] = {r["id"]: [] for r in reports}
+        if reports:
+            rows = conn.execute(
+                """SELECT * FROM lab_results WHERE report_id IN (
+                     SELECT id FROM lab_reports WHERE patient_id=? ORDER BY report_date DESC, id LIMIT ?)""",
+                (patient_id, cap("labs"))
+            ).fetchall()
+            for row in rows:
+                by_report[row["report_id"]].append(dict(row))
+        for r in reports:
+            r["results"] = by_report[r["id"]]
+
+        lifestyle = conn.execute(
+            "SELECT * FROM lifestyle_assessments WHERE patient_id=? ORDER BY created_at DESC LIMIT ?",
+            (patient_id, cap("lifestyle"))
+        ).fetchall()
+        symptoms = conn.execute(
+            "SELECT * FROM symptom_checks WHERE patient_id=? ORDER BY created_at DESC LIMIT ?",
+            (patient_id, cap("symptoms"))
+        ).fetchall()
+        mental = conn.execute(
+            "SELECT * FROM mental_assessments WHERE patient_id=? ORDER BY created_at DESC LIMIT ?",
+            (patient_id, cap("mental"))
+        ).fetchall()
+        chronic = conn.execute(
+            "SELECT * FROM chronic_logs WHERE patient_id=? ORDER BY created_at DESC LIMIT ?",
+            (patient_id, cap("chronic"))
+        ).fetchall()
+        meal_plan = conn.execute(
+            "SELECT * FROM meal_plans WHERE patient_id=? ORDER BY created_at DESC LIMIT 1",
+            (patient_id,)
+        ).fetchone()
+        appointments = conn.execute(
+            """SELECT a.*, u.name as doctor_name, d.specialization
+               FROM appointments a
+               JOIN users u ON a.doctor_id = u.id
+               JOIN doctors d ON a.doctor_id = d.user_id
+               WHERE a.patient_id=? ORDER BY a.slot_datetime DESC LIMIT ?""",
+            (patient_id, cap("appointments"))
+        ).fetchall()
+        counts = conn.execute(
+            """SELECT
+                 (SELECT COUNT(*) FROM lab_reports WHERE patient_id=:p) AS labs,
+                 (SELECT COUNT(*) FROM lifestyle_assessments WHERE patient_id=:p) AS lifestyle,
+                 (SELECT COUNT(*) FROM symptom_checks WHERE patient_id=:p) AS symptoms,
+                 (SELECT COUNT(*) FROM mental_assessments WHERE patient_id=:p) AS mental,
+                 (SELECT COUNT(*) FROM chronic_logs WHERE patient_id=:p) AS chronic,
+                 (SELECT COUNT(*) FROM appointments a JOIN doctors d ON a.doctor_id = d.user_id
+                   WHERE a.patient_id=:p) AS appointments""",
+            {"p": patient_id}
+        ).fetchone()
+    finally:
+        conn.rollback()  # read-only; ends the transaction
+        conn.close()
+
+    plan = None
+    if meal_plan:
+        plan = dict(meal_plan)
+        plan["plan"] = json.loads(plan["plan_json"])
+    return {
+        "user": {"id": user["id"], "name": user["name"], "email": user["email"]},
+        "profile": dict(profile) if profile else {},
+        "labs": reports,
+        "lifestyle": [{**dict(r), "answers": json.loads(r["answers_json"])} for r in lifestyle],
+        "symptoms": [{**dict(r), "symptoms": json.loads(r["symptoms_json"])} for r in symptoms],
+        "mental": [{**dict(r), "answers": json.loads(r["answers_json"])} for r in mental],
+        "chronic": [{**dict(r), "value": json.loads(r["value_json"])} for r in chronic],
+        "meal_plan": plan,
+        "appointments": [dict(r) for r in reversed(appointments)],
+        "counts": dict(counts),
+    }
+
+
+# ─── Analytics ────────────────────────────────────────────────────────────────
+
+def get_cohort_analytics(weeks: int = 12) -> Dict:
+    conn = get_conn()
+    out = analytics.cohort(conn, weeks)
+    conn.close()
+    return out
+
+
+def verify_analytics() -> List[Dict]:
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN")  # replay and stored counters from the same snapshot
+        return analytics.verify(conn)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def recompute_analytics() -> int:
+    conn = get_conn()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # no writes land between the replay and the swap
+            return analytics.recompute(conn)
+    finally:
+        conn.close()
+
+
+# ─── Risk Panel ───────────────────────────────────────────────────────────────
+
+def get_diabetes_panel_inputs() -> List[Dict]:
+    """Every patient with profile fields, latest fasting glucose and latest diastolic BP, in one query."""
+    conn = get_conn()
+    rows = conn.execute(
+        """SELECT u.id AS patient_id, u.name,
+                  p.age, p.gender, p.height_cm, p.weight_kg,
+                  (SELECT r.value FROM lab_results r
+                     JOIN lab_reports lr ON lr.id = r.report_id
+                    WHERE lr.patient_id = u.id AND r.test_name = 'Glucose (Fasting)'
+                    ORDER BY lr.report_date DESC, lr.created_at DESC LIMIT 1) AS glucose,
+                  (SELECT json_extract(c.value_json, '$.diastolic') FROM chronic_logs c
+                    WHERE c.patient_id = u.id AND c.type = 'blood_pressure'
+                    ORDER BY c.created_at DESC LIMIT 1) AS diastolic
+           FROM users u
+           LEFT JOIN patient_profiles p ON u.id = p.user_id
+           WHERE u.role = 'patient'"""
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
@@ -0,0 +1,24 @@
+import numpy as np
+
+# Classifier facade over a regressor trained on a teacher model's probabilities
+# (see the compression stage in train_diabetes_model.py). It lives in the app
+# package so joblib can unpickle distilled artifacts inside the API.
+
+
+class DistilledClassifier:
+    def __init__(self, student, teacher_name: str = ""):
+        self.student = student
+        self.teacher_name = teacher_name
+        self.classes_ = np.array([0, 1])
+        self.n_features_in_ = student.n_features_in_
+
+    @property
+    def feature_importances_(self) -> np.ndarray:
+        return self.student.feature_importances_
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = np.clip(self.student.predict(np.asarray(X, dtype=float)), 0.0, 1.0)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
@@ -0,0 +1,87 @@
+import asyncio
+import itertools
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from . import metrics
+
+# In-process publish/subscribe for clinical alerts. Write handlers (which run
+# in the threadpool) publish; each connected doctor's stream owns a bounded
+# asyncio queue on the event loop. Events carry increasing ids and the most
+# recent ones are kept, so a client that reconnects with Last-Event-ID gets
+# what it missed. Single-process only: with several workers each one only sees
+# its own writes.
+
+ALERT_HISTORY = int(os.getenv("ALERT_HISTORY", "200"))
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "100"))
+
+
+class Subscription:
+    def __init__(self, bus: "EventBus", loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.bus = bus
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def _deliver(self, event: Dict) -> None:
+        # Runs on the subscriber's loop. A slow consumer loses its oldest events, not new ones.
+        if self.queue.full():
+            self.queue.get_nowait()
+            metrics.incr(f"{self.bus.name}.dropped")
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next event, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.bus._unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, name: str, history: int = ALERT_HISTORY, queue_size: int = ALERT_QUEUE_SIZE):
+        self.name = name
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._recent: Deque[Dict] = deque(maxlen=history)
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict) -> Dict:
+        """Safe to call from any thread; returns the event with its id."""
+        with self._lock:
+            event = {"id": next(self._ids), "type": event_type, **data}
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        metrics.incr(f"{self.name}.published")
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:  # loop already closed
+                self._unsubscribe(sub)
+        return event
+
+    def subscribe(self, after: Optional[int] = None) -> Subscription:
+        """Must be called on the event loop. `after`: replay retained events with a larger id."""
+        sub = Subscription(self, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.append(sub)
+            backlog = [e for e in self._recent if after is not None and e["id"] > after]
+        for event in backlog[-self.queue_size:]:
+            sub.queue.put_nowait(event)
+        metrics.set_gauge(f"{self.name}.subscribers", len(self._subscribers))
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+        metrics.set_gauge(f"{self.name}.subscribers", len(self._subscribers))
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self._recent)[-limit:]
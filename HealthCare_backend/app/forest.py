@@ -0,0 +1,133 @@
+import sys
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+
+# Array-based evaluator for sklearn RandomForestClassifier models.
+#
+# All trees are flattened into one set of contiguous node arrays. Leaves point
+# to themselves, so a batch of rows walks every tree in lock-step for exactly
+# `max_depth` vectorized steps with no per-tree Python dispatch. Probabilities
+# are bit-identical to sklearn's predict_proba: rows are cast to float32 as
+# sklearn does, leaf values are normalized per tree the same way, and trees are
+# accumulated sequentially in estimator order before dividing by the count.
+
+
+class CompiledForest:
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+    def __init__(self, arrays: Dict[str, np.ndarray], max_depth: int, n_features: int):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]  # (n_nodes, n_classes), per-tree normalized
+        self.roots = arrays["roots"]
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            t = est.tree_
+            n = t.node_count
+            idx = np.arange(n, dtype=np.int32)
+            is_leaf = t.children_left == -1
+            features.append(np.where(is_leaf, 0, t.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, 0.0, t.threshold).astype(np.float64))
+            lefts.append((np.where(is_leaf, idx, t.children_left) + offset).astype(np.int32))
+            rights.append((np.where(is_leaf, idx, t.children_right) + offset).astype(np.int32))
+            v = t.value[:, 0, :].astype(np.float64)
+            normalizer = v.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(v / normalizer)
+            roots.append(offset)
+            offset += n
+        arrays = {
+            "feature": np.concatenate(features),
+            "threshold": np.concatenate(thresholds),
+            "left": np.concatenate(lefts),
+            "right": np.concatenate(rights),
+            "value": np.ascontiguousarray(np.concatenate(values)),
+            "roots": np.asarray(roots, dtype=np.int32),
+        }
+        max_depth = max(est.tree_.max_depth for est in model.estimators_)
+        return cls(arrays, max_depth, model.n_features_in_)
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index reached in every tree: shape (n_rows, n_trees)."""
+        Xf = np.asarray(X, dtype=np.float32)
+        rows = np.arange(Xf.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (Xf.shape[0], self.roots.shape[0]))
+        for _ in range(self.max_depth):
+            go_left = Xf[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        per_tree = self.value[self.leaves(X).T]  # (n_trees, n_rows, n_classes)
+        return np.cumsum(per_tree, axis=0)[-1] / self.roots.shape[0]
+
+    def contributions(self, X: np.ndarray, cls: int = 1) -> tuple:
+        """Saabas path attributions for class `cls`.
+
+        Returns (bias, contrib): bias is the forest's mean root value (n_rows,)
+        and contrib[i, f] is the change in P(cls) credited to splits on feature
+        f along row i's paths, averaged over trees. bias + contrib.sum(1)
+        equals predict_proba(X)[:, cls] up to float rounding.
+        """
+        Xf = np.asarray(X, dtype=np.float32)
+        n_rows, n_trees = Xf.shape[0], self.roots.shape[0]
+        rows = np.arange(n_rows)[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (n_rows, n_trees))
+        value = self.value[:, cls]
+        size = n_rows * self.n_features
+        contrib = np.zeros(size)
+        row_base = rows * self.n_features
+        for _ in range(self.max_depth):
+            feat = self.feature[node]
+            go_left = Xf[rows, feat] <= self.threshold[node]
+            nxt = np.where(go_left, self.left[node], self.right[node])
+            # Leaves loop to themselves, so finished paths add zero
+            contrib += np.bincount((row_base + feat).ravel(), weights=(value[nxt] - value[node]).ravel(),
+                                   minlength=size)
+            node = nxt
+        bias = np.full(n_rows, value[self.roots].mean())
+        return bias, contrib.reshape(n_rows, self.n_features) / n_trees
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def save(self, path: str) -> None:
+        joblib.dump({
+            "arrays": {name: getattr(self, name) for name in self.ARRAYS},
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+        }, path)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> "CompiledForest":
+        data = joblib.load(path, mmap_mode=mmap_mode)
+        return cls(data["arrays"], data["max_depth"], data["n_features"])
+
+
+def compile_model(model) -> Optional[CompiledForest]:
+    """CompiledForest for a fitted random forest, or None for other model types."""
+    if not hasattr(model, "estimators_") or not hasattr(getattr(model, "estimators_")[0], "tree_"):
+        return None
+    return CompiledForest.from_sklearn(model)
+
+
+if __name__ == "__main__":
+    # Export step:  python -m app.forest models/diabetes_model.joblib models/diabetes_forest.joblib
+    src, dst = sys.argv[1], sys.argv[2]
+    artifact = joblib.load(src)
+    forest = compile_model(artifact["model"] if isinstance(artifact, dict) else artifact)
+    if forest is None:
+        sys.exit("Not a random forest model")
+    forest.save(dst)
+    print(f"Compiled {forest.roots.shape[0]} trees ({forest.nbytes / 1024:.0f} KB of node arrays) to {dst}")
@@ -0,0 +1,103 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from . import metrics
+
+# Micro-batching for model scoring. Request threads hand single feature rows
+# to a MicroBatcher; one scoring thread waits up to INFERENCE_BATCH_MAX_WAIT_MS
+# for more rows (or until INFERENCE_BATCH_MAX_ROWS are queued), scores them as
+# one matrix, and resolves each caller's future with its own row's result.
+
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "1") == "1"
+INFERENCE_BATCH_MAX_ROWS = int(os.getenv("INFERENCE_BATCH_MAX_ROWS", "32"))
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "2"))
+INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "5"))
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Batches concurrent single-row calls to `score_fn`.
+
+    `score_fn` takes an (n, n_features) array and returns a length-n sequence;
+    it runs on the batcher's own thread, so it may read module globals (e.g.
+    the current model) at call time and every row in a batch sees the same one.
+    """
+
+    def __init__(self, name: str, score_fn: Callable[[np.ndarray], Sequence],
+                 max_rows: int = INFERENCE_BATCH_MAX_ROWS,
+                 max_wait_ms: float = INFERENCE_BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.score_fn = score_fn
+        self.max_rows = max(1, max_rows)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                    self._thread.start()
+
+    def submit(self, row: Sequence[float], timeout: float = INFERENCE_TIMEOUT_S):
+        """Score one row; blocks until its batch has been scored."""
+        self._ensure_started()
+        fut: Future = Future()
+        enqueued = time.perf_counter()
+        self._queue.put((row, fut, enqueued))
+        metrics.set_gauge(f"{self.name}.queue_depth", self._queue.qsize())
+        try:
+            return fut.result(timeout=timeout)
+        finally:
+            metrics.observe(f"{self.name}.latency_seconds", time.perf_counter() - enqueued)
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_rows:
+            try:
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            metrics.set_gauge(f"{self.name}.queue_depth", self._queue.qsize())
+            metrics.observe(f"{self.name}.batch_rows", len(batch))
+            for _row, _fut, enqueued in batch:
+                metrics.observe(f"{self.name}.queue_wait_seconds", started - enqueued)
+            try:
+                out = self.score_fn(np.asarray([b[0] for b in batch], dtype=float))
+            except Exception as e:
+                for _row, fut, _enqueued in batch:
+                    fut.set_exception(e)
+                continue
+            metrics.observe(f"{self.name}.score_seconds", time.perf_counter() - started)
+            for (_row, fut, _enqueued), value in zip(batch, out):
+                fut.set_result(value)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=1)
+            self._thread = None
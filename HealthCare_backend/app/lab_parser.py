@@ -0,0 +1,200 @@
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from .ai import parse_lab_line, extract_lab_results, _parse_ref_range
+
+# Turns free-form lab report text into canonical lab values. Strategies are
+# registered by name so they can be benchmarked side by side (see
+# bench_lab_parsers.py); uploads use LAB_PARSER, "combined" by default.
+#
+# Every strategy returns dicts of:
+#   test_name, value, unit, ref_range_low, ref_range_high
+# where the ranges are the ones printed on the report (None when absent).
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "..", "config")
+
+with open(os.path.join(CONFIG_DIR, "lab_ranges.json"), encoding="utf-8") as _f:
+    _LAB_CFG = json.load(_f)
+LAB_RANGES = _LAB_CFG["ranges"]
+# Routine health-check tests; incremental PDF extraction treats a report as
+# complete once these are found and a later page adds nothing (see pdf_extract)
+CORE_PANEL: List[str] = _LAB_CFG.get("core_panel", [])
+
+# Bump whenever any strategy's output (or the report-date extraction cached
+# alongside it) changes so cached extractions are not reused
+PARSER_VERSION = "4"
+
+# ─── Aliases ──────────────────────────────────────────────────────────────────
+
+# Aliases map common lab report names to our canonical test names
+TEST_ALIASES: Dict[str, str] = {}
+for _canonical in LAB_RANGES:
+    TEST_ALIASES[_canonical.lower()] = _canonical
+# Add common aliases
+_EXTRA_ALIASES = {
+    "haemoglobin": "Hemoglobin", "hgb": "Hemoglobin", "hb": "Hemoglobin",
+    "white blood cell": "WBC", "white blood cells": "WBC", "wbc count": "WBC", "total wbc": "WBC",
+    "red blood cell": "RBC", "red blood cells": "RBC", "rbc count": "RBC", "total rbc": "RBC",
+    "platelet count": "Platelets", "plt": "Platelets",
+    "hct": "Hematocrit", "packed cell volume": "Hematocrit", "pcv": "Hematocrit",
+    "mean corpuscular volume": "MCV",
+    "fasting glucose": "Glucose (Fasting)", "fasting blood sugar": "Glucose (Fasting)",
+    "blood sugar fasting": "Glucose (Fasting)", "fbs": "Glucose (Fasting)", "glucose fasting": "Glucose (Fasting)",
+    "glycated hemoglobin": "HbA1c", "glycated haemoglobin": "HbA1c", "hba1c": "HbA1c",
+    "total cholesterol": "Total Cholesterol", "cholesterol total": "Total Cholesterol", "cholesterol": "Total Cholesterol",
+    "ldl cholesterol": "LDL", "ldl-c": "LDL", "low density lipoprotein": "LDL",
+    "hdl cholesterol": "HDL", "hdl-c": "HDL", "high density lipoprotein": "HDL",
+    "triglyceride": "Triglycerides", "tg": "Triglycerides",
+    "serum creatinine": "Creatinine", "creat": "Creatinine",
+    "egfr": "eGFR", "gfr": "eGFR", "glomerular filtration rate": "eGFR",
+    "blood urea": "Urea", "bun": "Urea", "blood urea nitrogen": "Urea", "urea nitrogen": "Urea",
+    "serum sodium": "Sodium", "na": "Sodium", "na+": "Sodium",
+    "serum potassium": "Potassium", "k": "Potassium", "k+": "Potassium",
+    "serum calcium": "Calcium", "ca": "Calcium", "total calcium": "Calcium",
+    "vit d": "Vitamin D", "vitamin d3": "Vitamin D", "25-oh vitamin d": "Vitamin D",
+    "25 hydroxy vitamin d": "Vitamin D", "25(oh)d": "Vitamin D",
+    "vit b12": "Vitamin B12", "b12": "Vitamin B12", "cyanocobalamin": "Vitamin B12",
+    "serum iron": "Iron", "fe": "Iron",
+    "serum ferritin": "Ferritin",
+    "thyroid stimulating hormone": "TSH", "tsh ultrasensitive": "TSH",
+    "sgpt": "ALT", "alanine aminotransferase": "ALT", "alanine transaminase": "ALT",
+    "sgot": "AST", "aspartate aminotransferase": "AST", "aspartate transaminase": "AST",
+}
+for _alias, _canonical in _EXTRA_ALIASES.items():
+    TEST_ALIASES[_alias.lower()] = _canonical
+
+# Build sorted alias list (longest first so longer aliases match before shorter ones)
+SORTED_ALIASES = sorted(TEST_ALIASES.keys(), key=len, reverse=True)
+
+# One alternation over every alias, matched on word boundaries so short aliases
+# like "na" or "k" don't fire inside "name" or "kg"
+_ALIAS_RE = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(a) for a in SORTED_ALIASES) + r")(?![a-z0-9+])"
+)
+_NUMBER_RE = re.compile(r"(\d+\.?\d*)")
+
+
+def canonicalize(name: str) -> Optional[str]:
+    """Map a test name as printed on a report to its canonical name, if known."""
+    key = " ".join(name.lower().strip(" :.-").split())
+    if key in TEST_ALIASES:
+        return TEST_ALIASES[key]
+    best = None
+    for m in _ALIAS_RE.finditer(key):
+        if best is None or len(m.group(1)) > len(best):
+            best = m.group(1)
+    return TEST_ALIASES[best] if best else None
+
+
+def _result(canonical: str, value: float, unit: Optional[str] = None,
+            low: Optional[float] = None, high: Optional[float] = None) -> Dict:
+    return {
+        "test_name": canonical,
+        "value": value,
+        "unit": unit or LAB_RANGES.get(canonical, {}).get("unit", ""),
+        "ref_range_low": low,
+        "ref_range_high": high,
+    }
+
+
+# ─── Strategies ───────────────────────────────────────────────────────────────
+
+PARSERS: Dict[str, Callable[[str], List[Dict]]] = {}
+
+
+def register_parser(name: str):
+    def _wrap(fn: Callable[[str], List[Dict]]):
+        PARSERS[name] = fn
+        return fn
+    return _wrap
+
+
+@register_parser("alias")
+def parse_alias_scan(text: str) -> List[Dict]:
+    """Legacy parser: first number after any alias substring; no units or ranges from the report."""
+    results = []
+    seen = set()
+    for line in text.split("\n"):
+        line_lower = line.lower().strip()
+        if not line_lower:
+            continue
+        for alias in SORTED_ALIASES:
+            if alias in line_lower:
+                canonical = TEST_ALIASES[alias]
+                if canonical in seen:
+                    continue
+                idx = line_lower.index(alias)
+                numbers = _NUMBER_RE.findall(line[idx + len(alias):])
+                if numbers:
+                    results.append(_result(canonical, float(numbers[0])))
+                    seen.add(canonical)
+                break  # Only match the first alias per line
+    return results
+
+
+@register_parser("regex")
+def parse_regex_rows(text: str) -> List[Dict]:
+    """Row regexes from ai.extract_lab_results, keeping only tests we can canonicalize."""
+    results = []
+    seen = set()
+    for row in extract_lab_results(text):
+        canonical = canonicalize(row["test"])
+        if not canonical or canonical in seen or row["value"] is None:
+            continue
+        seen.add(canonical)
+        results.append(_result(canonical, row["value"], row["unit"], row["ref_low"], row["ref_high"]))
+    return results
+
+
+def _parse_line_combined(line: str) -> Optional[Dict]:
+    stripped = line.strip()
+    if not stripped:
+        return None
+
+    # Structured row first: keeps the report's own unit and reference range
+    row = parse_lab_line(stripped)
+    if row and row["value"] is not None:
+        canonical = canonicalize(row["test"])
+        if canonical:
+            return _result(canonical, row["value"], row["unit"], row["ref_low"], row["ref_high"])
+
+    # Otherwise find an alias on word boundaries and take the next number
+    lower = stripped.lower()
+    m = _ALIAS_RE.search(lower)
+    if not m:
+        return None
+    after = stripped[m.end():]
+    num = _NUMBER_RE.search(after)
+    if not num:
+        return None
+    low, high = _parse_ref_range(after[num.end():])
+    if low is not None and high is not None and low > high:
+        low, high = None, None
+    return _result(TEST_ALIASES[m.group(1)], float(num.group(1)), None, low, high)
+
+
+@register_parser("combined")
+def parse_combined(text: str) -> List[Dict]:
+    """Row regex per line with alias canonicalization, falling back to a boundary-aware alias scan."""
+    results = []
+    seen = set()
+    for line in text.split("\n"):
+        item = _parse_line_combined(line)
+        if item and item["test_name"] not in seen:
+            seen.add(item["test_name"])
+            results.append(item)
+    return results
+
+
+DEFAULT_PARSER = os.getenv("LAB_PARSER", "combined")
+
+
+def parse_lab_text(text: str, strategy: Optional[str] = None) -> List[Dict]:
+    return PARSERS[strategy or DEFAULT_PARSER](text)
+
+
+def cache_version(strategy: Optional[str] = None) -> str:
+    """Extraction-cache key component: parser code version plus the active strategy."""
+    return f"{PARSER_VERSION}:{strategy or DEFAULT_PARSER}"
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from . import metrics
+
+# Chat-completion backends behind one async interface. The API picks one with
+# LLM_BACKEND: "groq" (default) talks to Groq through a single pooled
+# AsyncGroq client; "mock" generates a canned reply locally with configurable
+# latency so the chat path can be exercised and load-tested offline.
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "600"))
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.7"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+MOCK_LLM_FIRST_TOKEN_MS = float(os.getenv("MOCK_LLM_FIRST_TOKEN_MS", "300"))
+MOCK_LLM_TOKEN_MS = float(os.getenv("MOCK_LLM_TOKEN_MS", "15"))
+
+Messages = List[Dict[str, str]]
+
+
+class LLMBackend:
+    name = "base"
+
+    def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """Yield reply text fragments as the provider produces them."""
+        raise NotImplementedError
+
+    async def complete(self, messages: Messages) -> str:
+        return "".join([part async for part in self.stream(messages)])
+
+    async def aclose(self) -> None:
+        pass
+
+
+BACKENDS: Dict[str, Callable[[], LLMBackend]] = {}
+
+
+def register_backend(name: str):
+    def deco(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return deco
+
+
+@register_backend("groq")
+class GroqBackend(LLMBackend):
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        # One client per process: its httpx pool keeps connections to the
+        # provider warm instead of a TLS handshake per chat turn.
+        if self._client is None:
+            import httpx
+            from groq import AsyncGroq
+            self._client = AsyncGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                timeout=LLM_TIMEOUT_S,
+                http_client=httpx.AsyncClient(
+                    timeout=LLM_TIMEOUT_S,
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                        max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                ),
+            )
+        return self._client
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=LLM_MODEL, messages=messages, max_tokens=LLM_MAX_TOKENS,
+            temperature=LLM_TEMPERATURE, stream=True,
+        )
+        # Closing the stream releases its pooled connection when the caller
+        # stops early (client disconnect, deadline) instead of leaving it open.
+        async with response:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def complete(self, messages: Messages) -> str:
+        response = await self.client.chat.completions.create(
+            model=LLM_MODEL, messages=messages, max_tokens=LLM_MAX_TOKENS,
+            temperature=LLM_TEMPERATURE,
+        )
+        return response.choices[0].message.content
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+@register_backend("mock")
+class MockBackend(LLMBackend):
+    def __init__(self, first_token_ms: float = MOCK_LLM_FIRST_TOKEN_MS, token_ms: float = MOCK_LLM_TOKEN_MS):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    @staticmethod
+    def reply_for(messages: Messages) -> str:
+        question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return (f"Thanks for your question about \"{question[:80]}\". This is a locally generated "
+                "placeholder answer used for offline testing; it contains no medical information. "
+                "Please consult a qualified healthcare professional for advice about your health.")
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_ms / 1000.0)
+        for i, word in enumerate(self.reply_for(messages).split(" ")):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000.0)
+            yield word if i == 0 else " " + word
+
+
+_backend: Optional[LLMBackend] = None
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        if LLM_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}' (available: {', '.join(BACKENDS)})")
+        _backend = BACKENDS[LLM_BACKEND]()
+    return _backend
+
+
+async def aclose() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.aclose()
+        _backend = None
+
+
+async def stream_reply(messages: Messages, timeout_s: Optional[float] = None) -> AsyncIterator[str]:
+    """Backend stream with first-token / generation latency and token metrics.
+
+    `timeout_s` bounds the whole stream; asyncio.TimeoutError is raised (and
+    the provider stream closed) when it runs out.
+    """
+    backend = get_backend()
+    start = time.perf_counter()
+    deadline = None if timeout_s is None else asyncio.get_running_loop().time() + timeout_s
+    first = None
+    fragments = 0
+    metrics.incr("llm.requests")
+    parts = backend.stream(messages).__aiter__()
+    try:
+        while True:
+            try:
+                if deadline is None:
+                    part = await parts.__anext__()
+                else:
+                    part = await asyncio.wait_for(parts.__anext__(), deadline - asyncio.get_running_loop().time())
+            except StopAsyncIteration:
+                break
+            if first is None:
+                first = time.perf_counter()
+                metrics.observe("llm.first_token_seconds", first - start)
+            fragments += 1
+            yield part
+    except asyncio.TimeoutError:
+        metrics.incr("llm.deadline_exceeded")
+        raise
+    except Exception:
+        metrics.incr("llm.errors")
+        raise
+    finally:
+        if hasattr(parts, "aclose"):
+            await parts.aclose()
+        metrics.observe("llm.total_seconds", time.perf_counter() - start)
+        metrics.incr("llm.fragments", fragments)
+
+
+async def complete(messages: Messages, timeout_s: Optional[float] = None) -> str:
+    start = time.perf_counter()
+    metrics.incr("llm.requests")
+    try:
+        return await asyncio.wait_for(get_backend().complete(messages), timeout_s)
+    except asyncio.TimeoutError:
+        metrics.incr("llm.deadline_exceeded")
+        raise
+    except Exception:
+        metrics.incr("llm.errors")
+        raise
+    finally:
+        metrics.observe("llm.total_seconds", time.perf_counter() - start)
@@ -1,23 +1,32 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+import hashlib
 import json
+import math
 import os
+import threading
+import time
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import re, io
-import joblib
+from fastapi.responses import StreamingResponse
+import re
 import numpy as np
+from starlette.concurrency import run_in_threadpool
 
 from .db import (
     init_db, create_user, get_user_by_email, get_user_by_id,
     upsert_patient_profile, get_patient_profile, create_doctor_profile,
     list_patients, list_doctors,
     create_lab_report, add_lab_results, get_lab_reports,
+    create_lab_reports_batch, find_lab_report_by_hash,
+    get_cached_extraction, store_cached_extraction,
     create_lifestyle_assessment, get_lifestyle_history,
     create_symptom_check, get_symptom_history,
     create_mental_assessment, get_mental_history,
@@ -26,17 +35,26 @@ from .db import (
     book_appointment, cancel_appointment, get_booked_slots,
     get_patient_appointments, get_doctor_appointments, is_slot_taken,
     store_refresh_token, get_refresh_token, delete_refresh_token,
-    get_dashboard_summary,
+    get_dashboard_summary, get_diabetes_panel_inputs, get_patient_snapshot,
+    search_patients, get_cohort_analytics, verify_analytics, recompute_analytics,
+    get_resource_version, patient_scope, on_change, DIABETES_PANEL_SCOPE,
 )
 from .auth import (
     hash_password, verify_password,
     create_access_token, create_refresh_token, decode_token,
-    get_current_user, require_role,
+    get_current_user, require_role, require_admin,
 )
+from . import (
+    admission, cache, chat_cache, chat_context, events, inference, lab_parser, llm, metrics, pdf_extract,
+    response_cache, uploads,
+)
+from .responses import CompressionMiddleware, dumps, etag_matches, json_response
+from .model_registry import ArtifactError, ModelRegistry, RegistryError
+from .ai import extract_report_date
 from .schemas import (
     RegisterRequest, LoginRequest, TokenResponse, RefreshRequest,
     PatientProfileUpdate,
-    LabReportCreate, LabReportOut, LabResultOut,
+    LabReportCreate, LabReportOut, LabResultOut, LabBatchUploadOut,
     LifestyleSubmit, LifestyleOut,
     SymptomCheckRequest, SymptomCheckOut,
     MentalAssessmentSubmit, MentalAssessmentOut,
@@ -44,7 +62,8 @@ from .schemas import (
     DietPreferences, DietPlanOut,
     AppointmentBook, AppointmentCancel, AppointmentOut,
     ChatRequest, ChatResponse,
-    DiabetesPredictRequest, DiabetesPredictResponse, FeatureImportance,
+    DiabetesPredictRequest, DiabetesPredictResponse, FeatureImportance, FeatureContribution,
+    DiabetesRiskPanelOut, ModelVersionRequest, PatientSearchOut,
 )
 
 # ─── Config Loading ───────────────────────────────────────────────────────────
@@ -69,6 +88,12 @@ app = FastAPI(title="CareSphere Healthcare API", version="2.0.0")
 _DEFAULT_ORIGINS = "http://localhost:5173,http://127.0.0.1:5173,http://localhost:5174,http://127.0.0.1:5174"
 _CORS_ORIGINS = os.getenv("CORS_ORIGINS", _DEFAULT_ORIGINS).split(",")
 
+# Middleware added later wraps what was added earlier: the upload limit sits
+# inside CORS so its 413s carry the CORS headers the browser needs to read them
+app.add_middleware(uploads.UploadLimitMiddleware, limits={
+    "/patient/labs/upload": uploads.UPLOAD_MAX_BYTES,
+    "/patient/labs/upload/batch": uploads.UPLOAD_BATCH_MAX_BYTES,
+})
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_CORS_ORIGINS,
@@ -76,13 +101,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/brotli for large JSON bodies; see app/responses.py
+app.add_middleware(CompressionMiddleware)
 
 # ─── ML Model Loading ─────────────────────────────────────────────────────────
 
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
-DIABETES_MODEL = None
-DIABETES_FEATURES = None
-DIABETES_ACCURACY = 0.0
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(MODEL_DIR, "registry"))
+DIABETES_REGISTRY = ModelRegistry(MODEL_REGISTRY_DIR)
 
 
 @app.on_event("startup")
@@ -94,17 +120,30 @@ def _startup():
     _load_diabetes_model()
 
 
+@app.on_event("startup")
+async def _start_background_jobs():
+    if chat_cache.CHAT_CACHE_WARM:
+        asyncio.get_running_loop().create_task(_warm_chat_cache())
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    pdf_extract.shutdown()
+    _DIABETES_BATCHER.close()
+    await llm.aclose()
+
+
 def _load_diabetes_model():
-    global DIABETES_MODEL, DIABETES_FEATURES, DIABETES_ACCURACY
-    model_path = os.path.join(MODEL_DIR, "diabetes_model.joblib")
-    if os.path.exists(model_path):
-        artifact = joblib.load(model_path)
-        DIABETES_MODEL = artifact["model"]
-        DIABETES_FEATURES = artifact["features"]
-        DIABETES_ACCURACY = artifact["accuracy"]
-        print(f"  Diabetes model loaded (accuracy: {DIABETES_ACCURACY:.2%})")
+    # Registers the pre-registry artifact as v1 on first run; the model itself
+    # is loaded on the first prediction.
+    legacy_path = os.path.join(MODEL_DIR, "diabetes_model.joblib")
+    data_path = os.path.join(os.path.dirname(__file__), "..", "data", "diabetes.csv")
+    DIABETES_REGISTRY.bootstrap(legacy_path, data_path)
+    production = DIABETES_REGISTRY.state().get("production")
+    if production:
+        print(f"  Diabetes model registry ready (production: {production})")
     else:
-        print(f"  WARNING: diabetes model not found at {model_path}")
+        print(f"  WARNING: no diabetes model registered in {MODEL_REGISTRY_DIR}")
 
 
 def _seed_demo_accounts():
@@ -132,15 +171,87 @@ def _uid() -> str:
     return str(uuid.uuid4())
 
 
+# ─── Conditional GET ──────────────────────────────────────────────────────────
+
+# Read endpoints tag their response with the change counter of the data behind
+# it (db.get_resource_version), so a client revalidating with If-None-Match
+# gets a 304 after one primary-key lookup instead of the history queries. The
+# version is read before the data: a write racing the read can only leave the
+# tag older than the body (a needless refetch later), never the reverse.
+
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag(request: Request, scope: str, *extra: str) -> str:
+    return _etag_at(request, get_resource_version(scope), *extra)
+
+
+def _etag_at(request: Request, version: int, *extra: str) -> str:
+    variant = "|".join([app.version, request.url.path, request.url.query, *extra])
+    return f'"{version}-{hashlib.sha1(variant.encode()).hexdigest()[:12]}"'
+
+
+def _fresh(request: Request, etag: str) -> bool:
+    """True if the client's cached copy (If-None-Match) is still current."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if not etag_matches(header, etag):
+        metrics.incr("etag.stale")
+        return False
+    metrics.incr("etag.not_modified")
+    return True
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_etag_headers(etag))
+
+
+def _etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+
+
+# ─── Response Cache ───────────────────────────────────────────────────────────
+
+# Rendered bodies of rarely-changing reads, checked against the same change
+# counters as the ETags; see app/response_cache.py
+RESPONSE_CACHE = response_cache.ResponseCache(shared=response_cache.make_backend())
+on_change(RESPONSE_CACHE.invalidate)
+
+
+def _cached_json(request: Request, scope: str, load: Callable[[], object], *extra: str) -> Response:
+    """Conditional GET plus the response cache for a read of `scope`'s data."""
+    version = get_resource_version(scope)
+    etag = _etag_at(request, version, *extra)
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    route = request.url.path + ("?" + request.url.query if request.url.query else "")
+    variant = (version, extra)
+    body = RESPONSE_CACHE.get(scope, route, variant)
+    if body is None:
+        body = dumps(load())
+        RESPONSE_CACHE.put(scope, route, variant, body)
+    return Response(body, media_type="application/json", headers=_etag_headers(etag))
+
+
 # ─── Scoring Engines ──────────────────────────────────────────────────────────
 
-def classify_lab_result(test_name: str, value: float, unit: Optional[str]):
-    """Classify a single lab result against reference ranges."""
+def classify_lab_result(test_name: str, value: float, unit: Optional[str],
+                        report_low: Optional[float] = None, report_high: Optional[float] = None):
+    """Classify a single lab result against reference ranges.
+
+    A range printed on the report itself (matching the lab's units and method)
+    takes precedence over the configured default range.
+    """
     ref = LAB_RANGES.get(test_name)
-    if not ref:
+    if report_low is not None or report_high is not None:
+        low, high = report_low, report_high
+    elif not ref:
         return "unknown", None, None, None, None
-    low = ref.get("low")
-    high = ref.get("high")
+    else:
+        low = ref.get("low")
+        high = ref.get("high")
+    ref = ref or {}
     if low is not None and value < low:
         status = "low"
     elif high is not None and value > high:
@@ -366,138 +477,229 @@ def create_report(req: LabReportCreate, current_user=Depends(require_role("patie
 
 # ─── PDF Lab Report Upload ────────────────────────────────────────────────────
 
-# Aliases map common lab report names to our canonical test names
-_TEST_ALIASES: dict[str, str] = {}
-for _canonical in LAB_RANGES:
-    _TEST_ALIASES[_canonical.lower()] = _canonical
-# Add common aliases
-_EXTRA_ALIASES = {
-    "haemoglobin": "Hemoglobin", "hgb": "Hemoglobin", "hb": "Hemoglobin",
-    "white blood cell": "WBC", "white blood cells": "WBC", "wbc count": "WBC", "total wbc": "WBC",
-    "red blood cell": "RBC", "red blood cells": "RBC", "rbc count": "RBC", "total rbc": "RBC",
-    "platelet count": "Platelets", "plt": "Platelets",
-    "hct": "Hematocrit", "packed cell volume": "Hematocrit", "pcv": "Hematocrit",
-    "mean corpuscular volume": "MCV",
-    "fasting glucose": "Glucose (Fasting)", "fasting blood sugar": "Glucose (Fasting)",
-    "blood sugar fasting": "Glucose (Fasting)", "fbs": "Glucose (Fasting)", "glucose fasting": "Glucose (Fasting)",
-    "glycated hemoglobin": "HbA1c", "glycated haemoglobin": "HbA1c", "hba1c": "HbA1c",
-    "total cholesterol": "Total Cholesterol", "cholesterol total": "Total Cholesterol", "cholesterol": "Total Cholesterol",
-    "ldl cholesterol": "LDL", "ldl-c": "LDL", "low density lipoprotein": "LDL",
-    "hdl cholesterol": "HDL", "hdl-c": "HDL", "high density lipoprotein": "HDL",
-    "triglyceride": "Triglycerides", "tg": "Triglycerides",
-    "serum creatinine": "Creatinine", "creat": "Creatinine",
-    "egfr": "eGFR", "gfr": "eGFR", "glomerular filtration rate": "eGFR",
-    "blood urea": "Urea", "bun": "Urea", "blood urea nitrogen": "Urea", "urea nitrogen": "Urea",
-    "serum sodium": "Sodium", "na": "Sodium", "na+": "Sodium",
-    "serum potassium": "Potassium", "k": "Potassium", "k+": "Potassium",
-    "serum calcium": "Calcium", "ca": "Calcium", "total calcium": "Calcium",
-    "vit d": "Vitamin D", "vitamin d3": "Vitamin D", "25-oh vitamin d": "Vitamin D",
-    "25 hydroxy vitamin d": "Vitamin D", "25(oh)d": "Vitamin D",
-    "vit b12": "Vitamin B12", "b12": "Vitamin B12", "cyanocobalamin": "Vitamin B12",
-    "serum iron": "Iron", "fe": "Iron",
-    "serum ferritin": "Ferritin",
-    "thyroid stimulating hormone": "TSH", "tsh ultrasensitive": "TSH",
-    "sgpt": "ALT", "alanine aminotransferase": "ALT", "alanine transaminase": "ALT",
-    "sgot": "AST", "aspartate aminotransferase": "AST", "aspartate transaminase": "AST",
-}
-for _alias, _canonical in _EXTRA_ALIASES.items():
-    _TEST_ALIASES[_alias.lower()] = _canonical
+def _lab_report_out(report: Dict, duplicate: bool = False, notice: Optional[str] = None) -> LabReportOut:
+    """Build the API view of a stored report, re-attaching config explanations."""
+    results_out = []
+    deficiencies = []
+    for r in report["results"]:
+        ref = LAB_RANGES.get(r["test_name"], {})
+        def_name = ref.get("deficiency_name")
+        results_out.append(LabResultOut(
+            **{k: r[k] for k in ("id", "report_id", "test_name", "value", "unit", "status", "ref_range_low", "ref_range_high")},
+            deficiency_name=def_name if r["status"] == "low" else None,
+            explanation=ref.get("explanation") if r["status"] in ("low", "high") else None,
+        ))
+        if r["status"] == "low" and def_name:
+            deficiencies.append(def_name)
+    return LabReportOut(id=report["id"], patient_id=report["patient_id"], report_date=report["report_date"],
+                        created_at=report["created_at"], results=results_out, deficiency_summary=deficiencies,
+                        duplicate=duplicate, truncated=notice is not None, notice=notice)
+
+
+def _build_lab_report(patient_id: str, parsed: list[dict], report_date: Optional[str], sha256: Optional[str]) -> Dict:
+    """Classify parsed values into a report dict (with "results") ready for insertion."""
+    report_id = _uid()
+    result_rows = []
+    for item in parsed:
+        lab_status, ref_low, ref_high, _def_name, _explanation = classify_lab_result(
+            item["test_name"], item["value"], item.get("unit"),
+            item.get("ref_range_low"), item.get("ref_range_high"))
+        result_rows.append({
+            "id": _uid(), "report_id": report_id, "test_name": item["test_name"],
+            "value": item["value"], "unit": item.get("unit", ""), "status": lab_status,
+            "ref_range_low": ref_low, "ref_range_high": ref_high,
+        })
+    return {
+        "id": report_id, "patient_id": patient_id,
+        "report_date": report_date or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "created_at": _now(), "file_sha256": sha256, "results": result_rows,
+    }
 
-# Build sorted alias list (longest first so longer aliases match before shorter ones)
-_SORTED_ALIASES = sorted(_TEST_ALIASES.keys(), key=len, reverse=True)
 
+def _extraction_cache_version() -> str:
+    # Early-exit extraction can legitimately find fewer tests than a full pass,
+    # and where it stops depends on the expected tests
+    expected = ",".join(sorted(pdf_extract.PDF_EXPECTED_TESTS))
+    return f"{lab_parser.cache_version()}:{pdf_extract.PDF_EXTRACT_MODE}:{expected}"
 
-def _parse_lab_values_from_text(text: str) -> list[dict]:
-    """Extract lab test names and values from free-form lab report text."""
-    results = []
-    seen = set()
-    lines = text.split("\n")
-    for line in lines:
-        line_lower = line.lower().strip()
-        if not line_lower:
-            continue
-        for alias in _SORTED_ALIASES:
-            if alias in line_lower:
-                canonical = _TEST_ALIASES[alias]
-                if canonical in seen:
-                    continue
-                # Find numeric values in the rest of the line after the alias
-                idx = line_lower.index(alias)
-                after = line[idx + len(alias):]
-                numbers = re.findall(r"(\d+\.?\d*)", after)
-                if numbers:
-                    value = float(numbers[0])
-                    ref = LAB_RANGES.get(canonical, {})
-                    results.append({
-                        "test_name": canonical,
-                        "value": value,
-                        "unit": ref.get("unit", ""),
-                    })
-                    seen.add(canonical)
-                break  # Only match the first alias per line
-    return results
-
-
-@app.post("/patient/labs/upload", status_code=201)
-async def upload_lab_report(file: UploadFile = File(...), current_user=Depends(require_role("patient"))):
-    """Upload a PDF blood report and automatically extract & analyze lab values."""
-    if not file.filename or not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Please upload a PDF file.")
+
+# Runs that stopped on a budget may have missed tests further in; they are
+# reported to the patient and never cached, so a re-upload gets a fresh read
+_COMPLETE_STOP_REASONS = ("end_of_document", "all_expected_found")
+
+
+def _truncation_notice(stop_reason: str) -> Optional[str]:
+    if stop_reason in _COMPLETE_STOP_REASONS:
+        return None
+    if stop_reason == "page_budget":
+        return f"Only the first {pdf_extract.PDF_MAX_PAGES} pages of this report were read; tests on later pages may be missing."
+    if stop_reason == "time_budget":
+        return "This report took too long to read in full; tests on later pages may be missing."
+    return "Reading stopped after several pages without lab results; tests on later pages may be missing."
+
+
+async def _extract_lab_values(path: str, sha256: str, request: Optional[Request],
+                              wait_for_slot: bool = False) -> tuple[list[dict], Optional[str], Optional[str]]:
+    """(parsed lab values, report date, truncation notice) for an uploaded PDF.
+
+    Served from the extraction cache when possible; the notice is None unless
+    extraction stopped before the end of the document.
+    """
+    cached = get_cached_extraction(sha256, _extraction_cache_version())
+    if cached is not None:
+        metrics.incr("labs.extraction_cache_hits")
+        return cached["results"], cached["report_date"], None
+    metrics.incr("labs.extraction_cache_misses")
 
     try:
-        import pdfplumber
-        content = await file.read()
-        pdf_file = io.BytesIO(content)
-        text = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    except Exception:
+        extracted = await pdf_extract.extract_text(path, request=request, wait_for_slot=wait_for_slot)
+    except pdf_extract.ExtractionBusy:
+        raise HTTPException(status_code=503, detail="The report processor is busy. Please try again in a moment.",
+                            headers={"Retry-After": "5"})
+    except pdf_extract.ExtractionTimeout:
+        raise HTTPException(status_code=422, detail="This PDF took too long to process. Please upload a shorter or simpler report.")
+    except pdf_extract.ExtractionCancelled:
+        raise HTTPException(status_code=400, detail="Upload cancelled.")
+    except pdf_extract.PdfExtractionError:
         raise HTTPException(status_code=400, detail="Could not read the PDF. Please ensure it's a valid blood report.")
 
+    text = extracted["text"]
+    parsed = extracted["results"]
+    if parsed is None:
+        parsed = lab_parser.parse_lab_text(text) if text.strip() else []
+    # Checked before caching: a cached [] would turn this message into "no tests found" on re-upload
     if not text.strip():
         raise HTTPException(status_code=400, detail="No text could be extracted from this PDF. It may be a scanned image — try a digital report.")
+    report_date = extract_report_date(text)
+    notice = _truncation_notice(extracted["stop_reason"])
+    if notice is None:
+        store_cached_extraction({
+            "sha256": sha256, "parser_version": _extraction_cache_version(), "results": parsed,
+            "report_date": report_date, "page_count": extracted["page_count"], "created_at": _now(),
+        })
+    else:
+        metrics.incr("labs.extraction_truncated")
+    return parsed, report_date, notice
+
+
+_NO_TESTS_FOUND = "No recognizable lab tests found in the PDF. Supported tests include: Hemoglobin, WBC, RBC, Glucose, HbA1c, Cholesterol, Vitamin D, B12, Iron, TSH, and more."
+
+
+@app.post("/patient/labs/upload", response_model=LabReportOut, status_code=201)
+async def upload_lab_report(request: Request, response: Response, file: UploadFile = File(...),
+                            current_user=Depends(require_role("patient"))):
+    """Upload a PDF blood report and automatically extract & analyze lab values."""
+    if not file.filename or not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Please upload a PDF file.")
+
+    path, sha256 = await uploads.spool_to_disk(file)
+    try:
+        # Same file uploaded again by the same patient: hand back the existing report
+        existing = find_lab_report_by_hash(current_user["id"], sha256)
+        if existing:
+            metrics.incr("labs.duplicate_uploads")
+            response.status_code = 200
+            return _lab_report_out(existing, duplicate=True)
+        parsed, report_date, notice = await _extract_lab_values(path, sha256, request)
+    finally:
+        uploads.discard(path)
 
-    # Parse lab values from extracted text
-    parsed = _parse_lab_values_from_text(text)
     if not parsed:
-        raise HTTPException(status_code=400, detail="No recognizable lab tests found in the PDF. Supported tests include: Hemoglobin, WBC, RBC, Glucose, HbA1c, Cholesterol, Vitamin D, B12, Iron, TSH, and more.")
+        raise HTTPException(status_code=400, detail=_NO_TESTS_FOUND)
 
     # Save and classify (reuse same logic as manual entry)
-    report_id = _uid()
-    now = _now()
-    report_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    create_lab_report({"id": report_id, "patient_id": current_user["id"], "report_date": report_date, "created_at": now})
+    report = _build_lab_report(current_user["id"], parsed, report_date, sha256)
+    create_lab_report(report)
+    add_lab_results(report["results"])
+    return _lab_report_out(report, notice=notice)
+
+
+@app.post("/patient/labs/upload/batch", response_model=LabBatchUploadOut, status_code=201)
+async def upload_lab_reports_batch(request: Request, files: List[UploadFile] = File(...),
+                                   current_user=Depends(require_role("patient"))):
+    """Upload several PDF reports, or ZIP archives of them, in one request.
+
+    Files are extracted in parallel; every new report is inserted in a single
+    transaction and the response lists the outcome for each file.
+    """
+    statuses: list[dict] = []
+    pending: list[dict] = []  # {"filename", "path", "sha256"} awaiting extraction
+    try:
+        for f in files:
+            name = f.filename or ""
+            if name.lower().endswith(".zip"):
+                zip_path, _ = await uploads.spool_to_disk(f, uploads.UPLOAD_BATCH_MAX_BYTES, suffix=".zip")
+                try:
+                    entries = await run_in_threadpool(uploads.unpack_zip, zip_path)
+                finally:
+                    uploads.discard(zip_path)
+                for e in entries:
+                    e["filename"] = f"{name}/{e['filename']}" if e["filename"] else name
+                    (pending if "path" in e else statuses).append(e)
+            elif name.lower().endswith(".pdf"):
+                path, sha256 = await uploads.spool_to_disk(f)
+                pending.append({"filename": name, "path": path, "sha256": sha256})
+            else:
+                statuses.append({"filename": name, "status": "skipped", "detail": "Not a PDF or ZIP file."})
+            if len(pending) > uploads.UPLOAD_BATCH_MAX_FILES:
+                raise HTTPException(status_code=413, detail=f"A batch can contain at most {uploads.UPLOAD_BATCH_MAX_FILES} PDF files.")
+
+        # Duplicates of earlier uploads, or repeated within this batch, are not re-extracted
+        seen: dict[str, str] = {}
+        to_extract = []
+        for item in pending:
+            existing = find_lab_report_by_hash(current_user["id"], item["sha256"])
+            if existing or item["sha256"] in seen:
+                statuses.append({"filename": item["filename"], "status": "duplicate",
+                                 "report_id": existing["id"] if existing else None,
+                                 "report_date": existing["report_date"] if existing else None,
+                                 "detail": "Same file as " + (f"report {existing['id']}" if existing else seen[item["sha256"]]) + "."})
+                continue
+            seen[item["sha256"]] = item["filename"]
+            to_extract.append(item)
+
+        # At most PDF_WORKERS files in flight per batch so single uploads still get a slot
+        limit = asyncio.Semaphore(pdf_extract.PDF_WORKERS)
+
+        async def _extract(item: dict):
+            async with limit:
+                return await _extract_lab_values(item["path"], item["sha256"], request, wait_for_slot=True)
+
+        outcomes = await asyncio.gather(*(_extract(i) for i in to_extract), return_exceptions=True)
+    finally:
+        for item in pending:
+            uploads.discard(item["path"])
+
+    reports = []
+    for item, outcome in zip(to_extract, outcomes):
+        if isinstance(outcome, HTTPException):
+            statuses.append({"filename": item["filename"], "status": "failed", "detail": outcome.detail})
+            continue
+        if isinstance(outcome, BaseException):
+            raise outcome
+        parsed, report_date, notice = outcome
+        if not parsed:
+            statuses.append({"filename": item["filename"], "status": "failed", "detail": notice or _NO_TESTS_FOUND})
+            continue
+        report = _build_lab_report(current_user["id"], parsed, report_date, item["sha256"])
+        reports.append(report)
+        statuses.append({"filename": item["filename"], "status": "created", "report_id": report["id"],
+                         "report_date": report["report_date"], "tests_found": len(report["results"]),
+                         "truncated": notice is not None, "detail": notice})
 
-    results_out = []
-    deficiencies = []
-    result_rows = []
-    for item in parsed:
-        lab_status, ref_low, ref_high, def_name, explanation = classify_lab_result(item["test_name"], item["value"], item.get("unit"))
-        res_id = _uid()
-        result_rows.append({
-            "id": res_id, "report_id": report_id, "test_name": item["test_name"],
-            "value": item["value"], "unit": item.get("unit", ""), "status": lab_status,
-            "ref_range_low": ref_low, "ref_range_high": ref_high,
-        })
-        results_out.append(LabResultOut(
-            id=res_id, report_id=report_id, test_name=item["test_name"],
-            value=item["value"], unit=item.get("unit", ""), status=lab_status,
-            ref_range_low=ref_low, ref_range_high=ref_high,
-            deficiency_name=def_name if lab_status == "low" else None,
-            explanation=explanation if lab_status in ("low", "high") else None,
-        ))
-        if lab_status == "low" and def_name:
-            deficiencies.append(def_name)
-    add_lab_results(result_rows)
-    return LabReportOut(id=report_id, patient_id=current_user["id"], report_date=report_date,
-                        created_at=now, results=results_out, deficiency_summary=deficiencies)
+    if reports:
+        create_lab_reports_batch(reports)
+    metrics.incr("labs.batch_uploads")
+    metrics.incr("labs.batch_reports_created", len(reports))
+    counts = {k: sum(1 for st in statuses if st["status"] == k) for k in ("created", "duplicate", "failed", "skipped")}
+    return LabBatchUploadOut(**counts, files=statuses)
 
 
 @app.get("/patient/labs")
-def list_labs(current_user=Depends(require_role("patient"))):
+def list_labs(request: Request, current_user=Depends(require_role("patient"))):
+    etag = _etag(request, patient_scope(current_user["id"]))
+    if _fresh(request, etag):
+        return _not_modified(etag)
     reports = get_lab_reports(current_user["id"])
     # Enrich with deficiency_summary
     for rpt in reports:
@@ -506,14 +708,17 @@ def list_labs(current_user=Depends(require_role("patient"))):
             for r in rpt.get("results", []) if r["status"] == "low"
             and LAB_RANGES.get(r["test_name"], {}).get("deficiency_name")
         ]
-    return reports
+    return json_response(reports, headers=_etag_headers(etag))
 
 
 # ─── Dashboard ────────────────────────────────────────────────────────────────
 
 @app.get("/patient/dashboard/summary")
-def dashboard_summary(current_user=Depends(require_role("patient"))):
-    return get_dashboard_summary(current_user["id"])
+def dashboard_summary(request: Request, current_user=Depends(require_role("patient"))):
+    # next_appointment also depends on the clock; booking slots start on the hour
+    return _cached_json(request, patient_scope(current_user["id"]),
+                        lambda: get_dashboard_summary(current_user["id"]),
+                        datetime.now(timezone.utc).strftime("%Y-%m-%dT%H"))
 
 
 # ─── Lifestyle ────────────────────────────────────────────────────────────────
@@ -530,8 +735,25 @@ def submit_lifestyle(req: LifestyleSubmit, current_user=Depends(require_role("pa
 
 
 @app.get("/patient/lifestyle")
-def get_lifestyle(current_user=Depends(require_role("patient"))):
-    return get_lifestyle_history(current_user["id"])
+def get_lifestyle(request: Request, current_user=Depends(require_role("patient"))):
+    etag = _etag(request, patient_scope(current_user["id"]))
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    return json_response(get_lifestyle_history(current_user["id"]), headers=_etag_headers(etag))
+
+
+# ─── Alerts ───────────────────────────────────────────────────────────────────
+
+# High triage, severe PHQ-9 and hypertensive-crisis readings, pushed to
+# connected doctors by /doctor/alerts/stream; see app/events.py
+ALERTS = events.EventBus("alerts")
+ALERT_HEARTBEAT_S = float(os.getenv("ALERT_HEARTBEAT_S", "15"))
+
+
+def _publish_alert(alert_type: str, patient: dict, detail: dict) -> None:
+    ALERTS.publish(alert_type, {
+        "patient_id": patient["id"], "patient_name": patient["name"], "created_at": _now(), **detail,
+    })
 
 
 # ─── Symptom Checker ──────────────────────────────────────────────────────────
@@ -546,13 +768,18 @@ def check_symptoms(req: SymptomCheckRequest, current_user=Depends(require_role("
         "symptoms": req.symptoms, "score": score, "triage_level": level,
         "severity": req.severity, "duration": req.duration, "created_at": _now(),
     })
+    if level == "High":
+        _publish_alert("triage_high", current_user, {"check_id": check_id, "score": score, "symptoms": req.symptoms})
     return SymptomCheckOut(id=check_id, score=score, triage_level=level, guidance=guidance,
                            symptoms=req.symptoms, created_at=_now())
 
 
 @app.get("/patient/symptoms/history")
-def symptom_history(current_user=Depends(require_role("patient"))):
-    return get_symptom_history(current_user["id"])
+def symptom_history(request: Request, current_user=Depends(require_role("patient"))):
+    etag = _etag(request, patient_scope(current_user["id"]))
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    return json_response(get_symptom_history(current_user["id"]), headers=_etag_headers(etag))
 
 
 # ─── Mental Wellness ──────────────────────────────────────────────────────────
@@ -572,6 +799,8 @@ def _submit_mental(assessment_type: str, req: MentalAssessmentSubmit, current_us
         "id": a_id, "patient_id": current_user["id"], "type": assessment_type,
         "score": score, "severity": severity, "answers": req.answers, "created_at": _now(),
     })
+    if assessment_type == "phq9" and severity == "Severe":
+        _publish_alert("phq9_severe", current_user, {"assessment_id": a_id, "score": score, "severity": severity})
     return MentalAssessmentOut(id=a_id, type=assessment_type, score=score, severity=severity,
                                created_at=_now(), safety_message=safety_msg)
 
@@ -587,8 +816,11 @@ def gad7(req: MentalAssessmentSubmit, current_user=Depends(require_role("patient
 
 
 @app.get("/patient/mental/history")
-def mental_history(type: Optional[str] = None, current_user=Depends(require_role("patient"))):
-    return get_mental_history(current_user["id"], type)
+def mental_history(request: Request, type: Optional[str] = None, current_user=Depends(require_role("patient"))):
+    etag = _etag(request, patient_scope(current_user["id"]))
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    return json_response(get_mental_history(current_user["id"], type), headers=_etag_headers(etag))
 
 
 # ─── Chronic Tracker (Blood Pressure) ────────────────────────────────────────
@@ -602,13 +834,19 @@ def log_chronic(req: ChronicLogCreate, current_user=Depends(require_role("patien
         "value": {"systolic": req.systolic, "diastolic": req.diastolic},
         "flagged": flagged, "flag_label": label, "created_at": _now(),
     })
+    if label == "Hypertensive Crisis":
+        _publish_alert("bp_crisis", current_user, {"log_id": log_id, "systolic": req.systolic,
+                                                   "diastolic": req.diastolic, "flag_label": label})
     return ChronicLogOut(id=log_id, value={"systolic": req.systolic, "diastolic": req.diastolic},
                          flagged=flagged, flag_label=label, created_at=_now(), guidance=guidance)
 
 
 @app.get("/patient/chronic/history")
-def chronic_history(current_user=Depends(require_role("patient"))):
-    return get_chronic_history(current_user["id"])
+def chronic_history(request: Request, current_user=Depends(require_role("patient"))):
+    etag = _etag(request, patient_scope(current_user["id"]))
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    return json_response(get_chronic_history(current_user["id"]), headers=_etag_headers(etag))
 
 
 # ─── Diet Plan ────────────────────────────────────────────────────────────────
@@ -632,18 +870,20 @@ def create_diet_plan(req: DietPreferences, current_user=Depends(require_role("pa
 
 
 @app.get("/patient/diet/latest")
-def get_diet(current_user=Depends(require_role("patient"))):
-    plan = get_latest_meal_plan(current_user["id"])
-    if not plan:
-        raise HTTPException(status_code=404, detail="No diet plan found. Generate one first.")
-    return plan
+def get_diet(request: Request, current_user=Depends(require_role("patient"))):
+    def load():
+        plan = get_latest_meal_plan(current_user["id"])
+        if not plan:
+            raise HTTPException(status_code=404, detail="No diet plan found. Generate one first.")
+        return plan
+    return _cached_json(request, patient_scope(current_user["id"]), load)
 
 
 # ─── Doctors & Appointments ───────────────────────────────────────────────────
 
 @app.get("/doctors")
-def get_doctors(current_user=Depends(get_current_user)):
-    return list_doctors()
+def get_doctors(request: Request, current_user=Depends(get_current_user)):
+    return _cached_json(request, "doctors", list_doctors)
 
 
 @app.get("/appointments/slots")
@@ -683,19 +923,15 @@ def cancel_appt(req: AppointmentCancel, current_user=Depends(require_role("patie
 
 
 @app.get("/appointments")
-def my_appointments(current_user=Depends(require_role("patient"))):
-    return get_patient_appointments(current_user["id"])
+def my_appointments(request: Request, current_user=Depends(require_role("patient"))):
+    return _cached_json(request, patient_scope(current_user["id"]),
+                        lambda: get_patient_appointments(current_user["id"]))
 
 
 # ─── Diabetes Prediction ──────────────────────────────────────────────────────
 
-@app.post("/patient/predict/diabetes", response_model=DiabetesPredictResponse)
-def predict_diabetes(req: DiabetesPredictRequest, current_user=Depends(require_role("patient"))):
-    if DIABETES_MODEL is None:
-        raise HTTPException(status_code=503, detail="Diabetes prediction model not loaded")
-
-    # ── Map user-friendly inputs → model features ──────────────────────────
-
+def _diabetes_features(req: DiabetesPredictRequest) -> list[float]:
+    """Map user-friendly inputs to the model's 8 Pima features."""
     # BMI from height + weight
     height_m = req.height_cm / 100.0
     bmi = req.weight_kg / (height_m * height_m) if height_m > 0 else 25.0
@@ -726,39 +962,124 @@ def predict_diabetes(req: DiabetesPredictRequest, current_user=Depends(require_r
     # Skin thickness: dataset median (hidden from user)
     skin_thickness = 29
 
-    # Build feature array: [Pregnancies, Glucose, BP, SkinThickness, Insulin, BMI, Pedigree, Age]
-    features = np.array([[
-        pregnancies, glucose, blood_pressure, skin_thickness,
-        insulin, bmi, diabetes_pedigree, req.age,
-    ]])
+    # [Pregnancies, Glucose, BP, SkinThickness, Insulin, BMI, Pedigree, Age]
+    return [pregnancies, glucose, blood_pressure, skin_thickness,
+            insulin, bmi, diabetes_pedigree, req.age]
+
+
+def _score_diabetes_rows(X: np.ndarray) -> list:
+    """(P(diabetes=1), model, explanation) for each row of X; the whole batch uses one model version."""
+    model = DIABETES_REGISTRY.production()
+    if model is None:
+        raise RegistryError("No production diabetes model")
+    proba = model.predict_proba(X)
+    DIABETES_REGISTRY.compare_shadow(X, proba, model.version)
+    explained = model.explain(X)
+    if explained is None:
+        return [(p, model, None) for p in proba]
+    bias, contrib = explained
+    return [(p, model, (b, c)) for p, b, c in zip(proba, bias, contrib)]
+
+
+_DIABETES_BATCHER = inference.MicroBatcher("diabetes", _score_diabetes_rows)
+
+
+# Repeat predictions (same derived features, same model version) skip inference.
+# With quantization on, features are snapped to clinically meaningless steps
+# first, so near-identical slider positions share an entry; the snapped vector
+# is also what gets scored, so a cached answer equals a fresh one. Entries are
+# plain floats and tuples (_prediction_entry), so they don't pin old models.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+PREDICTION_CACHE_QUANTIZE = os.getenv("PREDICTION_CACHE_QUANTIZE", "0") == "1"
+# Pregnancies, Glucose, BP, SkinThickness, Insulin, BMI, Pedigree, Age
+_FEATURE_STEPS = [1, 1, 1, 1, 1, 0.1, 0.01, 1]
+_PREDICTION_CACHE = cache.TTLCache("diabetes_cache", PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S)
+
+
+def _quantize(features: list) -> list:
+    return [round(round(x / step) * step, 4) for x, step in zip(features, _FEATURE_STEPS)]
+
+
+_DIABETES_FEATURE_LABELS = {
+    "BloodPressure": "Blood Pressure", "SkinThickness": "Skin Thickness",
+    "DiabetesPedigreeFunction": "Diabetes Pedigree",
+}
+_IMPORTANCE_PAYLOADS: Dict[str, List[FeatureImportance]] = {}
+
+
+def _importance_payload(model) -> List[FeatureImportance]:
+    """Global feature importances for a model version, built once per version."""
+    payload = _IMPORTANCE_PAYLOADS.get(model.version)
+    if payload is None:
+        payload = [FeatureImportance(feature=_DIABETES_FEATURE_LABELS.get(n, n), importance=round(v, 4))
+                   for n, v in model.importances]
+        _IMPORTANCE_PAYLOADS[model.version] = payload
+    return payload
+
+
+def _prediction_entry(features: list, proba, model, explanation) -> tuple:
+    """One scored row as plain data for the prediction cache (no model or numpy references).
+
+    (version, probability, risk level, accuracy, base probability, ((feature, value, contribution), ...))
+    """
+    _importance_payload(model)  # cache hits look the payload up by version
+    base_probability = None
+    contributions = ()
+    if explanation is not None:
+        bias, contrib = explanation
+        base_probability = round(float(bias), 4)
+        contributions = tuple(sorted(
+            ((_DIABETES_FEATURE_LABELS.get(n, n), round(float(x), 2), round(float(c), 4))
+             for n, x, c in zip(model.features, features, contrib)),
+            key=lambda fc: -abs(fc[2]),
+        ))
+    return (model.version, round(float(proba), 4), _risk_level(float(proba)), round(float(model.accuracy), 4),
+            base_probability, contributions)
 
-    # Predict probability
-    proba = DIABETES_MODEL.predict_proba(features)[0][1]  # P(diabetes=1)
 
-    # Risk level
+def _risk_level(proba: float) -> str:
     if proba < 0.33:
-        risk_level = "Low"
-    elif proba < 0.66:
-        risk_level = "Medium"
-    else:
-        risk_level = "High"
+        return "Low"
+    if proba < 0.66:
+        return "Medium"
+    return "High"
 
-    # Feature importances from the trained model
-    importances = DIABETES_MODEL.feature_importances_
-    feature_names = [
-        "Pregnancies", "Glucose", "Blood Pressure", "Skin Thickness",
-        "Insulin", "BMI", "Diabetes Pedigree", "Age",
-    ]
-    fi_list = sorted(
-        [FeatureImportance(feature=n, importance=round(float(v), 4)) for n, v in zip(feature_names, importances)],
-        key=lambda x: -x.importance,
-    )
+
+@app.post("/patient/predict/diabetes", response_model=DiabetesPredictResponse)
+def predict_diabetes(req: DiabetesPredictRequest, current_user=Depends(require_role("patient"))):
+    if not DIABETES_REGISTRY.state().get("production"):
+        raise HTTPException(status_code=503, detail="Diabetes prediction model not loaded")
+
+    features = _diabetes_features(req)
+    if PREDICTION_CACHE_QUANTIZE:
+        features = _quantize(features)
+
+    entry = _PREDICTION_CACHE.get((DIABETES_REGISTRY.state().get("production"), tuple(features)))
+    if entry is None:
+        # Predict probability; concurrent requests are scored together as one matrix
+        try:
+            if inference.INFERENCE_BATCHING:
+                scored = _DIABETES_BATCHER.submit(features)
+            else:
+                scored = _score_diabetes_rows(np.array([features]))[0]
+        except RegistryError:
+            raise HTTPException(status_code=503, detail="Diabetes prediction model not loaded")
+        except FutureTimeoutError:
+            metrics.incr("diabetes.timeouts")
+            raise HTTPException(status_code=503, detail="The prediction service is busy. Please try again in a moment.",
+                                headers={"Retry-After": "5"})
+        entry = _prediction_entry(features, *scored)
+        _PREDICTION_CACHE.put((entry[0], tuple(features)), entry)
+    version, probability, risk_level, accuracy, base_probability, contributions = entry
 
     return DiabetesPredictResponse(
-        probability=round(float(proba), 4),
+        probability=probability,
         risk_level=risk_level,
-        accuracy=round(float(DIABETES_ACCURACY), 4),
-        feature_importances=fi_list,
+        accuracy=accuracy,
+        feature_importances=_IMPORTANCE_PAYLOADS[version],
+        base_probability=base_probability,
+        contributions=[FeatureContribution(feature=f, value=v, contribution=c) for f, v, c in contributions],
     )
 
 
@@ -778,45 +1099,163 @@ RULES (CRITICAL - NEVER VIOLATE):
 Start every response by directly addressing the question. End with a brief reminder that professional medical advice is essential for any health decision."""
 
 
+def _chat_messages(req: ChatRequest, current_user: dict) -> list:
+    system_content = SYSTEM_PROMPT
+    if req.include_context:
+        # Inject patient context
+        summary = get_dashboard_summary(current_user["id"])
+        context_parts = [f"Patient: {current_user['name']}"]
+        if summary.get("deficiency_count"):
+            context_parts.append(f"Active deficiencies: {summary['deficiency_count']}")
+        if summary.get("lifestyle_category"):
+            context_parts.append(f"Lifestyle: {summary['lifestyle_category']} (score: {summary['lifestyle_score']})")
+        if summary.get("last_triage"):
+            context_parts.append(f"Last symptom triage: {summary['last_triage']}")
+        if summary.get("last_phq9_severity"):
+            context_parts.append(f"Last PHQ-9 severity: {summary['last_phq9_severity']}")
+        if summary.get("last_chronic_flag_label"):
+            context_parts.append(f"Last BP reading: {summary['last_chronic_flag_label']}")
+        if context_parts:
+            system_content += "\n\nPatient Context:\n" + "\n".join(context_parts)
+
+    messages = [{"role": "system", "content": system_content}]
+    messages += [{"role": m.role, "content": m.content} for m in req.messages]
+    return messages
+
+
+def _chat_error_reply(e: Exception) -> str:
+    return f"I'm currently unable to process your request. Please try again later. (Error: {type(e).__name__}: {str(e)[:200]})"
+
+
+# Bounds concurrent LLM calls; see app/admission.py. Patient-facing chat turns
+# and background work (summaries, cache warming) are admitted separately.
+LLM_ADMISSION = admission.AdmissionController("llm_admission")
+LLM_BACKGROUND_ADMISSION = admission.AdmissionController(
+    "llm_background_admission", max_inflight=admission.LLM_BACKGROUND_MAX_INFLIGHT)
+
+
+async def _admit_chat(current_user: dict) -> admission.Ticket:
+    try:
+        return await LLM_ADMISSION.acquire(current_user["id"])
+    except admission.AdmissionError as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+
+SUMMARY_PROMPT = """Summarize this health-assistant conversation for the assistant's own memory.
+Keep the patient's questions, any health details they shared, and advice already given.
+Use at most 120 words, plain sentences, no preamble."""
+
+
+async def _summarize_chat(text: str) -> str:
+    async with await LLM_BACKGROUND_ADMISSION.acquire("_chat_summary") as ticket:
+        return await llm.complete([{"role": "system", "content": SUMMARY_PROMPT},
+                                   {"role": "user", "content": text}], timeout_s=ticket.remaining())
+
+
+CHAT_WINDOW = chat_context.ConversationWindow(summarize=_summarize_chat)
+
+
+async def _chat_prompt(req: ChatRequest, current_user: dict) -> list:
+    messages = await run_in_threadpool(_chat_messages, req, current_user)
+    key = (current_user["id"], req.conversation_id) if req.conversation_id else None
+    return CHAT_WINDOW.build(key, messages[:1], messages[1:])
+
+
+# General questions asked without patient context; see app/chat_cache.py
+CHAT_CACHE = chat_cache.ResponseCache()
+
+
+def _chat_cache_key(req: ChatRequest, messages: list):
+    if req.include_context:
+        return None
+    return CHAT_CACHE.key(messages, f"{llm.LLM_BACKEND}:{llm.LLM_MODEL}")
+
+
+async def _warm_chat_cache() -> int:
+    async def generate(messages):
+        async with await LLM_BACKGROUND_ADMISSION.acquire("_chat_cache_warmer") as ticket:
+            return await llm.complete(messages, timeout_s=ticket.remaining())
+
+    prompts = [[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": q}]
+               for q in chat_cache.warm_questions(LAB_RANGES)]
+    added = await chat_cache.warm(CHAT_CACHE, prompts, f"{llm.LLM_BACKEND}:{llm.LLM_MODEL}", generate)
+    print(f"  Chat cache warmed: {added} answers added ({len(CHAT_CACHE)} cached)")
+    return added
+
+
+_CHAT_DEADLINE_REPLY = "Sorry, that took too long to answer. Please try again or ask a shorter question."
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest, current_user=Depends(require_role("patient"))):
+async def chat(req: ChatRequest, current_user=Depends(require_role("patient"))):
+    try:
+        messages = await _chat_prompt(req, current_user)
+        cache_key = _chat_cache_key(req, messages)
+        cached = CHAT_CACHE.get(cache_key)
+        if cached is not None:
+            return ChatResponse(reply=cached)
+        async with await _admit_chat(current_user) as ticket:
+            start = time.perf_counter()
+            reply = await llm.complete(messages, timeout_s=ticket.remaining())
+            CHAT_CACHE.put(cache_key, reply, time.perf_counter() - start)
+            return ChatResponse(reply=reply)
+    except HTTPException:
+        raise  # admission refused: 503 with Retry-After
+    except asyncio.TimeoutError:
+        return ChatResponse(reply=_CHAT_DEADLINE_REPLY)
+    except Exception as e:
+        return ChatResponse(reply=_chat_error_reply(e))
+
+
+def _sse(data: dict, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    head = (f"id: {event_id}\n" if event_id is not None else "") + (f"event: {event}\n" if event else "")
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest, current_user=Depends(require_role("patient"))):
+    """Server-sent events: `data: {"delta": ...}` per fragment, then `event: done` (or `event: error`)."""
     try:
-        from groq import Groq
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-        system_content = SYSTEM_PROMPT
-        if req.include_context:
-            # Inject patient context
-            summary = get_dashboard_summary(current_user["id"])
-            context_parts = [f"Patient: {current_user['name']}"]
-            if summary.get("deficiency_count"):
-                context_parts.append(f"Active deficiencies: {summary['deficiency_count']}")
-            if summary.get("lifestyle_category"):
-                context_parts.append(f"Lifestyle: {summary['lifestyle_category']} (score: {summary['lifestyle_score']})")
-            if summary.get("last_triage"):
-                context_parts.append(f"Last symptom triage: {summary['last_triage']}")
-            if summary.get("last_phq9_severity"):
-                context_parts.append(f"Last PHQ-9 severity: {summary['last_phq9_severity']}")
-            if summary.get("last_chronic_flag_label"):
-                context_parts.append(f"Last BP reading: {summary['last_chronic_flag_label']}")
-            if context_parts:
-                system_content += "\n\nPatient Context:\n" + "\n".join(context_parts)
-
-        messages = [{"role": "system", "content": system_content}]
-        messages += [{"role": m.role, "content": m.content} for m in req.messages]
-
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            max_tokens=600,
-            temperature=0.7,
-        )
-        reply = response.choices[0].message.content
-        return ChatResponse(reply=reply)
+        messages = await _chat_prompt(req, current_user)
     except Exception as e:
-        return ChatResponse(
-            reply=f"I'm currently unable to process your request. Please try again later. (Error: {type(e).__name__}: {str(e)[:200]})",
-        )
+        return StreamingResponse(iter([_sse({"reply": _chat_error_reply(e)}, event="error")]),
+                                 media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    cache_key = _chat_cache_key(req, messages)
+    cached = CHAT_CACHE.get(cache_key)
+    if cached is not None:
+        async def replay():
+            yield _sse({"delta": cached})
+            yield _sse({"disclaimer": ChatResponse(reply="").disclaimer}, event="done")
+        return StreamingResponse(replay(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    # Admitted before the response starts so a saturated server answers 503, not an empty stream
+    ticket = await _admit_chat(current_user)
+
+    async def events():
+        # A client disconnect cancels this generator, which closes the provider stream
+        try:
+            start = time.perf_counter()
+            parts = []
+            async for part in llm.stream_reply(messages, timeout_s=ticket.remaining()):
+                parts.append(part)
+                yield _sse({"delta": part})
+            CHAT_CACHE.put(cache_key, "".join(parts), time.perf_counter() - start)
+            yield _sse({"disclaimer": ChatResponse(reply="").disclaimer}, event="done")
+        except asyncio.CancelledError:
+            metrics.incr("llm.client_disconnects")
+            raise
+        except asyncio.TimeoutError:
+            yield _sse({"reply": _CHAT_DEADLINE_REPLY}, event="error")
+        except Exception as e:
+            yield _sse({"reply": _chat_error_reply(e)}, event="error")
+        finally:
+            ticket.release()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # don't let a reverse proxy buffer the stream
+    })
 
 
 # ─── Doctor Routes ────────────────────────────────────────────────────────────
@@ -834,35 +1273,272 @@ def doctor_patients(current_user=Depends(require_role("doctor"))):
             "deficiency_count": summary.get("deficiency_count", 0),
             "last_bp_flag": summary.get("last_chronic_flag_label"),
         })
-    return result
+    return json_response(result)
+
+
+# patient_id → ((model version, feature tuple), probability). A patient is only
+# re-scored when one of their inputs changes or a new model is promoted.
+_PANEL_SCORES: Dict[str, tuple] = {}
+# The assembled panel, keyed by (panel input version, model version), with its
+# sorted orderings. Requests between input changes skip the query entirely.
+_PANEL_VIEW: Dict[str, object] = {"key": None, "entries": [], "sorted": {}}
+_PANEL_LOCK = threading.Lock()
+
+# Profile fields the model needs; without them the request defaults stand in
+_PANEL_PROFILE_FIELDS = ("age", "gender", "height_cm", "weight_kg")
+
+
+def _panel_request(row: dict) -> DiabetesPredictRequest:
+    """Model inputs for a patient from stored data; unknown fields use the request defaults."""
+    req = DiabetesPredictRequest(glucose=row["glucose"], blood_pressure=row["diastolic"])
+    if row["age"]:
+        req.age = row["age"]
+    if row["gender"]:
+        req.gender = row["gender"].lower()
+    if row["height_cm"]:
+        req.height_cm = row["height_cm"]
+    if row["weight_kg"]:
+        req.weight_kg = row["weight_kg"]
+    return req
+
+
+def _score_panel(rows: list, model) -> tuple:
+    """Probabilities for every patient row, scoring only cache misses in one pass. Call under _PANEL_LOCK."""
+    features = [_diabetes_features(_panel_request(r)) for r in rows]
+    keys = [(model.version, tuple(f)) for f in features]
+    probs: List[Optional[float]] = []
+    misses = []
+    for i, (row, key) in enumerate(zip(rows, keys)):
+        cached = _PANEL_SCORES.get(row["patient_id"])
+        if cached is not None and cached[0] == key:
+            probs.append(cached[1])
+        else:
+            probs.append(None)
+            misses.append(i)
+    metrics.incr("diabetes_panel.cache_hits", len(rows) - len(misses))
+    metrics.incr("diabetes_panel.cache_misses", len(misses))
+    if misses:
+        with metrics.timer("diabetes_panel.score_seconds"):
+            scored = model.predict_proba(np.array([features[i] for i in misses], dtype=float))
+        for i, p in zip(misses, scored):
+            probs[i] = float(p)
+    # Rebuilt each time so removed patients drop out of the cache
+    _PANEL_SCORES.clear()
+    _PANEL_SCORES.update({r["patient_id"]: (k, p) for r, k, p in zip(rows, keys, probs)})
+    bmis = [f[5] for f in features]
+    return probs, bmis
+
+
+def _panel_entries(model) -> list:
+    """Unsorted panel entries for the current inputs and model. Call under _PANEL_LOCK."""
+    # Version read before the inputs: a racing write can only make the view rebuild again
+    key = (get_resource_version(DIABETES_PANEL_SCOPE), model.version)
+    if _PANEL_VIEW["key"] == key:
+        metrics.incr("diabetes_panel.view_hits")
+        return _PANEL_VIEW["entries"]
+    rows = get_diabetes_panel_inputs()
+    probs, bmis = _score_panel(rows, model)
+    entries = [{
+        "patient_id": r["patient_id"], "name": r["name"], "age": r["age"],
+        "probability": round(p, 4), "risk_level": _risk_level(p), "bmi": round(b, 1),
+        "glucose": r["glucose"], "diastolic": r["diastolic"],
+        "missing_inputs": [f for f in _PANEL_PROFILE_FIELDS if not r[f]],
+    } for r, p, b in zip(rows, probs, bmis)]
+    _PANEL_VIEW.update({"key": key, "entries": entries, "sorted": {}})
+    return entries
+
+
+@app.get("/doctor/risk/diabetes", response_model=DiabetesRiskPanelOut)
+def doctor_diabetes_risk(offset: int = 0, limit: int = 50, ascending: bool = False,
+                         current_user=Depends(require_role("doctor"))):
+    """Patients ranked by predicted risk; those with an incomplete profile come after the rest."""
+    if offset < 0 or not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 500")
+    model = DIABETES_REGISTRY.production()
+    if model is None:
+        raise HTTPException(status_code=503, detail="Diabetes prediction model not loaded")
+    with _PANEL_LOCK:
+        entries = _panel_entries(model)
+        ordered = _PANEL_VIEW["sorted"].get(ascending)
+        if ordered is None:
+            ordered = sorted(entries, key=lambda e: (
+                bool(e["missing_inputs"]), e["probability"] if ascending else -e["probability"], e["name"]))
+            _PANEL_VIEW["sorted"][ascending] = ordered
+    return {
+        "model_version": model.version, "total": len(ordered),
+        "incomplete": sum(1 for e in ordered if e["missing_inputs"]),
+        "offset": offset, "limit": limit,
+        "items": ordered[offset:offset + limit],
+    }
+
+
+@app.get("/doctor/patients/search", response_model=PatientSearchOut)
+def doctor_search_patients(q: str, offset: int = 0, limit: int = 20,
+                           current_user=Depends(require_role("doctor"))):
+    """Prefix search over name, email, gender and age; every word must match."""
+    if offset < 0 or not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 100")
+    found = search_patients(q, offset, limit)
+    return {"q": q, "offset": offset, "limit": limit, **found}
+
+
+# Default cap per history section when the caller doesn't pass one (0 = everything)
+PATIENT_SUMMARY_LIMIT = int(os.getenv("PATIENT_SUMMARY_LIMIT", "0"))
 
 
 @app.get("/doctor/patients/{patient_id}/summary")
-def doctor_patient_summary(patient_id: str, current_user=Depends(require_role("doctor"))):
-    user = get_user_by_id(patient_id)
-    if not user or user["role"] != "patient":
-        raise HTTPException(status_code=404, detail="Patient not found")
-    profile = get_patient_profile(patient_id) or {}
-    labs = get_lab_reports(patient_id)
-    lifestyle = get_lifestyle_history(patient_id)
-    symptoms = get_symptom_history(patient_id)
-    mental = get_mental_history(patient_id)
-    chronic = get_chronic_history(patient_id)
-    meal_plan = get_latest_meal_plan(patient_id)
-    appointments = get_patient_appointments(patient_id)
-    return {
-        "user": {"id": user["id"], "name": user["name"], "email": user["email"]},
-        "profile": profile,
-        "labs": labs,
-        "lifestyle": lifestyle,
-        "symptoms": symptoms,
-        "mental": mental,
-        "chronic": chronic,
-        "meal_plan": meal_plan,
-        "appointments": appointments,
+def doctor_patient_summary(
+    patient_id: str,
+    request: Request,
+    labs_limit: Optional[int] = None,
+    lifestyle_limit: Optional[int] = None,
+    symptoms_limit: Optional[int] = None,
+    mental_limit: Optional[int] = None,
+    chronic_limit: Optional[int] = None,
+    appointments_limit: Optional[int] = None,
+    current_user=Depends(require_role("doctor")),
+):
+    """Newest N rows per section (`<section>_limit`, 0 = all); `counts` has the full totals."""
+    requested = {
+        "labs": labs_limit, "lifestyle": lifestyle_limit, "symptoms": symptoms_limit,
+        "mental": mental_limit, "chronic": chronic_limit, "appointments": appointments_limit,
     }
+    if any(v is not None and v < 0 for v in requested.values()):
+        raise HTTPException(status_code=400, detail="Section limits must be >= 0")
+    limits = {k: PATIENT_SUMMARY_LIMIT if v is None else v for k, v in requested.items()}
+    # The limits are part of the URL, so they're part of the tag
+    etag = _etag(request, patient_scope(patient_id))
+    if _fresh(request, etag):
+        return _not_modified(etag)
+    snapshot = get_patient_snapshot(patient_id, limits)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return json_response(snapshot, headers=_etag_headers(etag))
+
+
+@app.get("/doctor/analytics")
+def doctor_analytics(weeks: int = 12, current_user=Depends(require_role("doctor"))):
+    """Population view from incrementally maintained counters; see app/analytics.py."""
+    if not 1 <= weeks <= 104:
+        raise HTTPException(status_code=400, detail="weeks must be between 1 and 104")
+    return get_cohort_analytics(weeks)
+
+
+@app.get("/doctor/alerts")
+def doctor_alerts(limit: int = 50, current_user=Depends(require_role("doctor"))):
+    """Alerts still held in memory, newest first (what the stream would have shown)."""
+    if not 1 <= limit <= 200:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 200")
+    return ALERTS.recent(limit)[::-1]
+
+
+@app.get("/doctor/alerts/stream")
+async def doctor_alerts_stream(request: Request, current_user=Depends(require_role("doctor"))):
+    """Server-sent events: `event: alert` with `id:` per alert, a comment heartbeat otherwise.
+
+    Reconnecting with Last-Event-ID replays retained alerts newer than that id.
+    """
+    last_id = request.headers.get("last-event-id", "")
+    subscription = ALERTS.subscribe(after=int(last_id) if last_id.isdigit() else None)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.get(timeout=ALERT_HEARTBEAT_S)
+                # Heartbeat keeps proxies from closing an idle stream and surfaces dead clients
+                yield ": ping\n\n" if event is None else _sse(event, event="alert", event_id=event["id"])
+        finally:
+            subscription.close()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 
 @app.get("/doctor/appointments")
 def doctor_appointments(current_user=Depends(require_role("doctor"))):
     return get_doctor_appointments(current_user["id"])
+
+
+# ─── Admin ────────────────────────────────────────────────────────────────────
+
+@app.get("/admin/metrics")
+def admin_metrics(_admin=Depends(require_admin)):
+    return metrics.snapshot()
+
+
+def _model_registry_view() -> dict:
+    state = DIABETES_REGISTRY.state()
+    return {
+        **state,
+        "versions": [_model_version_view(v) for v in DIABETES_REGISTRY.versions()],
+    }
+
+
+def _model_version_view(version: str) -> dict:
+    try:
+        return DIABETES_REGISTRY.metadata(version)
+    except ArtifactError as e:
+        return {"version": version, "error": str(e)}
+
+
+@app.get("/admin/models")
+def admin_list_models(_admin=Depends(require_admin)):
+    return _model_registry_view()
+
+
+@app.post("/admin/models/promote")
+def admin_promote_model(req: ModelVersionRequest, _admin=Depends(require_admin)):
+    if not req.version:
+        raise HTTPException(status_code=400, detail="version is required")
+    try:
+        DIABETES_REGISTRY.promote(req.version)
+    except ArtifactError as e:
+        # Present but broken on disk; nothing was switched
+        raise HTTPException(status_code=422, detail=str(e))
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _model_registry_view()
+
+
+@app.post("/admin/models/rollback")
+def admin_rollback_model(_admin=Depends(require_admin)):
+    try:
+        DIABETES_REGISTRY.rollback()
+    except ArtifactError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _model_registry_view()
+
+
+@app.post("/admin/models/shadow")
+def admin_shadow_model(req: ModelVersionRequest, _admin=Depends(require_admin)):
+    try:
+        DIABETES_REGISTRY.set_shadow(req.version)
+    except ArtifactError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _model_registry_view()
+
+
+@app.post("/admin/chat-cache/warm")
+async def admin_warm_chat_cache(_admin=Depends(require_admin)):
+    """Precompute answers to the general question for each lab explanation topic."""
+    added = await _warm_chat_cache()
+    return {"added": added, "entries": len(CHAT_CACHE)}
+
+
+@app.get("/admin/analytics/verify")
+def admin_verify_analytics(_admin=Depends(require_admin)):
+    """Recompute the cohort counters from source rows and list any that drifted (read-only)."""
+    mismatches = verify_analytics()
+    return {"ok": not mismatches, "mismatches": mismatches}
+
+
+@app.post("/admin/analytics/recompute")
+def admin_recompute_analytics(_admin=Depends(require_admin)):
+    return {"buckets": recompute_analytics()}
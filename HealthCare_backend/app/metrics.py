@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+# Lightweight in-process metrics. Counters and gauges are plain numbers;
+# histograms keep a bounded window of recent samples so percentiles stay cheap.
+
+_HISTOGRAM_WINDOW = 2048
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_histograms: Dict[str, Deque[float]] = {}
+_histogram_totals: Dict[str, int] = {}
+
+
+def incr(name: str, amount: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def add_gauge(name: str, delta: float) -> None:
+    with _lock:
+        _gauges[name] = _gauges.get(name, 0) + delta
+
+
+def observe(name: str, value: float) -> None:
+    with _lock:
+        samples = _histograms.get(name)
+        if samples is None:
+            samples = _histograms[name] = deque(maxlen=_HISTOGRAM_WINDOW)
+        samples.append(value)
+        _histogram_totals[name] = _histogram_totals.get(name, 0) + 1
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Observe the wall time (seconds) of the wrapped block under `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def histogram_summary(name: str) -> Dict[str, float]:
+    with _lock:
+        ordered = sorted(_histograms.get(name, ()))
+        total = _histogram_totals.get(name, 0)
+    return {
+        "count": total,
+        "window": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": _percentile(ordered, 50),
+        "p90": _percentile(ordered, 90),
+        "p95": _percentile(ordered, 95),
+        "p99": _percentile(ordered, 99),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def snapshot() -> Dict[str, Dict]:
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        names = list(_histograms)
+    return {
+        "counters": counters,
+        "gauges": gauges,
+        "histograms": {n: histogram_summary(n) for n in names},
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        _histogram_totals.clear()
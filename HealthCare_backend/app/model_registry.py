@@ -0,0 +1,363 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from . import metrics
+from .forest import CompiledForest, compile_model
+
+# Versioned model artifacts on disk:
+#
+#   <root>/<version>/model.joblib     {"model", "features", "accuracy"} as saved by training
+#   <root>/<version>/forest.joblib    compiled node arrays (random forests only)
+#   <root>/<version>/metadata.json    features, accuracy, training data hash, ...
+#   <root>/state.json                 {"production", "history", "shadow"}
+#
+# Forest arrays are loaded lazily with mmap_mode="r", so every worker process
+# on a host shares the same page-cache pages; the sklearn object is only
+# unpickled if something needs it. state.json is replaced atomically, and each
+# worker re-reads it when its mtime changes, so promote/rollback reach every
+# worker without a restart. In-flight requests keep the model they started with.
+
+logger = logging.getLogger(__name__)
+
+MODEL_REGISTRY_POLL_S = float(os.getenv("MODEL_REGISTRY_POLL_S", "5"))
+SHADOW_TOLERANCE = float(os.getenv("SHADOW_TOLERANCE", "0.1"))  # |Δprobability| counted as disagreement
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "32"))  # queued comparisons before new ones are skipped
+
+# One path component: no separators, no leading dot
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class RegistryError(Exception):
+    pass
+
+
+class ArtifactError(RegistryError):
+    """The version exists but its files can't be read (corrupt, truncated, unreadable)."""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write_json(path: str, data: Dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def check_version(version: str) -> str:
+    if not isinstance(version, str) or not _VERSION_RE.match(version):
+        raise RegistryError(f"Invalid model version: {version!r}")
+    return version
+
+
+class LoadedModel:
+    """One model version, ready to score. Treated as immutable once built."""
+
+    def __init__(self, version: str, directory: str, metadata: Dict):
+        self.version = version
+        self.directory = directory
+        self.metadata = metadata
+        self.features: List[str] = metadata["features"]
+        self.accuracy: float = metadata.get("accuracy", 0.0)
+        self._model = None
+        self._lock = threading.Lock()
+        forest_path = os.path.join(directory, "forest.joblib")
+        self.forest: Optional[CompiledForest] = (
+            CompiledForest.load(forest_path, mmap_mode="r") if os.path.exists(forest_path) else None
+        )
+        # (feature, importance) sorted once per version; None until first asked
+        self._importances: Optional[List[tuple]] = None
+
+    @property
+    def model(self):
+        """The original estimator, unpickled on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    artifact = joblib.load(os.path.join(self.directory, "model.joblib"), mmap_mode="r")
+                    self._model = artifact["model"]
+        return self._model
+
+    @property
+    def importances(self) -> List[tuple]:
+        if self._importances is None:
+            values = self.metadata.get("feature_importances") or self.model.feature_importances_
+            self._importances = sorted(zip(self.features, (float(v) for v in values)), key=lambda x: -x[1])
+        return self._importances
+
+    def explain(self, X: np.ndarray) -> Optional[tuple]:
+        """(bias, per-feature contributions) for P(class=1), or None if the model isn't a forest."""
+        if self.forest is None:
+            return None
+        return self.forest.contributions(X)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """P(class=1) for each row."""
+        if self.forest is not None:
+            return self.forest.predict_proba(X)[:, 1]
+        return self.model.predict_proba(X)[:, 1]
+
+
+class ModelRegistry:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, LoadedModel] = {}
+        self._state: Dict = {"production": None, "history": [], "shadow": None}
+        self._state_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._shadow_pending = 0
+        self._shadow_lock = threading.Lock()
+
+    @property
+    def _state_path(self) -> str:
+        return os.path.join(self.root, "state.json")
+
+    # ─── Versions ─────────────────────────────────────────────────────────────
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        found = [d for d in os.listdir(self.root)
+                 if os.path.exists(os.path.join(self.root, d, "metadata.json"))]
+        return sorted(found, key=lambda v: (len(v), v))
+
+    def metadata(self, version: str) -> Dict:
+        path = os.path.join(self.root, check_version(version), "metadata.json")
+        if not os.path.exists(path):
+            raise RegistryError(f"Unknown model version: {version}")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise ArtifactError(f"Model version {version} has unreadable metadata: {e}") from e
+
+    def _next_version(self) -> str:
+        nums = [int(v[1:]) for v in self.versions() if v.startswith("v") and v[1:].isdigit()]
+        return f"v{max(nums, default=0) + 1}"
+
+    def register(self, artifact_path: str, metadata: Optional[Dict] = None, version: Optional[str] = None) -> str:
+        """Copy a trained artifact into the registry as a new version (not promoted)."""
+        artifact = joblib.load(artifact_path)
+        model = artifact["model"]
+        with self._lock:
+            version = check_version(version or self._next_version())
+            directory = os.path.join(self.root, version)
+            if os.path.exists(directory):
+                raise RegistryError(f"Model version already exists: {version}")
+            os.makedirs(self.root, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.root, prefix=f".{version}-")
+            try:
+                shutil.copyfile(artifact_path, os.path.join(staging, "model.joblib"))
+                forest = compile_model(model)
+                if forest is not None:
+                    forest.save(os.path.join(staging, "forest.joblib"))
+                meta = {
+                    "version": version,
+                    "features": artifact["features"],
+                    "accuracy": artifact.get("accuracy", 0.0),
+                    "model_type": type(model).__name__,
+                    "feature_importances": [float(v) for v in getattr(model, "feature_importances_", [])],
+                    "artifact_sha256": file_sha256(artifact_path),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    **(metadata or {}),
+                }
+                with open(os.path.join(staging, "metadata.json"), "w", encoding="utf-8") as f:
+                    json.dump(meta, f, indent=2)
+                os.replace(staging, directory)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        return version
+
+    def bootstrap(self, legacy_path: str, training_data_path: Optional[str] = None) -> None:
+        """Nothing in production yet: adopt the pre-registry artifact and promote it.
+
+        Versions registered by the training CLI before the API first started
+        are left alone (registering never promotes).
+        """
+        os.makedirs(self.root, exist_ok=True)
+        if self.state().get("production") or not os.path.exists(legacy_path):
+            return
+        legacy_sha = file_sha256(legacy_path)
+        version = next((v for v in self.versions()
+                        if self.metadata(v).get("artifact_sha256") == legacy_sha), None)
+        if version is None:
+            meta = {"source": os.path.basename(legacy_path)}
+            if training_data_path and os.path.exists(training_data_path):
+                meta["training_data_sha256"] = file_sha256(training_data_path)
+            version = self.register(legacy_path, meta)
+        self.promote(version)
+
+    # ─── State ────────────────────────────────────────────────────────────────
+
+    def _read_state(self) -> None:
+        try:
+            mtime = os.stat(self._state_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._state_mtime:
+            return
+        with open(self._state_path, encoding="utf-8") as f:
+            self._state = json.load(f)
+        self._state_mtime = mtime
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._state_mtime is not None and now - self._checked_at < MODEL_REGISTRY_POLL_S:
+            return
+        with self._lock:
+            self._checked_at = now
+            self._read_state()
+
+    def state(self) -> Dict:
+        self._refresh()
+        return dict(self._state)
+
+    def _write_state(self, state: Dict) -> None:
+        _atomic_write_json(self._state_path, state)
+        self._state = state
+        self._state_mtime = os.stat(self._state_path).st_mtime_ns
+
+    def _load(self, version: str, verify: bool = False) -> LoadedModel:
+        """Cached LoadedModel for `version`; `verify` also unpickles the estimator when there is no compiled forest."""
+        loaded = self._loaded.get(version)
+        if loaded is None:
+            meta = self.metadata(version)
+            try:
+                loaded = LoadedModel(version, os.path.join(self.root, version), meta)
+                if verify and loaded.forest is None:
+                    loaded.model
+            except Exception as e:
+                # mmap/unpickling failures surface as OSError, ValueError, EOFError, KeyError, ...
+                raise ArtifactError(f"Model version {version} could not be loaded: {e}") from e
+            self._loaded = {**self._loaded, version: loaded}
+            # Keep only versions that are still referenced
+            keep = {self._state.get("production"), self._state.get("shadow"), version}
+            self._loaded = {v: m for v, m in self._loaded.items() if v in keep}
+        return loaded
+
+    def production(self) -> Optional[LoadedModel]:
+        self._refresh()
+        version = self._state.get("production")
+        if not version:
+            return None
+        loaded = self._loaded.get(version)
+        if loaded is None:
+            with self._lock:
+                loaded = self._load(version)
+        return loaded
+
+    def shadow(self) -> Optional[LoadedModel]:
+        self._refresh()
+        version = self._state.get("shadow")
+        if not version:
+            return None
+        loaded = self._loaded.get(version)
+        if loaded is None:
+            with self._lock:
+                loaded = self._load(version)
+        return loaded
+
+    def promote(self, version: str) -> Dict:
+        with self._lock:
+            self._read_state()
+            self._load(version, verify=True)  # fail before switching if the artifact is broken
+            state = dict(self._state)
+            if state.get("production") == version:
+                return state
+            history = list(state.get("history") or [])
+            if state.get("production"):
+                history.append(state["production"])
+            state.update(production=version, history=history[-20:])
+            if state.get("shadow") == version:
+                state["shadow"] = None
+            self._write_state(state)
+        logger.info("Promoted diabetes model %s", version)
+        return state
+
+    def rollback(self) -> Dict:
+        with self._lock:
+            self._read_state()
+            history = list(self._state.get("history") or [])
+            if not history:
+                raise RegistryError("No previous version to roll back to")
+            version = history.pop()
+            self._load(version, verify=True)
+            state = {**self._state, "production": version, "history": history}
+            self._write_state(state)
+        logger.info("Rolled diabetes model back to %s", version)
+        return state
+
+    def set_shadow(self, version: Optional[str]) -> Dict:
+        with self._lock:
+            self._read_state()
+            if version:
+                self._load(version, verify=True)
+            state = {**self._state, "shadow": version}
+            self._write_state(state)
+        return state
+
+    # ─── Shadow Scoring ───────────────────────────────────────────────────────
+
+    def compare_shadow(self, X: np.ndarray, production_proba: np.ndarray, production_version: str) -> None:
+        """Score X with the shadow model off the request path and log disagreement."""
+        candidate = self.shadow()
+        if candidate is None or candidate.version == production_version:
+            return
+        # Shadow scoring is best-effort: when the worker falls behind, drop new work rather than queue it
+        with self._shadow_lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                metrics.incr("model.shadow.skipped")
+                return
+            self._shadow_pending += 1
+        future = self._shadow_pool.submit(self._compare, candidate, np.array(X), np.array(production_proba),
+                                          production_version)
+        future.add_done_callback(self._shadow_done)
+
+    def _shadow_done(self, _future) -> None:
+        with self._shadow_lock:
+            self._shadow_pending -= 1
+
+    def _compare(self, candidate: LoadedModel, X: np.ndarray, prod: np.ndarray, prod_version: str) -> None:
+        try:
+            shadow = candidate.predict_proba(X)
+        except Exception:
+            logger.exception("Shadow model %s failed to score", candidate.version)
+            metrics.incr("model.shadow.errors")
+            return
+        diff = np.abs(shadow - prod)
+        buckets = np.digitize(prod, [0.33, 0.66]) != np.digitize(shadow, [0.33, 0.66])
+        disagree = (diff > SHADOW_TOLERANCE) | buckets
+        metrics.incr("model.shadow.rows", len(X))
+        metrics.incr("model.shadow.disagreements", int(disagree.sum()))
+        metrics.incr("model.shadow.risk_level_changes", int(buckets.sum()))
+        for d in diff:
+            metrics.observe("model.shadow.abs_diff", float(d))
+        # Feature values are patient health data: log a digest to correlate rows, never the values
+        for i in np.flatnonzero(disagree):
+            digest = hashlib.sha256(np.ascontiguousarray(X[i], dtype=float).tobytes()).hexdigest()[:12]
+            logger.warning("Shadow disagreement: %s=%.4f %s=%.4f delta=%+.4f row=%d features_sha=%s",
+                           prod_version, prod[i], candidate.version, shadow[i], shadow[i] - prod[i], i, digest)
@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from . import lab_parser, metrics
+
+# PDF text extraction runs in a bounded pool of worker processes so a large
+# report never blocks the event loop. Each job gets a hard time budget, a page
+# cap and (on POSIX) an address-space limit, and can be cancelled mid-document.
+#
+# In "incremental" mode each page is parsed as soon as its text is extracted.
+# The job stops early once every expected test has been found and a later page
+# adds nothing new (the report has moved on to notes and disclaimers), when the
+# soft PDF_TIME_BUDGET_S runs out, or (only if PDF_IDLE_PAGES is set) once that
+# many pages in a row add nothing new. The expected tests default to the core
+# panel in config/lab_ranges.json; reports without all of them are read to the
+# end. The idle cut-off is off by default: a cover or disclaimer page in the
+# middle of a report would end the read. "full" mode extracts every page up to
+# the cap and leaves parsing to the caller.
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "8"))  # queued + running jobs
+PDF_TIMEOUT_S = float(os.getenv("PDF_TIMEOUT_S", "30"))  # per job, once started
+PDF_QUEUE_TIMEOUT_S = float(os.getenv("PDF_QUEUE_TIMEOUT_S", "15"))  # max wait for a worker
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "20"))
+PDF_MEMORY_LIMIT_MB = int(os.getenv("PDF_MEMORY_LIMIT_MB", "1024"))  # 0 disables
+PDF_EXTRACT_MODE = os.getenv("PDF_EXTRACT_MODE", "incremental")  # incremental | full
+PDF_TIME_BUDGET_S = float(os.getenv("PDF_TIME_BUDGET_S", "10"))  # soft: stop and keep what was found
+PDF_IDLE_PAGES = int(os.getenv("PDF_IDLE_PAGES", "0"))  # 0 disables
+# Comma-separated canonical test names; empty means the configured core panel
+PDF_EXPECTED_TESTS = ([t.strip() for t in os.getenv("PDF_EXPECTED_TESTS", "").split(",") if t.strip()]
+                      or lab_parser.CORE_PANEL)
+
+_CANCEL_SLOTS = 64
+
+
+class PdfExtractionError(Exception):
+    """Base class for extraction failures surfaced to the API layer."""
+
+
+class ExtractionBusy(PdfExtractionError):
+    pass
+
+
+class ExtractionTimeout(PdfExtractionError):
+    pass
+
+
+class ExtractionCancelled(PdfExtractionError):
+    pass
+
+
+class ExtractionFailed(PdfExtractionError):
+    pass
+
+
+# ─── Worker Process ───────────────────────────────────────────────────────────
+
+# BaseException so pdfplumber's blanket `except Exception` re-wrapping
+# doesn't swallow them mid-parse.
+class _WorkerTimeout(BaseException):
+    pass
+
+
+class _WorkerCancelled(BaseException):
+    pass
+
+
+_worker_cancelled = None  # shared ring of cancelled job ids, set by _init_worker
+
+
+def _init_worker(cancelled, memory_limit_mb: int) -> None:
+    global _worker_cancelled
+    _worker_cancelled = cancelled
+    if memory_limit_mb > 0:
+        try:
+            import resource
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass  # not supported on this platform
+
+
+def _is_cancelled(job_id: int) -> bool:
+    if _worker_cancelled is None:
+        return False
+    return job_id in _worker_cancelled[:]
+
+
+def _on_alarm(signum, frame):
+    raise _WorkerTimeout()
+
+
+def _extract_worker(path: str, job_id: int, opts: Dict) -> Dict:
+    """Runs in a pool process. Returns page text, per-page timings and, in
+    incremental mode, the parsed lab values."""
+    import pdfplumber
+    from .lab_parser import parse_lab_text
+
+    incremental = opts["mode"] == "incremental"
+    expected = set(opts["expected"])
+    started = time.time()
+    t_start = time.perf_counter()
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, opts["timeout_s"])
+    try:
+        texts = []
+        page_seconds = []
+        results = []
+        found = set()
+        idle = 0
+        stop_reason = "end_of_document"
+        with pdfplumber.open(path) as pdf:
+            page_count = len(pdf.pages)
+            for i, page in enumerate(pdf.pages):
+                if i >= opts["max_pages"]:
+                    stop_reason = "page_budget"
+                    break
+                if i > 0 and time.perf_counter() - t_start > opts["time_budget_s"]:
+                    stop_reason = "time_budget"
+                    break
+                if _is_cancelled(job_id):
+                    raise _WorkerCancelled()
+                t0 = time.perf_counter()
+                page_text = page.extract_text()
+                page_seconds.append(time.perf_counter() - t0)
+                page.close()
+                if page_text:
+                    texts.append(page_text)
+                if not incremental:
+                    continue
+                new = [r for r in parse_lab_text(page_text or "", opts["strategy"]) if r["test_name"] not in found]
+                results.extend(new)
+                found.update(r["test_name"] for r in new)
+                if expected and expected <= found and not new:
+                    stop_reason = "all_expected_found"
+                    break
+                idle = 0 if new else idle + 1
+                if found and opts["idle_pages"] and idle >= opts["idle_pages"]:
+                    stop_reason = "idle_pages"
+                    break
+    except Exception as e:
+        # pdfplumber wraps allocation failures under the RLIMIT_AS cap
+        if e.args and isinstance(e.args[0], MemoryError):
+            raise MemoryError() from None
+        raise
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return {
+        "text": "\n".join(texts) + ("\n" if texts else ""),
+        "results": results if incremental else None,
+        "page_count": page_count,
+        "pages_read": len(page_seconds),
+        "truncated": page_count > len(page_seconds),
+        "stop_reason": stop_reason,
+        "page_seconds": page_seconds,
+        "started_at": started,
+    }
+
+
+# ─── Pool Management ──────────────────────────────────────────────────────────
+
+_pool: Optional[ProcessPoolExecutor] = None
+_cancelled = None
+_job_ids = itertools.count(1)
+_pending = 0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _cancelled
+    if _pool is None:
+        ctx = multiprocessing.get_context("spawn")
+        _cancelled = ctx.Array("q", _CANCEL_SLOTS, lock=False)
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(_cancelled, PDF_MEMORY_LIMIT_MB),
+        )
+    return _pool
+
+
+def _cancel_job(job_id: int) -> None:
+    if _cancelled is not None:
+        _cancelled[job_id % _CANCEL_SLOTS] = job_id
+
+
+def _reset_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown() -> None:
+    _reset_pool()
+
+
+def _set_pending(delta: int) -> None:
+    global _pending
+    _pending += delta
+    metrics.set_gauge("pdf.jobs_pending", _pending)
+    metrics.set_gauge("pdf.queue_depth", max(0, _pending - PDF_WORKERS))
+
+
+async def _wait_for_disconnect(request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(0.25)
+
+
+async def _reserve_slot(wait: bool) -> None:
+    if _pending < PDF_MAX_PENDING:
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + PDF_QUEUE_TIMEOUT_S
+    while wait and _pending >= PDF_MAX_PENDING and loop.time() < deadline:
+        await asyncio.sleep(0.05)
+    if _pending >= PDF_MAX_PENDING:
+        metrics.incr("pdf.rejected_busy")
+        raise ExtractionBusy("PDF extraction queue is full")
+
+
+async def extract_text(path: str, request=None, wait_for_slot: bool = False,
+                       strategy: Optional[str] = None) -> Dict:
+    """Extract text from the PDF at `path` in the worker pool.
+
+    In incremental mode the result's "results" holds lab values parsed with
+    `strategy` (lab_parser's default when None); in full mode it is None.
+    `request` is the Starlette request; when given, the job is cancelled as soon
+    as the client disconnects. With `wait_for_slot`, a full queue is waited on
+    (up to PDF_QUEUE_TIMEOUT_S) instead of rejected immediately.
+    """
+    await _reserve_slot(wait_for_slot)
+
+    job_id = next(_job_ids)
+    submitted = time.time()
+    _set_pending(1)
+    loop = asyncio.get_running_loop()
+    opts = {
+        "mode": PDF_EXTRACT_MODE, "strategy": strategy, "expected": PDF_EXPECTED_TESTS,
+        "max_pages": PDF_MAX_PAGES, "timeout_s": PDF_TIMEOUT_S,
+        "time_budget_s": PDF_TIME_BUDGET_S, "idle_pages": PDF_IDLE_PAGES,
+    }
+    job = loop.run_in_executor(_get_pool(), _extract_worker, path, job_id, opts)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+    try:
+        waiters = {job} if watcher is None else {job, watcher}
+        done, _ = await asyncio.wait(waiters, timeout=PDF_QUEUE_TIMEOUT_S + PDF_TIMEOUT_S,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if job not in done:
+            job.cancel()
+            _cancel_job(job_id)
+            if watcher is not None and watcher in done:
+                metrics.incr("pdf.cancelled")
+                raise ExtractionCancelled("Client disconnected")
+            metrics.incr("pdf.timeouts")
+            raise ExtractionTimeout("PDF extraction timed out")
+        try:
+            result = job.result()
+        except _WorkerTimeout:
+            metrics.incr("pdf.timeouts")
+            raise ExtractionTimeout("PDF extraction timed out")
+        except _WorkerCancelled:
+            metrics.incr("pdf.cancelled")
+            raise ExtractionCancelled("Client disconnected")
+        except MemoryError:
+            metrics.incr("pdf.memory_exceeded")
+            raise ExtractionFailed("PDF extraction exceeded the memory limit")
+        except BrokenProcessPool:
+            _reset_pool()
+            metrics.incr("pdf.failures")
+            raise ExtractionFailed("PDF worker crashed")
+        except Exception as e:
+            metrics.incr("pdf.failures")
+            raise ExtractionFailed(str(e)) from e
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        _set_pending(-1)
+
+    metrics.incr("pdf.jobs")
+    metrics.incr("pdf.pages", result["pages_read"])
+    metrics.incr("pdf.pages_skipped", result["page_count"] - result["pages_read"])
+    metrics.incr(f"pdf.stop_reason.{result['stop_reason']}")
+    metrics.observe("pdf.queue_wait_seconds", max(0.0, result["started_at"] - submitted))
+    metrics.observe("pdf.extract_seconds", sum(result["page_seconds"]))
+    metrics.observe(f"pdf.extract_seconds.{PDF_EXTRACT_MODE}", sum(result["page_seconds"]))
+    metrics.observe("pdf.job_latency_seconds", time.time() - submitted)
+    for s in result["page_seconds"]:
+        metrics.observe("pdf.page_extract_seconds", s)
+    return result
@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from . import cache, metrics
+
+# Rendered JSON bodies of read endpoints whose data changes rarely
+# (dashboard summary, latest diet plan, appointments, doctor directory).
+#
+# Entries are keyed by (scope, route), where scope is "patient:<id>" or
+# "doctors" and route is the path plus query string. Each entry is stamped
+# with the scope's change counter (db.get_resource_version), and a lookup only
+# hits when the stamp matches the current counter. The counter lives in the
+# shared database and is bumped inside the write's own transaction, so no
+# worker can serve a body older than the last committed write. The write
+# functions also drop the scope's entries right away (invalidate(), registered
+# with db.on_change), so the memory cap is spent on live data. An index of each
+# scope's cached routes, pruned as the LRU evicts, keeps that drop proportional
+# to the scope's own entries.
+#
+# RESPONSE_CACHE_BACKEND adds a tier shared between workers, behind the
+# in-process LRU:
+#   sqlite   a cache file on the local disk (RESPONSE_CACHE_URL = path)
+#   redis    any Redis-compatible server (RESPONSE_CACHE_URL = redis://...,
+#            needs the `redis` package)
+# Shared keys include the version, so superseded bodies are never read and
+# simply expire after RESPONSE_CACHE_TTL_S.
+#
+# Metrics: response_cache.hits / misses / evictions / expired / entries / bytes
+# (the LRU), plus response_cache.stale, .invalidations, .shared_hits,
+# .shared_misses and .shared_errors.
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+
+Variant = Tuple[int, Tuple[str, ...]]  # (scope version, extra inputs such as the hour)
+
+
+# ─── Shared Backends ──────────────────────────────────────────────────────────
+
+class SharedBackend:
+    name = "base"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        raise NotImplementedError
+
+
+BACKENDS: Dict[str, Callable[[str], SharedBackend]] = {}
+
+
+def register_backend(name: str):
+    def deco(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return deco
+
+
+@register_backend("sqlite")
+class SQLiteBackend(SharedBackend):
+    PURGE_EVERY = 500  # sets between sweeps of expired rows
+
+    def __init__(self, url: str):
+        self.path = url or os.path.join(os.path.dirname(__file__), "response_cache.db")
+        self._sets = 0
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS response_cache (
+                            key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)""")
+        conn.commit()
+        conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=1.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM response_cache WHERE key=? AND expires_at>=?",
+                           (key, time.time())).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?,?,?)",
+                     (key, value, time.time() + ttl_s))
+        self._sets += 1
+        if self._sets % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+        conn.close()
+
+
+@register_backend("redis")
+class RedisBackend(SharedBackend):
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis needs the `redis` package") from e
+        self._client = redis.Redis.from_url(url or "redis://localhost:6379/0", socket_timeout=0.5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        self._client.set(key, value, ex=max(1, int(ttl_s)))
+
+
+def make_backend(name: str = RESPONSE_CACHE_BACKEND, url: str = RESPONSE_CACHE_URL) -> Optional[SharedBackend]:
+    if not name:
+        return None
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND '{name}' (available: {', '.join(BACKENDS)})")
+    return BACKENDS[name](url)
+
+
+# ─── Cache ────────────────────────────────────────────────────────────────────
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl_s: float = RESPONSE_CACHE_TTL_S,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, shared: Optional[SharedBackend] = None,
+                 enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl_s = ttl_s
+        self.shared = shared
+        # (scope, route) → (variant, body)
+        self._local = cache.TTLCache("response_cache", max_entries, ttl_s, max_bytes=max_bytes,
+                                     size_fn=lambda k, v: len(v[1]) + 256, on_evict=self._forget)
+        self._routes: Dict[str, Set[str]] = {}  # scope → routes with a local entry
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(scope: str, route: str, variant: Variant) -> str:
+        version, extra = variant
+        return "|".join(["rc", scope, route, str(version), *extra])
+
+    def get(self, scope: str, route: str, variant: Variant) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        entry = self._local.get((scope, route))
+        if entry is not None:
+            if entry[0] == variant:
+                return entry[1]
+            metrics.incr("response_cache.stale")
+        if self.shared is None:
+            return None
+        try:
+            body = self.shared.get(self._shared_key(scope, route, variant))
+        except Exception:
+            metrics.incr("response_cache.shared_errors")
+            return None
+        metrics.incr("response_cache.shared_hits" if body is not None else "response_cache.shared_misses")
+        if body is not None:
+            self._remember(scope, route, variant, body)
+        return body
+
+    def put(self, scope: str, route: str, variant: Variant, body: bytes) -> None:
+        if not self.enabled:
+            return
+        self._remember(scope, route, variant, body)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(scope, route, variant), body, self.ttl_s)
+            except Exception:
+                metrics.incr("response_cache.shared_errors")
+
+    def _remember(self, scope: str, route: str, variant: Variant, body: bytes) -> None:
+        with self._lock:
+            self._routes.setdefault(scope, set()).add(route)
+        self._local.put((scope, route), (variant, body))
+
+    def _forget(self, key: Tuple[str, str]) -> None:
+        # Called by the LRU (under its lock) when an entry is evicted, expires or is deleted
+        scope, route = key
+        with self._lock:
+            routes = self._routes.get(scope)
+            if routes is not None:
+                routes.discard(route)
+                if not routes:
+                    del self._routes[scope]
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        """Drop the local entries of `scopes` (other workers' copies fail their version check)."""
+        for scope in scopes:
+            with self._lock:
+                routes = list(self._routes.get(scope, ()))
+            for route in routes:
+                self._local.delete((scope, route))
+            metrics.incr("response_cache.invalidations")
+
+    def clear(self) -> None:
+        self._local.clear()
+        with self._lock:
+            self._routes.clear()
+
+    def __len__(self) -> int:
+        return len(self._local)
@@ -0,0 +1,201 @@
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+
+# Fast path for large read endpoints, plus response compression.
+#
+# json_response() renders rows straight to bytes, skipping FastAPI's
+# jsonable_encoder walk and response-model validation (the data is already
+# plain dicts from sqlite). orjson is used when installed, compact stdlib json
+# otherwise; FAST_JSON=0 hands the data back to FastAPI's default path.
+#
+# CompressionMiddleware compresses complete responses of a compressible type
+# once they reach COMPRESS_MIN_BYTES, choosing brotli (if the `brotli`
+# package is installed) or gzip from the request's Accept-Encoding.
+# Streaming responses (server-sent events) pass through untouched. A strong
+# ETag on a compressed response gets a -gzip/-br suffix, since the bytes differ
+# from the identity representation; etag_matches() accepts either form. A 304
+# carries no body to measure, so it repeats the suffixed tag when that is the
+# one the client revalidated with (i.e. its cached copy was compressed).
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+# Bodies at least this large are compressed off the event loop
+COMPRESS_THREAD_BYTES = int(os.getenv("COMPRESS_THREAD_BYTES", str(64 * 1024)))
+
+_COMPRESSIBLE = (b"application/json", b"text/")
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+    """Pre-rendered JSON for plain dict/list data; FastAPI's default rendering when FAST_JSON is off."""
+    if not FAST_JSON:
+        if headers is None and status_code == 200:
+            return data
+        return JSONResponse(jsonable_encoder(data), status_code=status_code, headers=headers)
+    return FastJSONResponse(data, status_code=status_code, headers=headers)
+
+
+# ─── Conditional Requests ─────────────────────────────────────────────────────
+
+_ENCODING_SUFFIXES = ('-gzip"', '-br"')
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison; tags suffixed by the compressor match their base tag."""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)] + '"'
+        if tag == etag:
+            return True
+    return False
+
+
+def _encoded_etag(value: bytes, encoding: str) -> bytes:
+    if value.startswith(b'"') and value.endswith(b'"'):  # weak tags (W/"...") stay as they are
+        return value[:-1] + f'-{encoding}"'.encode()
+    return value
+
+
+# ─── Compression ──────────────────────────────────────────────────────────────
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """'gzip;q=0.8, br' → {'gzip': 0.8, 'br': 1.0}"""
+    out = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            out[name.strip().lower()] = q
+    return out
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _not_modified_start(message: dict, encoding: str, if_none_match: bytes) -> dict:
+    """Give a 304 the ETag the compressed 200 carried, if that is what the client sent."""
+    sent = {tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")}
+    response_headers = []
+    for k, v in message.get("headers", []):
+        if k.lower() == b"etag" and _encoded_etag(v, encoding) in sent:
+            v = _encoded_etag(v, encoding)
+        response_headers.append((k, v))
+    return {**message, "headers": response_headers + [(b"vary", b"Accept-Encoding")]}
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_bytes: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    passthrough = True  # don't hold back the headers of a live stream
+                    return await send(message)
+                if message["status"] == 304:
+                    passthrough = True
+                    return await send(_not_modified_start(message, encoding, headers.get(b"if-none-match", b"")))
+                start = message  # held until the body shows whether to compress
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            response_headers = list(start.get("headers", []))
+            names = {k.lower(): v for k, v in response_headers}
+            content_type = names.get(b"content-type", b"")
+            compressible = content_type.startswith(_COMPRESSIBLE) and b"content-encoding" not in names
+            if message.get("more_body") or not compressible or len(body) < self.min_bytes:
+                passthrough = True
+                if compressible:
+                    start["headers"] = response_headers + [(b"vary", b"Accept-Encoding")]
+                await send(start)
+                return await send(message)
+
+            if len(body) >= COMPRESS_THREAD_BYTES:
+                compressed = await run_in_threadpool(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            metrics.incr(f"compression.{encoding}_responses")
+            metrics.incr("compression.bytes_in", len(body))
+            metrics.incr("compression.bytes_out", len(compressed))
+            response_headers = [(k, _encoded_etag(v, encoding) if k.lower() == b"etag" else v)
+                                for k, v in response_headers if k.lower() != b"content-length"]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, compressing_send)
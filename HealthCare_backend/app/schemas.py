@@ -72,6 +72,27 @@ class LabReportOut(BaseModel):
     created_at: str
     results: List[LabResultOut]
     deficiency_summary: Optional[List[str]] = []
+    duplicate: bool = False  # True when an identical file was already uploaded
+    truncated: bool = False  # PDF extraction stopped before the end of the document
+    notice: Optional[str] = None
+
+
+class LabBatchFileStatus(BaseModel):
+    filename: str
+    status: str  # created | duplicate | failed | skipped
+    report_id: Optional[str] = None
+    report_date: Optional[str] = None
+    tests_found: Optional[int] = None
+    truncated: bool = False
+    detail: Optional[str] = None
+
+
+class LabBatchUploadOut(BaseModel):
+    created: int
+    duplicate: int
+    failed: int
+    skipped: int
+    files: List[LabBatchFileStatus]
 
 
 # ─── Lifestyle ────────────────────────────────────────────────────────────────
@@ -181,6 +202,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     include_context: bool = True
+    conversation_id: Optional[str] = None  # enables the cached rolling summary of older turns
 
 
 class ChatResponse(BaseModel):
@@ -202,6 +224,26 @@ class DoctorPatientSummary(BaseModel):
     last_bp_flag: Optional[str]
 
 
+class PatientSearchHit(BaseModel):
+    id: str
+    name: str
+    email: str
+    created_at: str
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    height_cm: Optional[float] = None
+    weight_kg: Optional[float] = None
+    score: float  # bm25; lower is a better match
+
+
+class PatientSearchOut(BaseModel):
+    q: str
+    total: int
+    offset: int
+    limit: int
+    items: List[PatientSearchHit]
+
+
 # ─── Diabetes Prediction ──────────────────────────────────────────────────────
 
 class DiabetesPredictRequest(BaseModel):
@@ -221,9 +263,42 @@ class FeatureImportance(BaseModel):
     importance: float
 
 
+class FeatureContribution(BaseModel):
+    feature: str
+    value: float  # model input value for this prediction
+    contribution: float  # change in probability attributed to this feature
+
+
 class DiabetesPredictResponse(BaseModel):
     probability: float
     risk_level: str  # Low | Medium | High
     accuracy: float
     feature_importances: List[FeatureImportance]
+    base_probability: Optional[float] = None  # average model output before any feature is considered
+    contributions: List[FeatureContribution] = []  # largest effect first
+
+
+
+class DiabetesRiskEntry(BaseModel):
+    patient_id: str
+    name: str
+    age: Optional[int]
+    probability: float
+    risk_level: str  # Low | Medium | High
+    bmi: float
+    glucose: Optional[float]  # latest fasting glucose lab; None → estimated
+    diastolic: Optional[float]  # latest BP log; None → dataset median
+    missing_inputs: List[str] = []  # profile fields not on file; scored with defaults, ranked last
+
+
+class DiabetesRiskPanelOut(BaseModel):
+    model_version: str
+    total: int
+    incomplete: int  # patients whose profile lacks age, gender, height or weight
+    offset: int
+    limit: int
+    items: List[DiabetesRiskEntry]
+
 
+class ModelVersionRequest(BaseModel):
+    version: Optional[str] = None  # None clears the shadow model
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import zlib
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from . import metrics
+
+# Upload bodies are never held in memory as a whole: the ASGI middleware caps
+# the request body while it streams in, and handlers copy the parsed file part
+# to an on-disk temp file in fixed-size chunks, re-checking the cap as they go.
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(64 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+UPLOAD_BATCH_MAX_BYTES = int(os.getenv("UPLOAD_BATCH_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "50"))
+
+# Room for multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 16 * 1024
+
+
+def _size_label(limit: int) -> str:
+    if limit >= 1024 * 1024:
+        return f"{limit / (1024 * 1024):g} MB"
+    return f"{limit // 1024} KB"
+
+
+def _too_large_detail(limit: int) -> str:
+    return f"Upload exceeds the {_size_label(limit)} limit."
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=_too_large_detail(limit))
+
+
+class UploadLimitMiddleware:
+    """Rejects request bodies over a per-path byte limit while they stream in.
+
+    `limits` maps a path prefix to its maximum body size. Oversized requests
+    that declare Content-Length are refused before any body is read; chunked
+    bodies are cut off as soon as the running total passes the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        # Longest prefix first so "/x/upload/batch" wins over "/x/upload"
+        self.limits = sorted(limits.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def _limit_for(self, path: str):
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit + _MULTIPART_OVERHEAD
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            metrics.incr("uploads.rejected_too_large")
+            body = json.dumps({"detail": _too_large_detail(limit - _MULTIPART_OVERHEAD)}).encode()
+            await send({"type": "http.response.start", "status": 413,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.incr("uploads.rejected_too_large")
+                    raise _too_large(limit - _MULTIPART_OVERHEAD)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def spool_to_disk(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES, suffix: str = ".pdf") -> Tuple[str, str]:
+    """Copy an uploaded file to a temp file in chunks.
+
+    Returns (path, sha256 hex digest of the content). The caller owns the file
+    and must remove it with `discard()`.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TMP_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    metrics.incr("uploads.rejected_too_large")
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        discard(path)
+        raise
+    metrics.observe("uploads.bytes", size)
+    return path, digest.hexdigest()
+
+
+def _spool_member(src, max_bytes: int) -> Tuple[str, str, int]:
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=UPLOAD_TMP_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        discard(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def unpack_zip(zip_path: str, max_member_bytes: int = UPLOAD_MAX_BYTES,
+               max_total_bytes: int = UPLOAD_BATCH_MAX_BYTES,
+               max_files: int = UPLOAD_BATCH_MAX_FILES) -> List[Dict]:
+    """Spool every PDF in a ZIP archive to its own temp file.
+
+    Returns one entry per archive member: {"filename", "path", "sha256"} for
+    extracted PDFs, or {"filename", "status", "detail"} for members that were
+    skipped or refused. Sizes are enforced on the decompressed stream rather
+    than the (untrusted) headers. Blocking; run it in a thread.
+    """
+    entries = []
+    extracted = 0
+    total = 0
+    batch_full = f"Batch size limit reached ({_size_label(max_total_bytes)} of PDFs per batch)."
+    try:
+        zf = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        return [{"filename": "", "status": "failed", "detail": "Not a valid ZIP archive."}]
+    try:
+        with zf:
+            for info in zf.infolist():
+                name = info.filename
+                if info.is_dir() or os.path.basename(name).startswith("."):
+                    continue
+                if not name.lower().endswith(".pdf"):
+                    entries.append({"filename": name, "status": "skipped", "detail": "Not a PDF file."})
+                    continue
+                if extracted >= max_files:
+                    entries.append({"filename": name, "status": "skipped", "detail": f"Batch is limited to {max_files} files."})
+                    continue
+                remaining = max_total_bytes - total
+                if remaining <= 0:
+                    entries.append({"filename": name, "status": "skipped", "detail": batch_full})
+                    continue
+                try:
+                    with zf.open(info) as src:
+                        path, sha256, size = _spool_member(src, min(max_member_bytes, remaining))
+                except HTTPException as e:
+                    if remaining < max_member_bytes:
+                        # Cut off by what is left of the batch budget, not the per-file limit
+                        entries.append({"filename": name, "status": "skipped", "detail": batch_full})
+                    else:
+                        entries.append({"filename": name, "status": "failed", "detail": e.detail})
+                    continue
+                except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError, OSError):
+                    # Corrupt or truncated member data; _spool_member already removed its temp file
+                    entries.append({"filename": name, "status": "failed", "detail": "Could not read this file from the archive."})
+                    continue
+                extracted += 1
+                total += size
+                entries.append({"filename": name, "path": path, "sha256": sha256})
+    except BaseException:
+        # The caller never sees the entries, so it can't clean up what was already spooled
+        for entry in entries:
+            if "path" in entry:
+                discard(entry["path"])
+        raise
+    return entries
+
+
+def discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,101 @@
+"""
+Load-test the streaming chat endpoint (/chat/stream) against a running API.
+
+Registers (or logs in) a load-test patient, then keeps --concurrency streams
+open until --requests have completed, measuring on the client side:
+time to first fragment, total stream time and fragments received. Run the
+server with the local stand-in backend to test the path offline:
+
+    LLM_BACKEND=mock uvicorn app.main:app --port 8000
+    python bench_chat_stream.py --concurrency 50 --requests 500
+
+Use --endpoint /chat to compare against the non-streaming route.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.metrics import _percentile
+
+
+async def token(client: httpx.AsyncClient) -> str:
+    creds = {"email": "loadtest@example.com", "password": "loadtest-pw"}
+    r = await client.post("/auth/register", json={**creds, "name": "Load Test", "role": "patient"})
+    if r.status_code != 201:
+        r = await client.post("/auth/login", json=creds)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+async def one(client: httpx.AsyncClient, endpoint: str, headers: dict, i: int) -> dict:
+    body = {"messages": [{"role": "user", "content": f"What does a high LDL cholesterol level mean? ({i})"}],
+            "include_context": False}
+    start = time.perf_counter()
+    first, fragments, ok = None, 0, False
+    if endpoint == "/chat":
+        r = await client.post(endpoint, json=body, headers=headers)
+        first = time.perf_counter()
+        ok = r.status_code == 200
+        fragments = 1
+    else:
+        async with client.stream("POST", endpoint, json=body, headers=headers) as r:
+            event = None
+            async for line in r.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if event is None:
+                        fragments += 1
+                        if first is None:
+                            first = time.perf_counter()
+                    else:
+                        ok = event == "done"
+                        payload = json.loads(line[5:])
+                        if not ok:
+                            print("  error:", payload)
+                    event = None
+    end = time.perf_counter()
+    return {"ok": ok, "ttft": (first or end) - start, "total": end - start, "fragments": fragments}
+
+
+async def run(args) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        headers = {"Authorization": f"Bearer {await token(client)}"}
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i):
+            async with sem:
+                return await one(client, args.endpoint, headers, i)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(args.requests)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+    done = [r for r in results if isinstance(r, dict) and r["ok"]]
+    failed = len(results) - len(done)
+    ttft = sorted(r["ttft"] for r in done)
+    total = sorted(r["total"] for r in done)
+    print(f"{args.endpoint}: {len(done)} ok, {failed} failed in {elapsed:.1f}s "
+          f"({len(done) / elapsed:.1f} req/s at concurrency {args.concurrency})")
+    print(f"{'':18s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for label, values in (("first fragment", ttft), ("full response", total)):
+        print(f"{label:18s} " + " ".join(f"{_percentile(values, p) * 1000:8.0f}" for p in (50, 95, 99)))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--endpoint", default="/chat/stream", choices=["/chat/stream", "/chat"])
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--timeout", type=float, default=120)
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare sklearn's RandomForestClassifier.predict_proba with the array-based
+evaluator in app/forest.py for the diabetes model.
+
+Checks that probabilities are bit-identical on every dataset row (plus random
+perturbations), then reports single-row and batch latency (p50/p99) and the
+memory held by each representation.
+
+Run:  python bench_diabetes_forest.py [--model models/diabetes_model.joblib] [--iters 2000]
+"""
+
+import argparse
+import io
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+
+from app.forest import CompiledForest
+from app.metrics import _percentile
+
+BASE_DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(BASE_DIR, "data", "diabetes.csv")
+MODEL_PATH = os.path.join(BASE_DIR, "models", "diabetes_model.joblib")
+
+
+def latencies(fn, rows: np.ndarray, iters: int) -> list:
+    out = []
+    for i in range(iters):
+        x = rows[i % len(rows)]
+        start = time.perf_counter()
+        fn(x)
+        out.append(time.perf_counter() - start)
+    out.sort()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--iters", type=int, default=2000)
+    ap.add_argument("--batch", type=int, default=32)
+    args = ap.parse_args()
+
+    model = joblib.load(args.model)["model"]
+    start = time.perf_counter()
+    forest = CompiledForest.from_sklearn(model)
+    print(f"Compiled {len(model.estimators_)} trees (max depth {forest.max_depth}) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # ── Equivalence ──────────────────────────────────────────────────────────
+    X = np.genfromtxt(DATA_PATH, delimiter=",", skip_header=1)[:, :8]
+    rng = np.random.default_rng(0)
+    X_all = np.vstack([X, X * rng.uniform(0.8, 1.2, size=X.shape)])
+    expected = model.predict_proba(X_all)
+    got = forest.predict_proba(X_all)
+    identical = np.array_equal(expected, got)
+    print(f"Bit-identical on {len(X_all)} rows: {identical}"
+          + ("" if identical else f" (max abs diff {np.abs(expected - got).max():.3g})"))
+
+    # ── Latency ──────────────────────────────────────────────────────────────
+    single = X_all[:, np.newaxis, :]
+    batches = [X_all[i:i + args.batch] for i in range(0, len(X_all) - args.batch, args.batch)]
+    print(f"\n{'':24s} {'p50 µs':>10s} {'p99 µs':>10s}")
+    for label, fn, rows, iters in (
+        ("sklearn  single row", model.predict_proba, single, args.iters),
+        ("compiled single row", forest.predict_proba, single, args.iters),
+        (f"sklearn  batch of {args.batch}", model.predict_proba, batches, args.iters // 10),
+        (f"compiled batch of {args.batch}", forest.predict_proba, batches, args.iters // 10),
+    ):
+        lat = latencies(fn, rows, iters)
+        print(f"{label:24s} {_percentile(lat, 50) * 1e6:10.1f} {_percentile(lat, 99) * 1e6:10.1f}")
+
+    # ── Memory ───────────────────────────────────────────────────────────────
+    buf = io.BytesIO()
+    pickle.dump(model, buf, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"\nsklearn model pickled: {len(buf.getvalue()) / 1024:8.0f} KB")
+    print(f"compiled node arrays:  {forest.nbytes / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the lab-text parsing strategies in app/lab_parser.py against the
+labelled corpus in data/lab_text_corpus.json.
+
+For each strategy reports throughput (lines/sec) and extraction accuracy:
+  precision / recall of (test, value) pairs, and the share of reference range
+  bounds printed on the report that were recovered. Report-date extraction
+  (shared by all strategies) is checked against each document's report_date.
+
+Run:  python bench_lab_parsers.py [--seconds 2] [--strategy combined]
+"""
+
+import argparse
+import json
+import os
+import time
+
+from app.ai import extract_report_date
+from app.lab_parser import PARSERS
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "lab_text_corpus.json")
+
+
+def _close(a, b) -> bool:
+    return a is not None and b is not None and abs(a - b) < 1e-6
+
+
+def score(parse, documents: list) -> dict:
+    tp = fp = fn = 0
+    range_hits = range_total = 0
+    misses = []
+    for doc in documents:
+        expected = doc["expected"]
+        got = {r["test_name"]: r for r in parse(doc["text"])}
+        for test, exp in expected.items():
+            r = got.get(test)
+            if r is None or not _close(r["value"], exp["value"]):
+                fn += 1
+                misses.append(f"{doc['name']}: {test} expected {exp['value']}, got {r['value'] if r else None}")
+                continue
+            tp += 1
+            for bound, key in (("low", "ref_range_low"), ("high", "ref_range_high")):
+                if bound in exp:
+                    range_total += 1
+                    range_hits += _close(r[key], exp[bound])
+        for test, r in got.items():
+            if test not in expected or not _close(r["value"], expected[test]["value"]):
+                fp += 1
+                if test not in expected:
+                    misses.append(f"{doc['name']}: spurious {test} = {r['value']}")
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "range_recall": range_hits / range_total if range_total else 0.0,
+        "misses": misses,
+    }
+
+
+def score_dates(documents: list) -> tuple:
+    """(correct, labelled, misses) for extract_report_date; documents without a date expect None."""
+    correct = 0
+    misses = []
+    for doc in documents:
+        got = extract_report_date(doc["text"])
+        if got == doc.get("report_date"):
+            correct += 1
+        else:
+            misses.append(f"{doc['name']}: report date expected {doc.get('report_date')}, got {got}")
+    return correct, len(documents), misses
+
+
+def throughput(parse, documents: list, seconds: float) -> float:
+    texts = [d["text"] for d in documents]
+    lines_per_pass = sum(len(t.splitlines()) for t in texts)
+    passes = 0
+    start = time.perf_counter()
+    while True:
+        for t in texts:
+            parse(t)
+        passes += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return passes * lines_per_pass / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", default=CORPUS_PATH)
+    ap.add_argument("--seconds", type=float, default=2.0, help="timing budget per strategy")
+    ap.add_argument("--strategy", action="append", help="strategy to run (repeatable; default all)")
+    ap.add_argument("--show-misses", action="store_true")
+    args = ap.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        documents = json.load(f)["documents"]
+    n_lines = sum(len(d["text"].splitlines()) for d in documents)
+    n_tests = sum(len(d["expected"]) for d in documents)
+    print(f"Corpus: {len(documents)} documents, {n_lines} lines, {n_tests} labelled values\n")
+
+    print(f"{'strategy':10s} {'lines/sec':>12s} {'precision':>10s} {'recall':>8s} {'f1':>6s} {'ranges':>8s}")
+    for name in args.strategy or list(PARSERS):
+        parse = PARSERS[name]
+        acc = score(parse, documents)
+        lps = throughput(parse, documents, args.seconds)
+        print(f"{name:10s} {lps:12,.0f} {acc['precision']:10.2%} {acc['recall']:8.2%} "
+              f"{acc['f1']:6.2f} {acc['range_recall']:8.2%}")
+        if args.show_misses:
+            for m in acc["misses"]:
+                print(f"    - {m}")
+
+    correct, total, misses = score_dates(documents)
+    print(f"\nreport dates: {correct}/{total} correct")
+    for m in misses:
+        print(f"    - {m}")
+
+
+if __name__ == "__main__":
+    main()
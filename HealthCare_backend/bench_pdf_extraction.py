@@ -0,0 +1,61 @@
+"""
+Compare PDF extraction latency between the "full" and "incremental"
+(early-exit) modes of app/pdf_extract.py on your own lab report PDFs.
+
+Each file is extracted --repeat times per mode, in-process (no worker pool,
+so queueing is excluded). Both modes end with parsed lab values: "full"
+parses the joined text after the read, as the upload path does, so the
+timings differ only by the pages early exit skips. Prints p50/p90/p99
+latency, pages read, tests found and the reason extraction stopped.
+
+Run:  python bench_pdf_extraction.py report1.pdf report2.pdf [--repeat 5]
+"""
+
+import argparse
+import time
+
+from app import pdf_extract
+from app.lab_parser import parse_lab_text
+from app.metrics import _percentile
+
+
+def run(paths: list, mode: str, repeat: int) -> dict:
+    opts = {
+        "mode": mode, "strategy": None, "expected": pdf_extract.PDF_EXPECTED_TESTS,
+        "max_pages": pdf_extract.PDF_MAX_PAGES, "timeout_s": pdf_extract.PDF_TIMEOUT_S,
+        "time_budget_s": pdf_extract.PDF_TIME_BUDGET_S, "idle_pages": pdf_extract.PDF_IDLE_PAGES,
+    }
+    latencies, pages, tests, reasons = [], 0, 0, {}
+    for _ in range(repeat):
+        for path in paths:
+            start = time.perf_counter()
+            result = pdf_extract._extract_worker(path, 0, opts)
+            parsed = result["results"] if result["results"] is not None else parse_lab_text(result["text"])
+            latencies.append(time.perf_counter() - start)
+            pages += result["pages_read"]
+            tests += len(parsed)
+            reasons[result["stop_reason"]] = reasons.get(result["stop_reason"], 0) + 1
+    latencies.sort()
+    return {
+        "p50": _percentile(latencies, 50), "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99), "pages_per_doc": pages / len(latencies),
+        "tests_per_doc": tests / len(latencies),
+        "stop_reasons": reasons,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdfs", nargs="+")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'mode':12s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'pages/doc':>10s} {'tests/doc':>10s}  stop reasons")
+    for mode in ("full", "incremental"):
+        r = run(args.pdfs, mode, args.repeat)
+        print(f"{mode:12s} {r['p50'] * 1000:9.1f} {r['p90'] * 1000:9.1f} {r['p99'] * 1000:9.1f} "
+              f"{r['pages_per_doc']:10.1f} {r['tests_per_doc']:10.1f}  {r['stop_reasons']}")
+
+
+if __name__ == "__main__":
+    main()
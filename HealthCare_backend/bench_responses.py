@@ -0,0 +1,156 @@
+"""
+Benchmark JSON rendering and compression for large patient-history payloads.
+
+Builds a long-term patient in a throwaway database (years of lab reports and
+BP logs, symptom checks, PHQ-9/GAD-7), loads the doctor summary, lab list and
+BP history the way the API does, then compares per payload:
+
+  encoders     FastAPI default (jsonable_encoder + json.dumps), the lab
+               routes' Pydantic models (LabReportOut per report), compact
+               stdlib json, and orjson (if installed) — ms per response
+  compression  identity / gzip / brotli (if installed) — bytes on the wire
+               and ms to compress
+
+Run:  python bench_responses.py [--years 5] [--seconds 1]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app import db
+from app.schemas import LabReportOut
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TESTS = {  # test: (unit, low, high)
+    "Hemoglobin": ("g/dL", 12.0, 17.5), "WBC": ("10^3/uL", 4.0, 11.0), "Platelets": ("10^3/uL", 150, 450),
+    "Glucose (Fasting)": ("mg/dL", 70, 99), "HbA1c": ("%", 4.0, 5.6), "Total Cholesterol": ("mg/dL", 125, 200),
+    "LDL": ("mg/dL", 0, 100), "HDL": ("mg/dL", 40, 80), "Triglycerides": ("mg/dL", 0, 150),
+    "Creatinine": ("mg/dL", 0.6, 1.3), "Vitamin D": ("ng/mL", 30, 100), "Vitamin B12": ("pg/mL", 200, 900),
+    "Ferritin": ("ng/mL", 30, 400), "TSH": ("mIU/L", 0.4, 4.0), "ALT": ("U/L", 7, 56),
+}
+
+
+def _id() -> str:
+    return str(uuid.uuid4())
+
+
+def build_patient(years: int) -> str:
+    random.seed(7)
+    now = datetime(2026, 6, 1)
+    pid = _id()
+    db.create_user({"id": pid, "name": "Long Term Patient", "email": f"{pid}@bench.local",
+                    "password_hash": "x", "role": "patient", "created_at": now.isoformat()})
+    db.upsert_patient_profile({"user_id": pid, "age": 58, "gender": "female", "height_cm": 162,
+                               "weight_kg": 74, "updated_at": now.isoformat()})
+    reports = []
+    for m in range(years * 12):  # monthly panel
+        day = now - timedelta(days=30 * m)
+        rid = _id()
+        results = []
+        for test, (unit, low, high) in TESTS.items():
+            value = round(random.uniform(low * 0.7, high * 1.2 if high else 10), 2)
+            status = "low" if value < low else "high" if value > high else "normal"
+            results.append({"id": _id(), "report_id": rid, "test_name": test, "value": value, "unit": unit,
+                            "status": status, "ref_range_low": low, "ref_range_high": high})
+        reports.append({"id": rid, "patient_id": pid, "report_date": day.date().isoformat(),
+                        "created_at": day.isoformat(), "results": results})
+    db.create_lab_reports_batch(reports)
+    for d in range(years * 365):  # daily BP
+        ts = (now - timedelta(days=d)).isoformat()
+        sys_, dia = random.randint(110, 165), random.randint(70, 100)
+        db.create_chronic_log({"id": _id(), "patient_id": pid, "value": {"systolic": sys_, "diastolic": dia},
+                               "flagged": sys_ >= 130, "flag_label": "High Stage 1" if sys_ >= 130 else "Normal",
+                               "created_at": ts})
+    for w in range(years * 26):  # fortnightly symptom checks and mood screens
+        ts = (now - timedelta(days=14 * w)).isoformat()
+        db.create_symptom_check({"id": _id(), "patient_id": pid, "symptoms": ["fatigue", "headache"],
+                                 "score": 4, "triage_level": "Low", "created_at": ts})
+        db.create_mental_assessment({"id": _id(), "patient_id": pid, "type": "phq9", "score": 6,
+                                     "severity": "Mild", "answers": [1, 1, 0, 1, 1, 0, 1, 1, 0], "created_at": ts})
+    return pid
+
+
+def per_call_ms(fn, seconds: float) -> float:
+    fn()
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        n += 1
+    return (time.perf_counter() - start) / n * 1000
+
+
+def default_path(data) -> bytes:
+    # What FastAPI does for a plain return value without a response_model
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def pydantic_labs(reports) -> bytes:
+    # The lab routes' model path: one LabReportOut (with nested LabResultOut) per report
+    models = [LabReportOut(**r) for r in reports]
+    return default_path(jsonable_encoder(models))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--seconds", type=float, default=1.0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        pid = build_patient(args.years)
+        payloads = {
+            "doctor summary": db.get_patient_snapshot(pid),
+            "lab list": db.get_lab_reports(pid),
+            "BP history": db.get_chronic_history(pid),
+        }
+
+    encoders = {
+        "fastapi default": default_path,
+        "stdlib compact": lambda d: json.dumps(d, ensure_ascii=False, separators=(",", ":")).encode(),
+    }
+    if orjson is not None:
+        encoders["orjson"] = orjson.dumps
+    compressors = {"gzip-1": lambda b: gzip.compress(b, 1, mtime=0), "gzip-6": lambda b: gzip.compress(b, 6, mtime=0)}
+    if brotli is not None:
+        compressors["br-4"] = lambda b: brotli.compress(b, quality=4)
+
+    print(f"patient history: {args.years} years  (orjson {'yes' if orjson else 'not installed'}, "
+          f"brotli {'yes' if brotli else 'not installed'})\n")
+    for name, data in payloads.items():
+        body = default_path(data)
+        print(f"{name}: {len(body) / 1024:.0f} KB JSON")
+        for label, encode in encoders.items():
+            print(f"  {label:18s} {per_call_ms(lambda: encode(data), args.seconds):8.2f} ms")
+        if name == "lab list":
+            print(f"  {'pydantic models':18s} {per_call_ms(lambda: pydantic_labs(data), args.seconds):8.2f} ms")
+        print(f"  {'identity':18s} {len(body):>10,d} bytes")
+        for label, squeeze in compressors.items():
+            size = len(squeeze(body))
+            print(f"  {label:18s} {size:>10,d} bytes ({size / len(body):5.1%})"
+                  f"  {per_call_ms(lambda: squeeze(body), args.seconds):7.2f} ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
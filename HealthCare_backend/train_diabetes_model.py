@@ -1,26 +1,54 @@
 """
 Train a Random Forest classifier on the Pima Indians Diabetes Dataset.
-Saves the trained model to models/diabetes_model.joblib.
 
-Run once:  python train_diabetes_model.py
+Hyperparameters are chosen by successive halving (default) or randomized
+search over cross-validation folds that are cached on disk. Every evaluated
+config is appended to a checkpoint file, so an interrupted run picks up where
+it stopped with --resume (given --run NAME, or else the most recent run).
+Each run writes to models/training/<run>/:
+
+  checkpoint.jsonl   one line per evaluated (config, resource)
+  model.joblib       {"model", "features", "accuracy"} — same shape the API loads
+  report.json        wall time, CV score per config, test accuracy and the
+                     inference latency / size of the chosen model
+
+With --compress, the tuned forest also goes through a compression stage:
+truncated forests (fewer trees), depth-capped refits and gradient-boosted
+students distilled from the forest's probabilities. Candidates are judged
+on a --val-size share held out of the training data: accuracy, artifact size,
+load time and single-row latency are reported, and the smallest one within
+--tolerance of the full model's accuracy (that also agrees with it on
+--min-agreement of validation rows) is rebuilt on the whole training set and
+saved as model.joblib, with the full model kept as model_full.joblib. The
+test split only supplies the chosen model's reported accuracy.
+
+Nothing is promoted: --register adds the artifact to the model registry as a
+new version, and /admin/models/promote (or shadow) takes it from there.
+
+Run:  python train_diabetes_model.py [--search halving|random] [--run NAME] [--resume]
+                                    [--compress [--tolerance 0.01]] [--register]
 """
 
+import argparse
+import copy
+import hashlib
+import json
+import math
 import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import joblib
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
-
-# ── Load Data ─────────────────────────────────────────────────────────────────
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
 
-DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "diabetes.csv")
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
-MODEL_PATH = os.path.join(MODEL_DIR, "diabetes_model.joblib")
-
-print("Loading dataset…")
-df = pd.read_csv(DATA_PATH)
+BASE_DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(BASE_DIR, "data", "diabetes.csv")
+MODEL_DIR = os.path.join(BASE_DIR, "models")
+TRAINING_DIR = os.path.join(MODEL_DIR, "training")
 
 FEATURES = [
     "Pregnancies", "Glucose", "BloodPressure", "SkinThickness",
@@ -28,77 +56,376 @@ FEATURES = [
 ]
 TARGET = "Outcome"
 
-X = df[FEATURES].values
-y = df[TARGET].values
+# n_estimators is the halving resource, so it is only sampled by random search
+PARAM_SPACE = {
+    "max_depth": [4, 5, 6, 8, 10, 12, None],
+    "min_samples_split": [2, 5, 10],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", "log2", 0.5],
+}
+RANDOM_TREES = [50, 100, 200, 300]
 
-# ── Handle Zero Values ────────────────────────────────────────────────────────
-# In the Pima dataset, 0 in Glucose/BP/Skin/Insulin/BMI means missing.
-# Replace 0 with column median for those columns.
 
-cols_with_zeros = ["Glucose", "BloodPressure", "SkinThickness", "Insulin", "BMI"]
-for col in cols_with_zeros:
-    idx = FEATURES.index(col)
-    col_data = X[:, idx]
-    median_val = np.median(col_data[col_data != 0])
-    col_data[col_data == 0] = median_val
+# ── Data ──────────────────────────────────────────────────────────────────────
 
-# ── Train/Test Split ──────────────────────────────────────────────────────────
+def load_data(path: str = DATA_PATH):
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().strip().split(",")
+    data = np.genfromtxt(path, delimiter=",", skip_header=1)
+    X = data[:, [header.index(c) for c in FEATURES]]
+    y = data[:, header.index(TARGET)].astype(int)
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
+    # In the Pima dataset, 0 in Glucose/BP/Skin/Insulin/BMI means missing.
+    # Replace 0 with column median for those columns.
+    for col in ["Glucose", "BloodPressure", "SkinThickness", "Insulin", "BMI"]:
+        col_data = X[:, FEATURES.index(col)]
+        col_data[col_data == 0] = np.median(col_data[col_data != 0])
+    return X, y
 
-print(f"Train: {len(X_train)} | Test: {len(X_test)}")
 
-# ── Hyperparameter Tuning ─────────────────────────────────────────────────────
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-param_grid = {
-    "n_estimators": [100, 200, 300],
-    "max_depth": [5, 8, 12, None],
-    "min_samples_split": [2, 5, 10],
-    "min_samples_leaf": [1, 2, 4],
-}
 
-print("Running GridSearchCV (this may take a minute)…")
-grid = GridSearchCV(
-    RandomForestClassifier(random_state=42),
-    param_grid,
-    cv=5,
-    scoring="accuracy",
-    n_jobs=-1,
-    verbose=0,
-)
-grid.fit(X_train, y_train)
-
-best_model = grid.best_estimator_
-print(f"\nBest params: {grid.best_params_}")
-print(f"Best CV accuracy: {grid.best_score_:.4f}")
-
-# ── Evaluate on Test Set ──────────────────────────────────────────────────────
-
-y_pred = best_model.predict(X_test)
-acc = accuracy_score(y_test, y_pred)
-print(f"\nTest accuracy: {acc:.4f}")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred, target_names=["No Diabetes", "Diabetes"]))
-
-# ── Feature Importances ──────────────────────────────────────────────────────
-
-importances = best_model.feature_importances_
-print("Feature importances:")
-for name, imp in sorted(zip(FEATURES, importances), key=lambda x: -x[1]):
-    print(f"  {name:30s} {imp:.4f}")
-
-# ── Save Model ────────────────────────────────────────────────────────────────
-
-os.makedirs(MODEL_DIR, exist_ok=True)
-
-# Save model + feature names together
-artifact = {
-    "model": best_model,
-    "features": FEATURES,
-    "accuracy": acc,
-}
-joblib.dump(artifact, MODEL_PATH)
-print(f"\n✅ Model saved to {MODEL_PATH}")
-print(f"   Accuracy: {acc:.2%}")
+def cached_folds(y: np.ndarray, n_splits: int, seed: int, data_hash: str) -> tuple:
+    """Fold id per training row, computed once per (data, n_splits, seed)."""
+    key = hashlib.sha256(f"{data_hash}:{n_splits}:{seed}".encode()).hexdigest()[:16]
+    path = os.path.join(TRAINING_DIR, f"folds-{key}.npy")
+    if os.path.exists(path):
+        return np.load(path), key
+    fold_id = np.empty(len(y), dtype=np.int8)
+    for i, (_, test_idx) in enumerate(StratifiedKFold(n_splits, shuffle=True, random_state=seed).split(y, y)):
+        fold_id[test_idx] = i
+    os.makedirs(TRAINING_DIR, exist_ok=True)
+    np.save(path, fold_id)
+    return fold_id, key
+
+
+def latest_run():
+    """Name of the run whose checkpoint was written most recently, or None."""
+    if not os.path.isdir(TRAINING_DIR):
+        return None
+    runs = [(os.path.getmtime(os.path.join(TRAINING_DIR, name, "checkpoint.jsonl")), name)
+            for name in os.listdir(TRAINING_DIR)
+            if os.path.isfile(os.path.join(TRAINING_DIR, name, "checkpoint.jsonl"))]
+    return max(runs)[1] if runs else None
+
+
+# ── Search ────────────────────────────────────────────────────────────────────
+
+class Checkpoint:
+    """Append-only jsonl of evaluated configs, keyed so reruns can skip them."""
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.done = {}
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self.done[rec["key"]] = rec
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def append(self, rec: dict) -> None:
+        self.done[rec["key"]] = rec
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+
+
+def evaluate(params: dict, X, y, fold_id, folds_key, checkpoint, seed, n_jobs, round_no=0) -> dict:
+    key = hashlib.sha256(json.dumps({"params": params, "folds": folds_key, "seed": seed},
+                                    sort_keys=True).encode()).hexdigest()[:16]
+    if key in checkpoint.done:
+        return checkpoint.done[key]
+    scores = []
+    start = time.perf_counter()
+    for k in range(int(fold_id.max()) + 1):
+        train, test = fold_id != k, fold_id == k
+        model = RandomForestClassifier(random_state=seed, n_jobs=n_jobs, **params).fit(X[train], y[train])
+        scores.append(accuracy_score(y[test], model.predict(X[test])))
+    rec = {
+        "key": key, "round": round_no, "params": params,
+        "fold_scores": [round(s, 4) for s in scores],
+        "mean_score": float(np.mean(scores)), "std_score": float(np.std(scores)),
+        "fit_seconds": round(time.perf_counter() - start, 3),
+    }
+    checkpoint.append(rec)
+    print(f"  round {round_no}  cv={rec['mean_score']:.4f}±{rec['std_score']:.4f}  "
+          f"{rec['fit_seconds']:6.2f}s  {params}")
+    return rec
+
+
+def successive_halving(X, y, fold_id, folds_key, checkpoint, args) -> tuple:
+    candidates = list(ParameterSampler(PARAM_SPACE, args.n_candidates, random_state=args.seed))
+    results = []
+    resource, round_no = args.min_trees, 0
+    while True:
+        print(f"Round {round_no}: {len(candidates)} configs × {resource} trees")
+        scored = [evaluate({**c, "n_estimators": resource}, X, y, fold_id, folds_key,
+                           checkpoint, args.seed, args.n_jobs, round_no) for c in candidates]
+        results.extend(scored)
+        order = sorted(range(len(candidates)), key=lambda i: -scored[i]["mean_score"])
+        if len(candidates) == 1 or resource >= args.max_trees:
+            return scored[order[0]], results
+        candidates = [candidates[i] for i in order[:max(1, math.ceil(len(candidates) / args.factor))]]
+        resource = min(resource * args.factor, args.max_trees)
+        round_no += 1
+
+
+def randomized(X, y, fold_id, folds_key, checkpoint, args) -> tuple:
+    space = {**PARAM_SPACE, "n_estimators": RANDOM_TREES}
+    results = [evaluate(p, X, y, fold_id, folds_key, checkpoint, args.seed, args.n_jobs)
+               for p in ParameterSampler(space, args.n_candidates, random_state=args.seed)]
+    return max(results, key=lambda r: r["mean_score"]), results
+
+
+# ── Compression ───────────────────────────────────────────────────────────────
+
+def truncated(model, n_trees: int):
+    """The forest's first n_trees trees (trees are i.i.d., so any prefix is a valid forest)."""
+    small = copy.copy(model)
+    small.estimators_ = model.estimators_[:n_trees]
+    small.n_estimators = n_trees
+    return small
+
+
+def distilled(teacher, X_train, seed: int, n_estimators: int, max_depth: int, copies: int = 10):
+    """Gradient-boosted regressor fit to the teacher's P(diabetes) on a jittered transfer set."""
+    from app.distilled import DistilledClassifier
+
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0.0, 0.05, size=(copies,) + X_train.shape) * X_train.std(axis=0)
+    X_transfer = np.vstack([X_train] + [np.clip(X_train + n, 0, None) for n in noise])
+    student = GradientBoostingRegressor(n_estimators=n_estimators, max_depth=max_depth,
+                                        learning_rate=0.1, subsample=0.8, random_state=seed)
+    student.fit(X_transfer, teacher.predict_proba(X_transfer)[:, 1])
+    return DistilledClassifier(student, teacher_name=type(teacher).__name__)
+
+
+def compression_candidates(best_model, params: dict, X_train, y_train, seed: int) -> dict:
+    """Candidate name → zero-arg builder, so only the chosen recipe is refit on the full training set."""
+    n = len(best_model.estimators_)
+    depth = max(e.tree_.max_depth for e in best_model.estimators_)
+    cands = {"full": lambda: best_model}
+    for k in (10, 25, 50, 100):
+        if k < n:
+            cands[f"first-{k}-trees"] = lambda k=k: truncated(best_model, k)
+    for d in (4, 6, 8):
+        if d < depth:
+            for k in sorted({min(n, 50), n}):
+                cands[f"depth-{d}-{k}-trees"] = lambda d=d, k=k: RandomForestClassifier(
+                    random_state=seed, **{**params, "max_depth": d, "n_estimators": k}
+                ).fit(X_train, y_train)
+    for k, d in ((30, 2), (60, 3), (100, 3)):
+        cands[f"distilled-gbr-{k}x{d}"] = lambda k=k, d=d: distilled(best_model, X_train, seed, k, d)
+    return cands
+
+
+def measure(model, X_eval, y_eval, reference) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "m.joblib")
+        joblib.dump({"model": model, "features": FEATURES}, path)
+        size = os.path.getsize(path)
+        loads = []
+        for _ in range(3):
+            start = time.perf_counter()
+            joblib.load(path)
+            loads.append(time.perf_counter() - start)
+    prof = inference_profile(model, X_eval, iters=200)
+    serving = prof.get("compiled", prof["sklearn"])  # what the API would use
+    return {
+        "accuracy": float(accuracy_score(y_eval, model.predict(X_eval))),
+        # Share of rows where the candidate agrees with the full model
+        "agreement": float(np.mean(model.predict(X_eval) == reference.predict(X_eval))),
+        "artifact_kb": round(size / 1024, 1),
+        "load_ms": round(min(loads) * 1000, 2),
+        "serving_path": "compiled" if "compiled" in prof else "sklearn",
+        "p50_us": serving["p50_us"],
+        "p99_us": serving["p99_us"],
+    }
+
+
+def compress(best_model, params: dict, X_train, y_train, args) -> tuple:
+    """Pick a compressed model on a validation split of the training data.
+
+    Candidates are built from a forest fit on the rest of the training data and
+    judged on the held-out part; the chosen recipe is then rebuilt from
+    `best_model` on all of X_train. The test set is left for the final report.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=args.val_size, random_state=args.seed, stratify=y_train
+    )
+    reference = RandomForestClassifier(random_state=args.seed, **params).fit(X_fit, y_fit)
+    print(f"\nCompression candidates (validation: {len(X_val)} rows held out of training):")
+    print(f"  {'candidate':24s} {'accuracy':>8s} {'agree':>6s} {'size KB':>9s} {'load ms':>8s} {'p50 µs':>8s} {'p99 µs':>8s}")
+    results = {}
+    for name, build in compression_candidates(reference, params, X_fit, y_fit, args.seed).items():
+        r = results[name] = measure(build(), X_val, y_val, reference)
+        print(f"  {name:24s} {r['accuracy']:8.4f} {r['agreement']:6.3f} {r['artifact_kb']:9.1f} {r['load_ms']:8.2f} "
+              f"{r['p50_us']:8.0f} {r['p99_us']:8.0f}")
+    floor = results["full"]["accuracy"] - args.tolerance
+    # The validation split is small, so accuracy alone can favour a lucky tiny
+    # model; it must also reproduce the full model's decisions
+    eligible = [n for n, r in results.items()
+                if r["accuracy"] >= floor and r["agreement"] >= args.min_agreement]
+    chosen = min(eligible, key=lambda n: (results[n]["artifact_kb"], results[n]["p50_us"]))
+    print(f"  → {chosen} (smallest within {args.tolerance:.3f} of full validation accuracy, "
+          f"≥{args.min_agreement:.0%} agreement)")
+    model = compression_candidates(best_model, params, X_train, y_train, args.seed)[chosen]()
+    return chosen, model, results
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+
+def inference_profile(model, X: np.ndarray, iters: int = 500) -> dict:
+    """Single-row latency (sklearn and compiled evaluator) and on-disk size."""
+    from app.forest import compile_model
+    from app.metrics import _percentile
+
+    def lat(fn):
+        out = []
+        for i in range(iters):
+            row = X[i % len(X)][np.newaxis, :]
+            start = time.perf_counter()
+            fn(row)
+            out.append(time.perf_counter() - start)
+        out.sort()
+        return {"p50_us": round(_percentile(out, 50) * 1e6, 1), "p99_us": round(_percentile(out, 99) * 1e6, 1)}
+
+    forest = compile_model(model)
+    profile = {"sklearn": lat(model.predict_proba)}
+    if forest is not None:
+        profile["compiled"] = lat(forest.predict_proba)
+        profile["compiled_kb"] = round(forest.nbytes / 1024, 1)
+    return profile
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--search", choices=["halving", "random"], default="halving")
+    ap.add_argument("--n-candidates", type=int, default=27)
+    ap.add_argument("--factor", type=int, default=3, help="halving: keep 1/factor configs per round")
+    ap.add_argument("--min-trees", type=int, default=25, help="halving: trees in the first round")
+    ap.add_argument("--max-trees", type=int, default=225, help="halving: tree cap (final round)")
+    ap.add_argument("--cv", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--n-jobs", type=int, default=1, help="cores per forest fit")
+    ap.add_argument("--run", default=None, help="run directory name (default: timestamp)")
+    ap.add_argument("--resume", action="store_true",
+                    help="skip configs already in the run's checkpoint (without --run: the latest run)")
+    ap.add_argument("--compress", action="store_true", help="run the compression stage")
+    ap.add_argument("--tolerance", type=float, default=0.01, help="max validation-accuracy drop for a compressed model")
+    ap.add_argument("--min-agreement", type=float, default=0.95,
+                    help="min share of validation predictions a compressed model must share with the full one")
+    ap.add_argument("--val-size", type=float, default=0.2,
+                    help="share of the training data held out to choose a compressed model")
+    ap.add_argument("--register", action="store_true", help="add the trained model to the model registry")
+    args = ap.parse_args()
+
+    wall_start = time.perf_counter()
+    run = args.run
+    if args.resume:
+        run = run or latest_run()
+        if run is None:
+            ap.error(f"--resume: no run with a checkpoint under {TRAINING_DIR}")
+        if not os.path.isfile(os.path.join(TRAINING_DIR, run, "checkpoint.jsonl")):
+            ap.error(f"--resume: run '{run}' has no checkpoint to resume")
+        print(f"Resuming run {run}")
+    run = run or datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.join(TRAINING_DIR, run)
+    os.makedirs(run_dir, exist_ok=True)
+
+    print("Loading dataset…")
+    X, y = load_data()
+    data_hash = file_sha256(DATA_PATH)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=args.seed, stratify=y
+    )
+    print(f"Train: {len(X_train)} | Test: {len(X_test)}")
+
+    fold_id, folds_key = cached_folds(y_train, args.cv, args.seed, data_hash)
+    checkpoint = Checkpoint(os.path.join(run_dir, "checkpoint.jsonl"), args.resume)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} configs already evaluated")
+
+    search = successive_halving if args.search == "halving" else randomized
+    search_start = time.perf_counter()
+    best, results = search(X_train, y_train, fold_id, folds_key, checkpoint, args)
+    search_seconds = time.perf_counter() - search_start
+    print(f"\nBest params: {best['params']}")
+    print(f"Best CV accuracy: {best['mean_score']:.4f}")
+
+    # ── Evaluate on Test Set ──────────────────────────────────────────────────
+    best_model = RandomForestClassifier(random_state=args.seed, **best["params"]).fit(X_train, y_train)
+    y_pred = best_model.predict(X_test)
+    acc = accuracy_score(y_test, y_pred)
+    print(f"\nTest accuracy: {acc:.4f}")
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, target_names=["No Diabetes", "Diabetes"]))
+
+    print("Feature importances:")
+    for name, imp in sorted(zip(FEATURES, best_model.feature_importances_), key=lambda x: -x[1]):
+        print(f"  {name:30s} {imp:.4f}")
+
+    # ── Save Model + Report ───────────────────────────────────────────────────
+    model_path = os.path.join(run_dir, "model.joblib")
+    compression = None
+    if args.compress:
+        chosen, model, candidates = compress(best_model, best["params"], X_train, y_train, args)
+        compression = {"tolerance": args.tolerance, "min_agreement": args.min_agreement,
+                       "val_size": args.val_size, "chosen": chosen, "validation": candidates}
+        if chosen != "full":
+            joblib.dump({"model": best_model, "features": FEATURES, "accuracy": acc},
+                        os.path.join(run_dir, "model_full.joblib"))
+            best_model, acc = model, float(accuracy_score(y_test, model.predict(X_test)))
+            print(f"  {chosen} test accuracy: {acc:.4f}")
+        compression["test_accuracy"] = acc
+    joblib.dump({"model": best_model, "features": FEATURES, "accuracy": acc}, model_path)
+
+    profile = inference_profile(best_model, X_test)
+    report = {
+        "run": run,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "search": args.search,
+        "training_data_sha256": data_hash,
+        "cv_folds": args.cv,
+        "configs_evaluated": len(results),
+        "search_seconds": round(search_seconds, 2),
+        "wall_seconds": round(time.perf_counter() - wall_start, 2),
+        "best_params": best["params"],
+        "best_cv_score": best["mean_score"],
+        "test_accuracy": acc,
+        "artifact_kb": round(os.path.getsize(model_path) / 1024, 1),
+        "inference": profile,
+        "compression": compression,
+        "results": sorted(results, key=lambda r: -r["mean_score"]),
+    }
+    with open(os.path.join(run_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n✅ Model saved to {model_path}")
+    print(f"   Search: {len(results)} configs in {search_seconds:.1f}s (wall {report['wall_seconds']:.1f}s)")
+    print(f"   Test accuracy: {acc:.2%} | artifact {report['artifact_kb']:.0f} KB")
+    for kind in ("sklearn", "compiled"):
+        if kind in profile:
+            print(f"   {kind:8s} single-row latency p50 {profile[kind]['p50_us']:.0f} µs, "
+                  f"p99 {profile[kind]['p99_us']:.0f} µs")
+
+    if args.register:
+        from app.model_registry import ModelRegistry
+        registry = ModelRegistry(os.getenv("MODEL_REGISTRY_DIR", os.path.join(MODEL_DIR, "registry")))
+        version = registry.register(model_path, {
+            "training_data_sha256": data_hash,
+            "params": best["params"],
+            "cv_score": best["mean_score"],
+            "training_run": run,
+            "compressed_from": compression["chosen"] if compression else None,
+        })
+        print(f"✅ Registered as {version} (not promoted)")
+
+
+if __name__ == "__main__":
+    main()
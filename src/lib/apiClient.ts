@@ -1,6 +1,6 @@
 import axios from "axios";
 
-const BASE_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
+export const BASE_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
 export const apiClient = axios.create({
     baseURL: BASE_URL,
@@ -16,6 +16,40 @@ apiClient.interceptors.request.use((config) => {
     return config;
 });
 
+// Exchanges the stored refresh token for a new pair; concurrent callers share one request.
+// Resolves to the new access token, or null when there is no refresh token or it was rejected.
+let refreshing: Promise<string | null> | null = null;
+
+export function refreshAccessToken(): Promise<string | null> {
+    if (!refreshing) {
+        refreshing = (async () => {
+            const refreshToken = localStorage.getItem("cs_refresh_token");
+            if (!refreshToken) return null;
+            try {
+                const res = await axios.post(`${BASE_URL}/auth/refresh`, {
+                    refresh_token: refreshToken,
+                });
+                const { access_token, refresh_token } = res.data;
+                localStorage.setItem("cs_access_token", access_token);
+                localStorage.setItem("cs_refresh_token", refresh_token);
+                return access_token as string;
+            } catch {
+                return null;
+            }
+        })().finally(() => {
+            refreshing = null;
+        });
+    }
+    return refreshing;
+}
+
+function clearAuthAndLogin(): void {
+    localStorage.removeItem("cs_access_token");
+    localStorage.removeItem("cs_refresh_token");
+    localStorage.removeItem("cs_user");
+    window.location.href = "/login";
+}
+
 // Auto-refresh on 401
 apiClient.interceptors.response.use(
     (res) => res,
@@ -23,24 +57,14 @@ apiClient.interceptors.response.use(
         const original = error.config;
         if (error.response?.status === 401 && !original._retry) {
             original._retry = true;
-            const refreshToken = localStorage.getItem("cs_refresh_token");
-            if (refreshToken) {
-                try {
-                    const res = await axios.post(`${BASE_URL}/auth/refresh`, {
-                        refresh_token: refreshToken,
-                    });
-                    const { access_token, refresh_token } = res.data;
-                    localStorage.setItem("cs_access_token", access_token);
-                    localStorage.setItem("cs_refresh_token", refresh_token);
+            if (localStorage.getItem("cs_refresh_token")) {
+                const access_token = await refreshAccessToken();
+                if (access_token) {
                     original.headers.Authorization = `Bearer ${access_token}`;
                     return apiClient(original);
-                } catch {
-                    // Refresh failed — clear auth
-                    localStorage.removeItem("cs_access_token");
-                    localStorage.removeItem("cs_refresh_token");
-                    localStorage.removeItem("cs_user");
-                    window.location.href = "/login";
                 }
+                // Refresh failed — clear auth
+                clearAuthAndLogin();
             }
         }
         return Promise.reject(error);
@@ -4,7 +4,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/Card";
 import { Badge } from "@/components/ui/Badge";
 import { Link } from "react-router-dom";
 import { getAuth } from "@/features/auth/auth.store";
-import apiClient from "@/lib/apiClient";
+import apiClient, { BASE_URL, refreshAccessToken } from "@/lib/apiClient";
 
 type PatientRow = { id: string; name: string; email: string; age?: number; gender?: string; last_triage?: string; last_phq9_severity?: string; deficiency_count: number; last_bp_flag?: string };
 
@@ -12,15 +12,91 @@ const TRIAGE_V: Record<string, "green" | "amber" | "red"> = { Low: "green", Medi
 const SEV_V: Record<string, "green" | "blue" | "amber" | "red"> = { "Minimal or None": "green", "Mild": "blue", "Moderate": "amber", "Moderately Severe": "amber", "Severe": "red" };
 const BP_V: Record<string, "green" | "blue" | "amber" | "red"> = { "Normal": "green", "Elevated": "blue", "Stage 1 Hypertension": "amber", "Stage 2 Hypertension": "red", "Hypertensive Crisis": "red" };
 
+type Alert = { id: number; type: "triage_high" | "phq9_severe" | "bp_crisis"; patient_id: string; patient_name: string; created_at: string; systolic?: number; diastolic?: number; score?: number };
+
+const ALERT_TEXT: Record<Alert["type"], (a: Alert) => string> = {
+  triage_high: () => "High symptom triage",
+  phq9_severe: a => `Severe PHQ-9 (score ${a.score})`,
+  bp_crisis: a => `Hypertensive crisis (${a.systolic}/${a.diastolic})`,
+};
+
+type StreamStatus = "live" | "reconnecting" | "disconnected";
+
+// Follows /doctor/alerts/stream, reconnecting with Last-Event-ID so nothing is missed.
+// An expired access token is refreshed the way apiClient does it; if that fails the
+// stream stops and reports itself disconnected instead of retrying a dead token forever.
+async function watchAlerts(onAlert: (a: Alert) => void, onStatus: (s: StreamStatus) => void, signal: AbortSignal): Promise<void> {
+  let lastId = "";
+  let refreshed = false;
+  while (!signal.aborted) {
+    try {
+      const res = await fetch(`${BASE_URL}/doctor/alerts/stream`, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem("cs_access_token") ?? ""}`,
+          ...(lastId ? { "Last-Event-ID": lastId } : {}),
+        },
+        signal,
+      });
+      if (res.status === 401) {
+        if (!refreshed && await refreshAccessToken()) {
+          refreshed = true;
+          continue;
+        }
+        onStatus("disconnected");
+        return;
+      }
+      if (!res.ok || !res.body) throw new Error(`alerts stream failed: ${res.status}`);
+      onStatus("live");
+      refreshed = false;
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) >= 0) {
+          const raw = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          if (raw.match(/^event: (.*)$/m)?.[1] !== "alert") continue;
+          lastId = raw.match(/^id: (.*)$/m)?.[1] ?? lastId;
+          onAlert(JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}"));
+        }
+      }
+    } catch {
+      if (signal.aborted) return;
+    }
+    onStatus("reconnecting");
+    await new Promise(r => setTimeout(r, 3000));
+  }
+}
+
 export default function DoctorDashboard() {
   const auth = getAuth();
   const [patients, setPatients] = useState<PatientRow[]>([]);
   const [loading, setLoading] = useState(true);
+  const [alerts, setAlerts] = useState<Alert[]>([]);
+  const [streamStatus, setStreamStatus] = useState<StreamStatus>("live");
 
   useEffect(() => {
     apiClient.get("/doctor/patients").then(r => setPatients(r.data)).catch(() => { }).finally(() => setLoading(false));
   }, []);
 
+  // Live alerts replace polling: update the matching row in place instead of reloading the list
+  useEffect(() => {
+    const controller = new AbortController();
+    apiClient.get("/doctor/alerts", { params: { limit: 20 } }).then(r => setAlerts(r.data)).catch(() => { });
+    watchAlerts(a => {
+      setAlerts(list => (list.some(x => x.id === a.id) ? list : [a, ...list].slice(0, 20)));
+      setPatients(ps => ps.map(p => p.id !== a.patient_id ? p
+        : a.type === "triage_high" ? { ...p, last_triage: "High" }
+        : a.type === "phq9_severe" ? { ...p, last_phq9_severity: "Severe" }
+        : { ...p, last_bp_flag: "Hypertensive Crisis" }));
+    }, setStreamStatus, controller.signal);
+    return () => controller.abort();
+  }, []);
+
   const highTriageCount = patients.filter(p => p.last_triage === "High").length;
   const flaggedBpCount = patients.filter(p => p.last_bp_flag && p.last_bp_flag !== "Normal").length;
   const defCount = patients.filter(p => p.deficiency_count > 0).length;
@@ -44,6 +120,32 @@ export default function DoctorDashboard() {
         ))}
       </div>
 
+      {/* Live Alerts */}
+      {streamStatus !== "live" && (
+        <div className="rounded-xl border border-amber-200 bg-amber-50 px-4 py-2 text-sm text-amber-800">
+          {streamStatus === "reconnecting"
+            ? "Live alerts are reconnecting…"
+            : "Live alerts are disconnected. Sign in again to resume them."}
+        </div>
+      )}
+      {alerts.length > 0 && (
+        <Card className="rounded-2xl border-red-200 shadow-sm">
+          <CardHeader><CardTitle className="text-base">Live Alerts</CardTitle></CardHeader>
+          <CardContent className="space-y-2">
+            {alerts.map(a => (
+              <div key={a.id} className="flex items-center justify-between rounded-xl border border-slate-100 px-3 py-2">
+                <div>
+                  <span className="font-medium text-slate-900 text-sm">{a.patient_name}</span>
+                  <Badge variant="red" className="ml-2">{ALERT_TEXT[a.type]?.(a) ?? a.type}</Badge>
+                  <div className="text-xs text-slate-400">{new Date(a.created_at).toLocaleString("en-IN", { dateStyle: "medium", timeStyle: "short" })}</div>
+                </div>
+                <Link to={`/doctor/patients/${a.patient_id}`} className="text-xs font-medium text-blue-600 hover:underline">View →</Link>
+              </div>
+            ))}
+          </CardContent>
+        </Card>
+      )}
+
       {/* Patient Table */}
       <Card className="rounded-2xl border-slate-200 shadow-sm">
         <CardHeader><CardTitle className="text-base">All Patients ({patients.length})</CardTitle></CardHeader>
@@ -15,11 +15,17 @@ type PatientFull = {
   mental: any[];
   chronic: any[];
   appointments: any[];
+  // Full totals; the lists above are capped to the newest entries
+  counts: Record<"labs" | "lifestyle" | "symptoms" | "mental" | "chronic" | "appointments", number>;
 };
 
 const TRIAGE_V: Record<string, "green" | "amber" | "red"> = { Low: "green", Medium: "amber", High: "red" };
 const BP_V: Record<string, "green" | "blue" | "amber" | "red"> = { Normal: "green", Elevated: "blue", "Stage 1 Hypertension": "amber", "Stage 2 Hypertension": "red", "Hypertensive Crisis": "red" };
 
+// Newest rows per section this page shows; the server sends everything unless asked.
+// Mental keeps more rows so the latest PHQ-9 is found among GAD-7 entries.
+const SUMMARY_LIMITS = { labs_limit: 100, lifestyle_limit: 1, symptoms_limit: 10, mental_limit: 50, chronic_limit: 15, appointments_limit: 100 };
+
 export default function PatientDetail() {
   const { id } = useParams();
   const [data, setData] = useState<PatientFull | null>(null);
@@ -27,14 +33,14 @@ export default function PatientDetail() {
   const [activeTab, setActiveTab] = useState("overview");
 
   useEffect(() => {
-    apiClient.get(`/doctor/patients/${id}/summary`)
+    apiClient.get(`/doctor/patients/${id}/summary`, { params: SUMMARY_LIMITS })
       .then(r => setData(r.data)).catch(() => { }).finally(() => setLoading(false));
   }, [id]);
 
   if (loading) return <div className="text-center py-16 text-slate-500">Loading patient data…</div>;
   if (!data) return <div className="text-center py-16 text-red-500">Patient not found.</div>;
 
-  const { user, profile, labs, lifestyle, symptoms, mental, chronic, appointments } = data;
+  const { user, profile, labs, lifestyle, symptoms, mental, chronic, appointments, counts } = data;
   const tabs = ["overview", "labs", "mental", "bp", "symptoms", "appointments"] as const;
 
   return (
@@ -102,7 +108,7 @@ export default function PatientDetail() {
 
       {activeTab === "labs" && (
         <Card className="rounded-2xl border-slate-200 shadow-sm">
-          <CardHeader><CardTitle className="text-sm">Lab Reports ({labs.length})</CardTitle></CardHeader>
+          <CardHeader><CardTitle className="text-sm">Lab Reports ({counts?.labs ?? labs.length})</CardTitle></CardHeader>
           <CardContent className="space-y-3">
             {labs.length === 0 ? <span className="text-slate-400 text-sm">No lab reports</span> : labs.map((r: any) => (
               <div key={r.id} className="rounded-xl border border-slate-200 bg-slate-50 p-3">
@@ -122,7 +128,7 @@ export default function PatientDetail() {
 
       {activeTab === "mental" && (
         <Card className="rounded-2xl border-slate-200 shadow-sm">
-          <CardHeader><CardTitle className="text-sm">Mental Assessments ({mental.length})</CardTitle></CardHeader>
+          <CardHeader><CardTitle className="text-sm">Mental Assessments ({counts?.mental ?? mental.length})</CardTitle></CardHeader>
           <CardContent className="space-y-2">
             {mental.length === 0 ? <span className="text-slate-400 text-sm">No assessments</span> : mental.slice(0, 10).map((m: any) => (
               <div key={m.id} className="flex items-center justify-between rounded-xl border border-slate-200 bg-slate-50 px-3 py-2 text-sm">
@@ -138,7 +144,7 @@ export default function PatientDetail() {
 
       {activeTab === "bp" && (
         <Card className="rounded-2xl border-slate-200 shadow-sm">
-          <CardHeader><CardTitle className="text-sm">Blood Pressure History ({chronic.length})</CardTitle></CardHeader>
+          <CardHeader><CardTitle className="text-sm">Blood Pressure History ({counts?.chronic ?? chronic.length})</CardTitle></CardHeader>
           <CardContent className="space-y-2">
             {chronic.length === 0 ? <span className="text-slate-400 text-sm">No readings</span> : chronic.slice(0, 15).map((c: any) => (
               <div key={c.id} className="flex items-center justify-between rounded-xl border border-slate-200 bg-slate-50 px-3 py-2">
@@ -153,7 +159,7 @@ export default function PatientDetail() {
 
       {activeTab === "symptoms" && (
         <Card className="rounded-2xl border-slate-200 shadow-sm">
-          <CardHeader><CardTitle className="text-sm">Symptom Checks ({symptoms.length})</CardTitle></CardHeader>
+          <CardHeader><CardTitle className="text-sm">Symptom Checks ({counts?.symptoms ?? symptoms.length})</CardTitle></CardHeader>
           <CardContent className="space-y-2">
             {symptoms.length === 0 ? <span className="text-slate-400 text-sm">No checks</span> : symptoms.slice(0, 10).map((s: any) => (
               <div key={s.id} className="flex items-center justify-between rounded-xl border border-slate-200 bg-slate-50 px-3 py-2">
@@ -168,7 +174,7 @@ export default function PatientDetail() {
 
       {activeTab === "appointments" && (
         <Card className="rounded-2xl border-slate-200 shadow-sm">
-          <CardHeader><CardTitle className="text-sm">Appointments ({appointments.length})</CardTitle></CardHeader>
+          <CardHeader><CardTitle className="text-sm">Appointments ({counts?.appointments ?? appointments.length})</CardTitle></CardHeader>
           <CardContent className="space-y-2">
             {appointments.length === 0 ? <span className="text-slate-400 text-sm">No appointments</span> : appointments.map((a: any) => (
               <div key={a.id} className="flex items-center justify-between rounded-xl border border-slate-200 bg-slate-50 px-3 py-2">
@@ -13,12 +13,28 @@ export default function Patients() {
   const [patients, setPatients] = useState<PatientRow[]>([]);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState("");
+  const [matches, setMatches] = useState<PatientRow[] | null>(null);
 
   useEffect(() => {
     apiClient.get("/doctor/patients").then(r => setPatients(r.data)).catch(() => { }).finally(() => setLoading(false));
   }, []);
 
-  const filtered = patients.filter(p => p.name.toLowerCase().includes(search.toLowerCase()) || p.email.toLowerCase().includes(search.toLowerCase()));
+  // Server-side ranked prefix search; the full list is shown while the box is empty
+  useEffect(() => {
+    const q = search.trim();
+    if (!q) { setMatches(null); return; }
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      apiClient.get("/doctor/patients/search", { params: { q, limit: 50 } })
+        .then(r => { if (!cancelled) setMatches(r.data.items); })
+        .catch(() => { if (!cancelled) setMatches([]); });
+    }, 200);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [search]);
+
+  // Search hits don't carry the dashboard badges; merge them from the loaded list when present
+  const byId = new Map(patients.map(p => [p.id, p]));
+  const filtered = matches === null ? patients : matches.map(m => ({ ...m, ...byId.get(m.id) }));
 
   return (
     <div className="space-y-6">
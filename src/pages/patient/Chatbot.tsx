@@ -4,9 +4,45 @@ import { Card, CardContent } from "@/components/ui/Card";
 import { Button } from "@/components/ui/Button";
 import { Input } from "@/components/ui/Input";
 import { Send, Bot, User, AlertCircle } from "lucide-react";
-import apiClient from "@/lib/apiClient";
+import apiClient, { BASE_URL } from "@/lib/apiClient";
 
-type Message = { role: "user" | "assistant"; content: string };
+type Message = { role: "user" | "assistant"; content: string; streaming?: boolean };
+
+// Reads the /chat/stream server-sent events, calling onDelta for each text fragment
+async function readChatStream(body: unknown, onDelta: (text: string) => void): Promise<void> {
+    const res = await fetch(`${BASE_URL}/chat/stream`, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("cs_access_token") ?? ""}`,
+        },
+        body: JSON.stringify(body),
+    });
+    if (!res.ok || !res.body) throw new Error(`stream failed: ${res.status}`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) >= 0) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const event = raw.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}");
+            if (event === "error") onDelta(data.reply ?? "");
+            else if (!event && data.delta) onDelta(data.delta);
+        }
+    }
+}
+
+// crypto.randomUUID only exists in secure contexts (https, localhost)
+function newConversationId(): string {
+    if (typeof crypto !== "undefined" && typeof crypto.randomUUID === "function") return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
 
 export default function Chatbot() {
     const [messages, setMessages] = useState<Message[]>([
@@ -15,11 +51,26 @@ export default function Chatbot() {
     const [input, setInput] = useState("");
     const [loading, setLoading] = useState(false);
     const endRef = useRef<HTMLDivElement>(null);
+    // Lets the server keep a rolling summary of older turns for this chat session
+    const [conversationId] = useState(newConversationId);
 
     useEffect(() => {
         endRef.current?.scrollIntoView({ behavior: "smooth" });
     }, [messages]);
 
+    async function streamReply(chatHistory: { role: string; content: string }[]) {
+        let started = false;
+        await readChatStream({ messages: chatHistory, include_context: true, conversation_id: conversationId }, delta => {
+            if (!started) {
+                started = true;
+                setMessages(m => [...m, { role: "assistant", content: delta, streaming: true }]);
+                return;
+            }
+            setMessages(m => m.map((x, i) => (i === m.length - 1 ? { ...x, content: x.content + delta } : x)));
+        });
+        setMessages(m => m.map(x => (x.streaming ? { role: x.role, content: x.content } : x)));
+    }
+
     async function sendMessage() {
         const text = input.trim();
         if (!text || loading) return;
@@ -27,12 +78,17 @@ export default function Chatbot() {
         setMessages(m => [...m, userMsg]);
         setInput("");
         setLoading(true);
+        const chatHistory = [...messages, userMsg].map(m => ({ role: m.role, content: m.content }));
         try {
-            const chatHistory = [...messages, userMsg].map(m => ({ role: m.role, content: m.content }));
-            const res = await apiClient.post("/chat", { messages: chatHistory, include_context: true });
-            setMessages(m => [...m, { role: "assistant", content: res.data.reply }]);
-        } catch (e: any) {
-            setMessages(m => [...m, { role: "assistant", content: "Sorry, I'm having trouble connecting right now. Please try again in a moment." }]);
+            await streamReply(chatHistory);
+        } catch {
+            // Streaming unavailable (network, proxy, expired token) — fall back to the buffered endpoint
+            try {
+                const res = await apiClient.post("/chat", { messages: chatHistory, include_context: true, conversation_id: conversationId });
+                setMessages(m => [...m.filter(x => !x.streaming), { role: "assistant", content: res.data.reply }]);
+            } catch (e: any) {
+                setMessages(m => [...m.filter(x => !x.streaming), { role: "assistant", content: "Sorry, I'm having trouble connecting right now. Please try again in a moment." }]);
+            }
         } finally {
             setLoading(false);
         }
@@ -74,7 +130,7 @@ export default function Chatbot() {
                             )}
                         </div>
                     ))}
-                    {loading && (
+                    {loading && !messages.some(m => m.streaming) && (
                         <div className="flex gap-3 justify-start">
                             <div className="h-8 w-8 shrink-0 rounded-full bg-blue-100 border border-blue-200 flex items-center justify-center">
                                 <Bot size={14} className="text-blue-600" />
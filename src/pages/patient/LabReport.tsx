@@ -12,7 +12,7 @@ type LabResult = {
     ref_range_low?: number; ref_range_high?: number;
     deficiency_name?: string; explanation?: string;
 };
-type Report = { id: string; report_date: string; results: LabResult[]; deficiency_summary: string[] };
+type Report = { id: string; report_date: string; results: LabResult[]; deficiency_summary: string[]; notice?: string };
 
 const STATUS_BADGE: Record<string, "green" | "amber" | "red"> = { normal: "green", low: "red", high: "amber" };
 
@@ -198,6 +198,11 @@ export default function LabReport() {
                         </CardTitle>
                     </CardHeader>
                     <CardContent className="space-y-4">
+                        {result.notice && (
+                            <div className="flex items-start gap-2 rounded-xl bg-amber-50 border border-amber-200 px-4 py-3 text-sm text-amber-800">
+                                <AlertTriangle size={16} className="mt-0.5 shrink-0" /> {result.notice}
+                            </div>
+                        )}
                         {result.deficiency_summary.length > 0 && (
                             <div className="rounded-xl bg-red-50 border border-red-200 p-4">
                                 <p className="font-semibold text-red-800 text-sm mb-2">⚠️ Deficiencies Detected</p>
@@ -9,11 +9,14 @@ import { ShieldAlert } from "lucide-react";
 import apiClient from "@/lib/apiClient";
 
 type FeatureImportance = { feature: string; importance: number };
+type FeatureContribution = { feature: string; value: number; contribution: number };
 type PredictionResult = {
     probability: number;
     risk_level: string;
     accuracy: number;
     feature_importances: FeatureImportance[];
+    base_probability?: number | null;
+    contributions?: FeatureContribution[];
 };
 
 function riskColor(level: string) {
@@ -247,6 +250,28 @@ export default function RiskPrediction() {
                                     </div>
                                 </div>
 
+                                {/* Per-prediction contributions */}
+                                {result.contributions && result.contributions.length > 0 && (
+                                    <div className="rounded-2xl border border-slate-200 bg-slate-50 p-4">
+                                        <div className="font-semibold text-sm mb-1">What Moved Your Risk</div>
+                                        {result.base_probability != null && (
+                                            <div className="text-[11px] text-slate-500 mb-3">
+                                                Starting from an average of {(result.base_probability * 100).toFixed(1)}%
+                                            </div>
+                                        )}
+                                        <div className="space-y-1.5">
+                                            {result.contributions.slice(0, 5).map(fc => (
+                                                <div key={fc.feature} className="flex items-center justify-between text-xs">
+                                                    <span className="font-medium text-slate-700">{fc.feature}</span>
+                                                    <span className={fc.contribution > 0 ? "text-red-600" : "text-green-600"}>
+                                                        {fc.contribution > 0 ? "+" : ""}{(fc.contribution * 100).toFixed(1)}%
+                                                    </span>
+                                                </div>
+                                            ))}
+                                        </div>
+                                    </div>
+                                )}
+
                                 <div className="rounded-xl bg-amber-50 border border-amber-200 p-3 text-xs text-amber-800">
                                     ⚠️ This prediction is for informational purposes only. It uses a machine learning model
                                     trained on medical data. Always consult a qualified healthcare professional for medical advice.